@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Task Archive Script for Task Tracker Application
+
+Moves the tasks completed more than N days ago from the tasks table to
+tasks_archive, so the lists, kanban and calendar only work through open and
+recently completed tasks:
+
+    python archive_tasks.py                 # completed more than 365 days ago
+    python archive_tasks.py --days 90
+
+Meant to run regularly (e.g. nightly from cron) next to the running app.
+Tasks are moved in batches of --batch-size, each in its own short
+transaction, so the app's writes only wait for one batch at a time. Archived
+tasks stay readable on their task page, through /api/task/<id> and in the
+list of all completed tasks; they leave the calendar and the search index.
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+from init_db import DATABASE, TASK_ARCHIVE_COLUMNS, init_database
+
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 1000
+# Seconds a batch waits for the app to release the write lock
+LOCK_TIMEOUT = 30
+
+
+def archive_tasks(database=DATABASE, days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move the tasks completed more than ``days`` ago to tasks_archive. Returns the number moved.
+
+    Tasks marked completed without a completion date are left alone.
+    """
+    init_database(database)
+    cutoff = (date.today() - timedelta(days=days)).isoformat()
+    moved = 0
+
+    conn = sqlite3.connect(database, timeout=LOCK_TIMEOUT)
+    try:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                # Oldest first, from the idx_tasks_completed range
+                cursor.execute('''
+                    SELECT id FROM tasks
+                    WHERE completed = 1 AND completion_date < ?
+                    ORDER BY completion_date
+                    LIMIT ?
+                ''', (cutoff, batch_size))
+                ids = json.dumps([row[0] for row in cursor.fetchall()])
+                if ids == '[]':
+                    conn.rollback()
+                    break
+                # Copied first: the delete triggers skip the tasks already in the archive
+                cursor.execute(f'''
+                    INSERT INTO tasks_archive ({TASK_ARCHIVE_COLUMNS})
+                    SELECT {TASK_ARCHIVE_COLUMNS} FROM tasks WHERE id IN (SELECT value FROM json_each(?))
+                ''', (ids,))
+                count = cursor.rowcount
+                cursor.execute("DELETE FROM tasks WHERE id IN (SELECT value FROM json_each(?))", (ids,))
+                # One change per project in the batch: a new data version for the
+                # caches and a tasks-archived event for the open pages
+                cursor.execute('''
+                    INSERT INTO change_log (action, project_id)
+                    SELECT DISTINCT 'archive', project_id FROM tasks_archive
+                    WHERE id IN (SELECT value FROM json_each(?))
+                ''', (ids,))
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            moved += count
+    finally:
+        conn.close()
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move old completed tasks to the task archive')
+    parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                        help='Archive tasks completed more than this many days ago (default: %(default)s)')
+    parser.add_argument('--database', default=DATABASE, help='Database file (default: %(default)s)')
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='Tasks moved per transaction')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        moved = archive_tasks(args.database, args.days, args.batch_size)
+    except sqlite3.Error as e:
+        print(f"Error during archiving: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Archived {moved} tasks in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,174 +1,261 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, g, Response, stream_with_context, make_response
 import sqlite3
 import os
-from datetime import datetime
+from datetime import datetime, date, timedelta
+import functools
+import html
 import json
+import queue
+import re
+import time
 
 # Import and run database initialization
 import sys
-import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from init_db import init_database
+from init_db import init_database, OVERDUE_CONDITION, OVERDUE_TASK_IDS, TASK_COLUMNS
+from db import get_pool, get_writer
+from change_feed import get_change_feed, changes_since, oldest_version, format_change_event
+from ip_whitelist import IPWhitelist
+import assets
+import compression
+import metrics
+import slow_queries
+import stream_hub
 
-app = Flask(__name__, template_folder='../templates')
+# Static files are served by static_asset() with content-hashed URLs
+app = Flask(__name__, template_folder='../templates', static_folder=None)
 
 # Database setup
 DATABASE = 'tasks.db'
 
 def init_db():
-    init_database()  # Use the centralized initialization
+    init_database(DATABASE)  # Use the centralized initialization
 
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Return the current request's read-only connection, checked out from the pool on first use"""
+    if 'db' not in g:
+        g.db = get_pool(DATABASE).acquire()
+    return g.db
+
+def write(job, *args):
+    """Run ``job(conn, *args)`` on the database's writer thread and return its result once committed"""
+    result = get_writer(DATABASE).submit(job, *args)
+    g.db_wrote = True
+    return result
+
+def execute_write(sql, parameters=()):
+    """Run a single write statement on the writer thread, return the cursor's lastrowid"""
+    return write(lambda conn: conn.execute(sql, parameters).lastrowid)
+
+@app.teardown_appcontext
+def release_db_connection(exception):
+    """Hand the request's connection back to the pool, announcing any writes to the change feed"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool(DATABASE).release(conn)
+    if g.pop('db_wrote', False):
+        get_change_feed(DATABASE).notify()
+
+@app.before_request
+def start_request_metrics():
+    if metrics.collecting():
+        g.metrics_started = metrics.start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    if 'metrics_started' in g and metrics.enabled:
+        metrics.finish_request(request.endpoint, request.method, response, g.metrics_started)
+    return response
+
+# Registered after record_request_metrics, so it runs first and the metrics see the bytes sent
+@app.after_request
+def compress_response(response):
+    return compression.compress_response(request, response)
+
+@app.teardown_request
+def end_request_metrics(exception):
+    """Stop collecting the request's SQL stats and log its slow statements"""
+    if 'metrics_started' in g:
+        stats = metrics.end_request()
+        # Runs before the connection goes back to the pool, so the plans are
+        # explained on it (writes too: EXPLAIN doesn't write)
+        if stats is not None and stats.slow_statements:
+            slow_queries.log_statements(get_db_connection(), request, stats.slow_statements)
+
+# Keyset pagination: long lists are read one page at a time, continuing after
+# the last row of the previous page (``after``) instead of using OFFSET, so
+# every page is an index range read and pages don't shift when tasks are added.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def get_page_limit():
+    """Page size from the ``limit`` query parameter, capped at MAX_PAGE_SIZE"""
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def split_page(rows, limit):
+    """Split ``limit + 1`` fetched rows into the page and a flag telling if more rows follow"""
+    return rows[:limit], len(rows) > limit
+
+def next_page_url(cursor):
+    """URL of the next page of the current listing, continuing after ``cursor``"""
+    args = request.args.to_dict()
+    args['after'] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+# Conditional GET: the read APIs are tagged with the data version (latest
+# change_log entry), and a request whose If-None-Match still matches gets a
+# 304 without running the query. No Last-Modified: its one-second resolution
+# would hide the writes made in the same second as the response.
+def get_data_version():
+    """Latest change_log version, or 0 before the first change"""
+    return get_db_connection().execute('SELECT COALESCE(MAX(version), 0) FROM change_log').fetchone()[0]
+
+def conditional_on_data_version(view):
+    """Answer the view with 304 Not Modified while the data version is unchanged"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Overdue flags change at midnight without any write, so the day is part of the version
+        etag = f'{get_data_version()}-{date.today().isoformat()}'
+        
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag, weak=True)
+        # Let clients keep the response but revalidate it on every use
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
+
+@app.context_processor
+def inject_data_version():
+    """Let templates look up the data version (the change feed starts from it)"""
+    return {'data_version': get_data_version}
+
+def asset_url(path):
+    """Content-hashed URL of a file in static/ (a CDN URL for vendored libraries not fetched yet)"""
+    hashed = assets.hashed_path(path)
+    if hashed is None and path in assets.VENDOR_SOURCES:
+        return assets.VENDOR_SOURCES[path][0]
+    return url_for('static_asset', filename=hashed or path)
+
+@app.context_processor
+def inject_asset_url():
+    return {'asset_url': asset_url}
+
+@app.route('/static/<path:filename>')
+def static_asset(filename):
+    """A static file; cached for a year under its content-hashed name"""
+    asset, immutable = assets.resolve(filename)
+    if asset is None:
+        return "File not found", 404
+    response = make_response(asset.data)
+    response.content_type = assets.content_type(filename)
+    # Also keys the compressed copy in compression.cache. Weak, because the
+    # gzip and brotli bodies go out under the same tag as the plain one
+    response.set_etag(asset.digest, weak=True)
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = assets.IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @app.route('/')
 def index():
     conn = get_db_connection()
+    limit = get_page_limit()
+    after = request.args.get('after', type=int)
+    # Renders just this task when a page patches itself after a change
+    task_id = request.args.get('task_id', type=int)
     
     # Get non-completed tasks sorted from newest to oldest (by ID)
-    tasks = conn.execute('''
-        SELECT t.*, p.name as project_name, p.identifier as project_identifier, p.responsible as project_responsible
-        FROM tasks t
-        JOIN projects p ON t.project_id = p.id
-        WHERE t.completed = 0
+    tasks = conn.execute(f'''
+        SELECT *
+        FROM task_list_v t
+        WHERE t.completed = 0 {'AND t.id < ?' if after else ''} {'AND t.id = ?' if task_id else ''}
         ORDER BY t.id DESC
-    ''').fetchall()
-    
-    # Get calendar events for the mini calendar
-    # Get tasks that should appear in calendar (either planned or deadline dates)
-    calendar_tasks = conn.execute('''
-        SELECT t.*, p.name as project_name, p.identifier as project_identifier, p.responsible as project_responsible
-        FROM tasks t
-        JOIN projects p ON t.project_id = p.id
-        WHERE t.show_in_calendar = 1 AND (t.planned_date IS NOT NULL OR t.deadline IS NOT NULL)
-        ORDER BY 
-            CASE WHEN t.planned_start_time IS NOT NULL THEN 0 ELSE 1 END,
-            t.planned_date ASC,
-            t.planned_start_time ASC,
-            t.id DESC
-    ''').fetchall()
+        LIMIT ?
+    ''', ([after] if after else []) + ([task_id] if task_id else []) + [limit + 1]).fetchall()
+    tasks, has_more = split_page(tasks, limit)
+    next_url = next_page_url(tasks[-1]['id']) if has_more else None
     
-    # Add overdue status to tasks
-    from datetime import date
-    today = date.today().strftime('%Y-%m-%d')
-    for i, task in enumerate(tasks):
-        is_overdue = False
-        if task['deadline'] and task['deadline'] < today:
-            is_overdue = True
-        elif task['planned_date'] and task['planned_date'] < today:
-            is_overdue = True
-        tasks[i] = dict(task)
-        tasks[i]['overdue'] = is_overdue
-    
-    # Format calendar events
-    calendar_events = []
-    for task in calendar_tasks:
-        # Add planned date event if exists
-        if task['planned_date']:
-            # Use the task's color if available, otherwise default to priority-based colors
-            color = task['color'] if task['color'] else (
-                '#e03131' if task['priority'] == 'Срочный' else 
-                '#ff9f43' if task['priority'] == 'Важный' else
-                '#1098ad' if task['priority'] == 'Базовый' else
-                '#6c757d' if task['priority'] == 'Низкий' else '#3498db'
-            )
-            
-            # Combine date and time if both exist
-            start_datetime = task['planned_date']
-            if task['planned_start_time']:
-                start_datetime = f"{task['planned_date']}T{task['planned_start_time']}"
-            
-            calendar_events.append({
-                'title': f"[{task['project_identifier']}-{task['id']}] {task['title']}",
-                'start': start_datetime,
-                'color': color,
-                'extendedProps': {
-                    'taskId': task['id'],
-                    'projectId': task['project_id'],
-                    'description': task['description'],
-                    'priority': task['priority'],
-                    'completed': task['completed'],
-                    'color': task['color'],
-                    'startTime': task['planned_start_time']
-                }
-            })
-        
-        # Add deadline event if exists and it's different from planned date
-        if task['deadline'] and task['deadline'] != task['planned_date']:
-            # Use the task's color if available, otherwise default to red for deadlines
-            color = task['color'] if task['color'] else '#e03131'
-            
-            calendar_events.append({
-                'title': f"[{task['project_identifier']}-{task['id']}] DEADLINE: {task['title']}",
-                'start': task['deadline'],
-                'color': color,
-                'extendedProps': {
-                    'taskId': task['id'],
-                    'projectId': task['project_id'],
-                    'description': task['description'],
-                    'priority': task['priority'],
-                    'completed': task['completed'],
-                    'color': task['color'],
-                    'startTime': None
-                }
-            })
-    
-    conn.close()
-    
-    return render_template('index.html', tasks=tasks, events=json.dumps(calendar_events))
+    # Calendar events are loaded lazily from /api/calendar_events for the visible range
+    return render_template('index.html', tasks=tasks, next_page_url=next_url)
+
+# Task counts of the projects p, read from the trigger-maintained project_stats
+# and project_due_dates tables (see init_db.py) instead of counting tasks
+PROJECT_COUNTS = '''
+    COALESCE(s.open_tasks, 0) AS open_tasks,
+    COALESCE(s.completed_tasks, 0) AS completed_tasks,
+    (SELECT COALESCE(SUM(d.open_tasks), 0) FROM project_due_dates d
+     WHERE d.project_id = p.id AND d.due_date < date('now', 'localtime')) AS overdue_tasks
+'''
 
 @app.route('/projects')
 def projects():
     conn = get_db_connection()
-    projects = conn.execute('SELECT * FROM projects').fetchall()
-    conn.close()
+    projects = conn.execute(f'''
+        SELECT p.*, {PROJECT_COUNTS}
+        FROM projects p
+        LEFT JOIN project_stats s ON s.project_id = p.id
+    ''').fetchall()
     return render_template('projects.html', projects=projects)
 
 @app.route('/project/<int:project_id>')
 def project_detail(project_id):
     conn = get_db_connection()
-    project = conn.execute('SELECT * FROM projects WHERE id = ?', (project_id,)).fetchone()
-    tasks = conn.execute('SELECT * FROM tasks WHERE project_id = ?', (project_id,)).fetchall()
-    
-    # Add overdue status to tasks
-    from datetime import date
-    today = date.today().strftime('%Y-%m-%d')
-    for i, task in enumerate(tasks):
-        is_overdue = False
-        if task['deadline'] and task['deadline'] < today:
-            is_overdue = True
-        elif task['planned_date'] and task['planned_date'] < today:
-            is_overdue = True
-        tasks[i] = dict(task)
-        tasks[i]['overdue'] = is_overdue
-    
-    conn.close()
+    project = conn.execute(f'''
+        SELECT p.*, {PROJECT_COUNTS}
+        FROM projects p
+        LEFT JOIN project_stats s ON s.project_id = p.id
+        WHERE p.id = ?
+    ''', (project_id,)).fetchone()
+    tasks = conn.execute('SELECT * FROM task_list_v WHERE project_id = ?', (project_id,)).fetchall()
+    
     return render_template('project_detail.html', project=project, tasks=tasks)
 
 @app.route('/task/<int:task_id>')
 def task_detail(task_id):
     conn = get_db_connection()
+    # Archived tasks too
     task = conn.execute('''
         SELECT t.*, p.identifier as project_identifier, p.name as project_name, p.responsible as project_responsible 
-        FROM tasks t 
+        FROM all_tasks_v t 
         JOIN projects p ON t.project_id = p.id 
         WHERE t.id = ?
     ''', (task_id,)).fetchone()
     
-    # Calculate task number within project (count of tasks in project with ID <= current task ID)
-    task_number_in_project = conn.execute(
-        'SELECT COUNT(*) FROM tasks WHERE project_id = ? AND id <= ?', 
-        (task['project_id'], task_id)
-    ).fetchone()[0]
-    
     # Generate task ID (project identifier + task number in project)
-    task_id_display = f"{task['project_identifier']}-{task_number_in_project}"
+    task_id_display = f"{task['project_identifier']}-{task['task_number']}"
     
-    conn.close()
     return render_template('task_detail.html', task=task, task_id_display=task_id_display)
 
+@app.route('/task/<string:display_id>')
+def task_by_display_id(display_id):
+    """Open a task by its display ID (project identifier + task number, e.g. SP-3)"""
+    identifier, _, number = display_id.rpartition('-')
+    if not identifier or not number.isdigit():
+        return "Task not found", 404
+    
+    conn = get_db_connection()
+    # One lookup per table on its task number index (idx_tasks_number, idx_tasks_archive_number);
+    # not UNIQUE indexes, but a project never has two tasks with the same number
+    task = conn.execute('''
+        SELECT t.id
+        FROM projects p
+        JOIN all_tasks_v t ON t.project_id = p.id AND t.task_number = ?
+        WHERE p.identifier = ?
+    ''', (int(number), identifier)).fetchone()
+    if not task:
+        return "Task not found", 404
+    
+    return redirect(url_for('task_detail', task_id=task['id']))
+
 @app.route('/create_project', methods=['GET', 'POST'])
 def create_project():
     if request.method == 'POST':
@@ -176,14 +263,10 @@ def create_project():
         identifier = request.form['identifier']
         responsible = request.form.get('responsible', '')
         
-        conn = get_db_connection()
         try:
-            conn.execute('INSERT INTO projects (name, identifier, responsible) VALUES (?, ?, ?)', (name, identifier, responsible))
-            conn.commit()
+            execute_write('INSERT INTO projects (name, identifier, responsible) VALUES (?, ?, ?)', (name, identifier, responsible))
         except sqlite3.IntegrityError:
-            conn.close()
             return "Project identifier must be unique", 400
-        conn.close()
         
         return redirect(url_for('projects'))
     
@@ -215,18 +298,15 @@ def create_task(project_id):
         if completed:
             completion_date = datetime.now().strftime('%Y-%m-%d')
         
-        conn.execute('''
+        execute_write('''
             INSERT INTO tasks (project_id, title, description, planned_date, planned_start_time, deadline, 
                               priority, show_in_calendar, completed, completion_date, color, kanban_enabled, kanban_status, responsible)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (project_id, title, description, planned_date, planned_start_time, deadline, 
               priority, show_in_calendar, completed, completion_date, color, kanban_enabled, kanban_status, responsible))
-        conn.commit()
-        conn.close()
         
         return redirect(url_for('project_detail', project_id=project_id))
     
-    conn.close()
     return render_template('create_task.html', project=project, prefill_date=prefill_date)
 
 @app.route('/edit_task/<int:task_id>', methods=['GET', 'POST'])
@@ -238,6 +318,11 @@ def edit_task(task_id):
         JOIN projects p ON t.project_id = p.id 
         WHERE t.id = ?
     ''', (task_id,)).fetchone()
+    if not task:
+        # Archived tasks are read-only: show them instead of the edit form
+        if conn.execute('SELECT 1 FROM tasks_archive WHERE id = ?', (task_id,)).fetchone():
+            return redirect(url_for('task_detail', task_id=task_id))
+        return "Task not found", 404
     
     # Get all projects for the move-to-project feature
     all_projects = conn.execute('SELECT * FROM projects ORDER BY name').fetchall()
@@ -267,191 +352,105 @@ def edit_task(task_id):
             # Keep existing completion date if task was already completed
             completion_date = task['completion_date']
         
-        conn.execute('''
+        execute_write('''
             UPDATE tasks SET title=?, description=?, planned_date=?, planned_start_time=?, deadline=?, 
                           priority=?, show_in_calendar=?, completed=?, completion_date=?, color=?, kanban_enabled=?, kanban_status=?, responsible=?
             WHERE id = ?
         ''', (title, description, planned_date, planned_start_time, deadline, priority, 
               show_in_calendar, completed, completion_date, color, kanban_enabled, kanban_status, responsible, task_id))
-        conn.commit()
-        conn.close()
         
         return redirect(url_for('task_detail', task_id=task_id))
     
-    # Calculate task number within project (count of tasks in project with ID <= current task ID)
-    task_number_in_project = conn.execute(
-        'SELECT COUNT(*) FROM tasks WHERE project_id = ? AND id <= ?', 
-        (task['project_id'], task_id)
-    ).fetchone()[0]
-
     # Generate task ID for display
-    task_id_display = f"{task['project_identifier']}-{task_number_in_project}"
-    conn.close()
+    task_id_display = f"{task['project_identifier']}-{task['task_number']}"
     return render_template('edit_task.html', task=task, task_id_display=task_id_display, all_projects=all_projects)
 
 @app.route('/completed_tasks')
 def completed_tasks():
     conn = get_db_connection()
-    # Get completed tasks that were completed less than a week ago
+    # Get completed tasks that were completed less than a week ago. Two ranges
+    # of idx_tasks_completed, the last week and the tasks completed without a
+    # date, instead of an OR that walks the whole index
+    week_ago = (date.today() - timedelta(days=7)).isoformat()
     tasks = conn.execute('''
-        SELECT t.*, p.name as project_name, p.identifier as project_identifier, p.responsible as project_responsible
-        FROM tasks t
-        JOIN projects p ON t.project_id = p.id
-        WHERE t.completed = 1 
-        AND (
-            t.completion_date IS NULL 
-            OR t.completion_date >= date('now', '-7 days')
-        )
-        ORDER BY t.completion_date DESC, t.id DESC
-    ''').fetchall()
-    
-    # Add overdue status to tasks
-    from datetime import date
-    today = date.today().strftime('%Y-%m-%d')
-    for i, task in enumerate(tasks):
-        is_overdue = False
-        if task['deadline'] and task['deadline'] < today:
-            is_overdue = True
-        elif task['planned_date'] and task['planned_date'] < today:
-            is_overdue = True
-        tasks[i] = dict(task)
-        tasks[i]['overdue'] = is_overdue
-    
-    conn.close()
+        SELECT * FROM task_list_v t
+        WHERE t.completed = 1 AND t.completion_date >= ?
+        UNION ALL
+        SELECT * FROM task_list_v t
+        WHERE t.completed = 1 AND t.completion_date IS NULL
+        ORDER BY completion_date DESC, id DESC
+    ''', (week_ago,)).fetchall()
     
     return render_template('completed_tasks.html', tasks=tasks)
 
 
 @app.route('/all_completed_tasks')
 def all_completed_tasks():
-    """Show all completed tasks including those completed more than a week ago"""
+    """Show all completed tasks including those completed more than a week ago, and the archived ones"""
     conn = get_db_connection()
-    tasks = conn.execute('''
-        SELECT t.*, p.name as project_name, p.identifier as project_identifier, p.responsible as project_responsible
-        FROM tasks t
-        JOIN projects p ON t.project_id = p.id
-        WHERE t.completed = 1
-        ORDER BY t.completion_date DESC, t.id DESC
-    ''').fetchall()
+    limit = get_page_limit()
     
-    # Add overdue status to tasks
-    from datetime import date
-    today = date.today().strftime('%Y-%m-%d')
-    for i, task in enumerate(tasks):
-        is_overdue = False
-        if task['deadline'] and task['deadline'] < today:
-            is_overdue = True
-        elif task['planned_date'] and task['planned_date'] < today:
-            is_overdue = True
-        tasks[i] = dict(task)
-        tasks[i]['overdue'] = is_overdue
+    def fetch(condition, params, count):
+        # The live and archived pages are merged in completion order
+        return conn.execute(f'''
+            SELECT t.*, p.name as project_name, p.identifier as project_identifier, p.responsible as project_responsible
+            FROM all_tasks_v t
+            JOIN projects p ON t.project_id = p.id
+            WHERE t.completed = 1 {condition}
+            ORDER BY t.completion_date DESC, t.id DESC
+            LIMIT ?
+        ''', params + [count]).fetchall()
     
-    conn.close()
+    # The cursor is "<completion_date>:<id>" of the last task shown. Tasks
+    # without a completion date sort last and have an empty date part.
+    after = request.args.get('after', '')
+    after_date, _, after_id = after.rpartition(':')
+    if not after_id.isdigit():
+        # A malformed cursor shows the first page, as request.args.get(type=int) does for the other lists
+        after = ''
+    if not after:
+        tasks = fetch('', [], limit + 1)
+    elif after_date:
+        # Rest of the dated tasks (an index range), then the undated ones
+        tasks = fetch('AND (t.completion_date, t.id) < (?, ?)', [after_date, int(after_id)], limit + 1)
+        if len(tasks) <= limit:
+            tasks += fetch('AND t.completion_date IS NULL', [], limit + 1 - len(tasks))
+    else:
+        tasks = fetch('AND t.completion_date IS NULL AND t.id < ?', [int(after_id)], limit + 1)
+    tasks, has_more = split_page(tasks, limit)
+    next_url = None
+    if has_more:
+        next_url = next_page_url(f"{tasks[-1]['completion_date'] or ''}:{tasks[-1]['id']}")
     
-    return render_template('completed_tasks.html', tasks=tasks, show_all=True)
+    return render_template('completed_tasks.html', tasks=tasks, show_all=True, next_page_url=next_url)
 
 
 @app.route('/kanban')
 def kanban():
     conn = get_db_connection()
+    limit = get_page_limit()
+    after = request.args.get('after', type=int)
+    # Renders just this task when a page patches itself after a change
+    task_id = request.args.get('task_id', type=int)
+    
     # Get all tasks that have Kanban enabled
-    tasks = conn.execute('''
-        SELECT t.*, p.name as project_name, p.identifier as project_identifier, p.responsible as project_responsible
-        FROM tasks t
-        JOIN projects p ON t.project_id = p.id
-        WHERE t.kanban_enabled = 1
+    tasks = conn.execute(f'''
+        SELECT *
+        FROM task_list_v t
+        WHERE t.kanban_enabled = 1 {'AND t.id < ?' if after else ''} {'AND t.id = ?' if task_id else ''}
         ORDER BY t.id DESC
-    ''').fetchall()
-    
-    # Add overdue status to tasks
-    from datetime import date
-    today = date.today().strftime('%Y-%m-%d')
-    for i, task in enumerate(tasks):
-        is_overdue = False
-        if task['deadline'] and task['deadline'] < today:
-            is_overdue = True
-        elif task['planned_date'] and task['planned_date'] < today:
-            is_overdue = True
-        tasks[i] = dict(task)
-        tasks[i]['overdue'] = is_overdue
-    
-    conn.close()
+        LIMIT ?
+    ''', ([after] if after else []) + ([task_id] if task_id else []) + [limit + 1]).fetchall()
+    tasks, has_more = split_page(tasks, limit)
+    next_url = next_page_url(tasks[-1]['id']) if has_more else None
     
-    return render_template('kanban.html', tasks=tasks)
+    return render_template('kanban.html', tasks=tasks, next_page_url=next_url)
 
 
 @app.route('/calendar')
 def calendar():
-    conn = get_db_connection()
-    # Get tasks that should appear in calendar (either planned or deadline dates)
-    # Order by planned date/time, prioritizing tasks with time over those without time
-    tasks = conn.execute('''
-        SELECT t.*, p.name as project_name, p.identifier as project_identifier, p.responsible as project_responsible
-        FROM tasks t
-        JOIN projects p ON t.project_id = p.id
-        WHERE t.show_in_calendar = 1 AND (t.planned_date IS NOT NULL OR t.deadline IS NOT NULL)
-        ORDER BY 
-            CASE WHEN t.planned_start_time IS NOT NULL THEN 0 ELSE 1 END,
-            t.planned_date ASC,
-            t.planned_start_time ASC,
-            t.id DESC
-    ''').fetchall()
-    conn.close()
-    
-    # Format tasks for calendar
-    calendar_events = []
-    for task in tasks:
-        # Add planned date event if exists
-        if task['planned_date']:
-            # Use the task's color if available, otherwise default to priority-based colors
-            color = task['color'] if task['color'] else (
-                '#e03131' if task['priority'] == 'Срочный' else 
-                '#ff9f43' if task['priority'] == 'Важный' else
-                '#1098ad' if task['priority'] == 'Базовый' else
-                '#6c757d' if task['priority'] == 'Низкий' else '#3498db'
-            )
-            
-            # Combine date and time if both exist
-            start_datetime = task['planned_date']
-            if task['planned_start_time']:
-                start_datetime = f"{task['planned_date']}T{task['planned_start_time']}"
-            
-            calendar_events.append({
-                'title': f"[{task['project_identifier']}-{task['id']}] {task['title']}",
-                'start': start_datetime,
-                'color': color,
-                'extendedProps': {
-                    'taskId': task['id'],
-                    'projectId': task['project_id'],
-                    'description': task['description'],
-                    'priority': task['priority'],
-                    'completed': task['completed'],
-                    'color': task['color'],
-                    'startTime': task['planned_start_time']
-                }
-            })
-        
-        # Add deadline event if exists and it's different from planned date
-        if task['deadline'] and task['deadline'] != task['planned_date']:
-            # Use the task's color if available, otherwise default to red for deadlines
-            color = task['color'] if task['color'] else '#e03131'
-            
-            calendar_events.append({
-                'title': f"[{task['project_identifier']}-{task['id']}] DEADLINE: {task['title']}",
-                'start': task['deadline'],
-                'color': color,
-                'extendedProps': {
-                    'taskId': task['id'],
-                    'projectId': task['project_id'],
-                    'description': task['description'],
-                    'priority': task['priority'],
-                    'completed': task['completed'],
-                    'color': task['color'],
-                    'startTime': None
-                }
-            })
-    
-    return render_template('calendar.html', events=json.dumps(calendar_events))
+    # Events are loaded lazily from /api/calendar_events for the visible range
+    return render_template('calendar.html')
 
 
 @app.route('/select_project_for_task')
@@ -459,7 +458,6 @@ def select_project_for_task():
     """Show project selection page for creating a task"""
     conn = get_db_connection()
     projects = conn.execute('SELECT * FROM projects ORDER BY name').fetchall()
-    conn.close()
     
     return render_template('select_project.html', projects=projects)
 
@@ -473,30 +471,28 @@ def create_task_from_calendar():
     redirect_url = url_for('select_project_for_task') + f'?date={date}' if date else url_for('select_project_for_task')
     return jsonify({'redirect_url': redirect_url})
 
-@app.route('/create_task_without_project', methods=['GET', 'POST'])
-def create_task_without_project():
-    """Create a task without selecting a project first (for dump project)"""
+def create_quick_task(conn):
+    """Insert a default task into the dump project (created if needed), return its id"""
     # Find or create dump project
-    conn = get_db_connection()
     dump_project = conn.execute("SELECT id FROM projects WHERE identifier = 'dump'").fetchone()
     
     if not dump_project:
         # Create dump project if it doesn't exist
-        conn.execute("INSERT INTO projects (name, identifier, responsible) VALUES ('Dump', 'dump', '')")
-        dump_project_id = conn.execute("SELECT id FROM projects WHERE identifier = 'dump'").fetchone()[0]
+        dump_project_id = conn.execute("INSERT INTO projects (name, identifier, responsible) VALUES ('Dump', 'dump', '')").lastrowid
     else:
         dump_project_id = dump_project[0]
     
     # Create task with default values
-    conn.execute('''
+    return conn.execute('''
         INSERT INTO tasks (project_id, title, description, planned_date, planned_start_time, deadline, 
                           priority, show_in_calendar, completed, completion_date, color, kanban_enabled, kanban_status, responsible)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (dump_project_id, 'Quick Note', '', None, None, None, 'Базовый', True, False, None, '#1098ad', True, 'Новая', ''))
-    
-    task_id = conn.execute('SELECT id FROM tasks ORDER BY id DESC LIMIT 1').fetchone()[0]
-    conn.commit()
-    conn.close()
+    ''', (dump_project_id, 'Quick Note', '', None, None, None, 'Базовый', True, False, None, '#1098ad', True, 'Новая', '')).lastrowid
+
+@app.route('/create_task_without_project', methods=['GET', 'POST'])
+def create_task_without_project():
+    """Create a task without selecting a project first (for dump project)"""
+    task_id = write(create_quick_task)
     
     if request.method == 'POST':
         return jsonify({'redirect_url': url_for('edit_task', task_id=task_id)})
@@ -505,11 +501,15 @@ def create_task_without_project():
         return redirect(url_for('edit_task', task_id=task_id))
 
 @app.route('/api/projects')
+@conditional_on_data_version
 def api_projects():
-    """API endpoint to get all projects"""
+    """API endpoint to get all projects with their open, completed and overdue task counts"""
     conn = get_db_connection()
-    projects = conn.execute('SELECT id, name, identifier FROM projects').fetchall()
-    conn.close()
+    projects = conn.execute(f'''
+        SELECT p.id, p.name, p.identifier, {PROJECT_COUNTS}
+        FROM projects p
+        LEFT JOIN project_stats s ON s.project_id = p.id
+    ''').fetchall()
     
     projects_list = []
     for project in projects:
@@ -518,111 +518,377 @@ def api_projects():
     return jsonify(projects_list)
 
 
-@app.route('/api/tasks')
-def api_tasks():
-    conn = get_db_connection()
-    tasks = conn.execute('''
-        SELECT t.*, p.name as project_name, p.identifier as project_identifier, p.responsible as project_responsible
+# Rows fetched from the cursor per chunk when streaming an export
+STREAM_BATCH_SIZE = 500
+
+# Fields of the task APIs as SQL over a task t joined with its project p.
+# ``fields=title,deadline`` narrows the SELECT itself to those columns.
+TASK_API_FIELDS = {
+    **{column: f't.{column}' for column in ['id'] + TASK_COLUMNS},
+    'project_name': 'p.name',
+    'project_identifier': 'p.identifier',
+    'project_responsible': 'p.responsible',
+    'overdue': OVERDUE_CONDITION,
+    'id_display': "p.identifier || '-' || t.task_number",
+}
+
+def get_task_fields(available):
+    """Field names from the ``fields`` query parameter, all ``available`` fields without it.
+
+    The ID is always included (it is the paging cursor). Raises ValueError
+    for unknown fields.
+    """
+    fields = request.args.get('fields')
+    if not fields:
+        return list(available)
+    names = ['id'] + [name for name in dict.fromkeys(fields.replace(' ', '').split(',')) if name and name != 'id']
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+def select_fields(names, available):
+    """SELECT list for the given task fields"""
+    return ', '.join(f'{available[name]} AS {name}' for name in names)
+
+def query_tasks_after(conn, after, limit=None, overdue=False, fields=None):
+    """Run the /api/tasks query for tasks with an ID above ``after``, in ID order.
+
+    With ``overdue`` only overdue tasks are selected; ``fields`` are the
+    TASK_API_FIELDS to select (default: all).
+    """
+    conditions = []
+    params = []
+    if after:
+        conditions.append('t.id > ?')
+        params.append(after)
+    if overdue:
+        conditions.append(f't.id IN ({OVERDUE_TASK_IDS})')
+    if limit:
+        params.append(limit)
+    return conn.execute(f'''
+        SELECT {select_fields(fields or TASK_API_FIELDS, TASK_API_FIELDS)}
         FROM tasks t
         JOIN projects p ON t.project_id = p.id
-    ''').fetchall()
-    conn.close()
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        ORDER BY t.id
+        {'LIMIT ?' if limit else ''}
+    ''', params)
+
+def stream_tasks(after, output_format, overdue=False, fields=None):
+    """Yield every task after ``after`` as NDJSON lines or as one JSON array.
+
+    Rows are read from the cursor in batches and written out straight away,
+    so memory use doesn't depend on the number of tasks.
+    """
+    cursor = query_tasks_after(get_db_connection(), after, overdue=overdue, fields=fields)
+    if output_format == 'json-stream':
+        yield '['
+    first = True
+    while True:
+        rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+        if not rows:
+            break
+        encoded = [json.dumps(dict(row), ensure_ascii=False) for row in rows]
+        if output_format == 'ndjson':
+            yield '\n'.join(encoded) + '\n'
+        else:
+            yield ('' if first else ',') + ','.join(encoded)
+        first = False
+    if output_format == 'json-stream':
+        yield ']'
+
+@app.route('/api/tasks')
+@conditional_on_data_version
+def api_tasks():
+    """API endpoint to list tasks by ascending ID, one page at a time.
+
+    ``limit`` sets the page size and ``after`` continues after the given task
+    ID. When more tasks follow, the response carries the next cursor in the
+    ``X-Next-Cursor`` header and the next page URL in a ``Link`` header.
+
+    ``format=ndjson`` (one task per line) and ``format=json-stream`` (a
+    single JSON array) stream every task after ``after`` instead of a page,
+    for exports of the whole table.
+
+    ``overdue=1`` limits the listing to overdue tasks.
+
+    ``fields=title,deadline`` returns only those fields (and the ID), and
+    ``format=columns`` returns a page as ``{"columns": [...], "rows": [[...], ...]}``
+    instead of one object per task.
+    """
+    after = request.args.get('after', type=int)
+    overdue = request.args.get('overdue') == '1'
+    output_format = request.args.get('format', 'json')
+    try:
+        fields = get_task_fields(TASK_API_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if output_format in ('ndjson', 'json-stream'):
+        mimetype = 'application/x-ndjson' if output_format == 'ndjson' else 'application/json'
+        return Response(stream_with_context(stream_tasks(after, output_format, overdue, fields)), mimetype=mimetype)
+    if output_format not in ('json', 'columns'):
+        return jsonify({'error': f'Unknown format: {output_format}'}), 400
     
-    tasks_list = []
-    for task in tasks:
-        task_dict = dict(task)
-        task_dict['id_display'] = f"{task['project_identifier']}-{task['id']}"
-        tasks_list.append(task_dict)
+    conn = get_db_connection()
+    limit = get_page_limit()
+    tasks = query_tasks_after(conn, after, limit + 1, overdue, fields).fetchall()
+    tasks, has_more = split_page(tasks, limit)
     
-    return jsonify(tasks_list)
+    if output_format == 'columns':
+        response = jsonify({'columns': fields, 'rows': [tuple(task) for task in tasks]})
+    else:
+        response = jsonify([dict(task) for task in tasks])
+    if has_more:
+        cursor = tasks[-1]['id']
+        response.headers['X-Next-Cursor'] = str(cursor)
+        response.headers['Link'] = f'<{next_page_url(cursor)}>; rel="next"'
+    return response
+
 
+# Search results per request: default and upper limit
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Shorter last words are matched whole: ranking every task that starts with
+# one or two letters is what would make a typeahead query slow
+MIN_PREFIX_LENGTH = 3
+# Snippet match markers, replaced by <mark> after the snippet is HTML-escaped
+SNIPPET_OPEN, SNIPPET_CLOSE = '\x02', '\x03'
+
+def fts_query(text):
+    """FTS5 query matching every word of ``text``, the last one as a prefix (typeahead)"""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    query = ' '.join(f'"{word}"' for word in words)
+    return query + '*' if len(words[-1]) >= MIN_PREFIX_LENGTH else query
+
+def format_snippet(snippet):
+    """HTML-escape a snippet and highlight its matches with <mark>"""
+    return (html.escape(snippet or '')
+            .replace(SNIPPET_OPEN, '<mark>')
+            .replace(SNIPPET_CLOSE, '</mark>'))
+
+@app.route('/api/search')
+def api_search():
+    """Full-text search over task titles, descriptions and project names.
+
+    ``q`` is matched word by word, the last word as a prefix (from
+    MIN_PREFIX_LENGTH characters), so the endpoint can back a typeahead.
+    Results are ranked by relevance (bm25) and carry an HTML ``snippet``
+    with the matches wrapped in ``<mark>``.
+    """
+    query = fts_query(request.args.get('q', ''))
+    if not query:
+        return jsonify([])
+    limit = max(1, min(request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int), MAX_SEARCH_LIMIT))
+    
+    conn = get_db_connection()
+    try:
+        # The ranked page is taken from the index first, then joined to the tasks
+        results = conn.execute('''
+            SELECT t.id, t.title, t.task_number, t.completed, p.name AS project_name,
+                   p.identifier AS project_identifier, f.snippet
+            FROM (
+                SELECT rowid, rank, snippet(tasks_fts, -1, ?, ?, '…', 12) AS snippet
+                FROM tasks_fts
+                WHERE tasks_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            ) f
+            JOIN tasks t ON t.id = f.rowid
+            JOIN projects p ON t.project_id = p.id
+            ORDER BY f.rank
+        ''', (SNIPPET_OPEN, SNIPPET_CLOSE, query, limit)).fetchall()
+    except sqlite3.OperationalError as e:
+        # No search index: SQLite without FTS5
+        return jsonify({'error': f'Search is unavailable: {e}'}), 503
+    
+    return jsonify([
+        {
+            'id': row['id'],
+            'id_display': f"{row['project_identifier']}-{row['task_number']}",
+            'title': row['title'],
+            'project_name': row['project_name'],
+            'completed': row['completed'],
+            'snippet': format_snippet(row['snippet']),
+            'url': url_for('task_detail', task_id=row['id']),
+        }
+        for row in results
+    ])
 
 @app.route('/api/calendar_events')
+@conditional_on_data_version
 def api_calendar_events():
-    """API endpoint to get calendar events for the index page calendar"""
+    """API endpoint to get calendar events, optionally limited to a date range.
+
+    FullCalendar passes the visible range as ``start``/``end`` (ISO dates, end
+    exclusive); only events whose planned date or deadline falls inside it
+    are returned. ``project_id`` narrows the events to a single project.
+    Events are read ready-made from the trigger-maintained calendar_events table.
+    """
+    # FullCalendar sends datetimes like 2024-01-29T00:00:00+03:00, the date part is enough
+    start = request.args.get('start', '')[:10]
+    end = request.args.get('end', '')[:10]
+    project_id = request.args.get('project_id', type=int)
+    
+    conditions = []
+    params = []
+    if start and end:
+        conditions.append('event_date >= ? AND event_date < ?')
+        params.extend([start, end])
+    if project_id:
+        conditions.append('project_id = ?')
+        params.append(project_id)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
     conn = get_db_connection()
-    # Get tasks that should appear in calendar (either planned or deadline dates)
-    tasks = conn.execute('''
-        SELECT t.*, p.name as project_name, p.identifier as project_identifier, p.responsible as project_responsible
-        FROM tasks t
-        JOIN projects p ON t.project_id = p.id
-        WHERE t.show_in_calendar = 1 AND (t.planned_date IS NOT NULL OR t.deadline IS NOT NULL)
-        ORDER BY 
-            CASE WHEN t.planned_start_time IS NOT NULL THEN 0 ELSE 1 END,
-            t.planned_date ASC,
-            t.planned_start_time ASC,
-            t.id DESC
-    ''').fetchall()
-    conn.close()
-    
-    # Format tasks for calendar
-    calendar_events = []
-    for task in tasks:
-        # Add planned date event if exists
-        if task['planned_date']:
-            # Use the task's color if available, otherwise default to priority-based colors
-            color = task['color'] if task['color'] else (
-                '#e03131' if task['priority'] == 'Срочный' else 
-                '#ff9f43' if task['priority'] == 'Важный' else
-                '#1098ad' if task['priority'] == 'Базовый' else
-                '#6c757d' if task['priority'] == 'Низкий' else '#3498db'
-            )
-            
-            # Combine date and time if both exist
-            start_datetime = task['planned_date']
-            if task['planned_start_time']:
-                start_datetime = f"{task['planned_date']}T{task['planned_start_time']}"
-            
-            calendar_events.append({
-                'title': f"[{task['project_identifier']}-{task['id']}] {task['title']}",
-                'start': start_datetime,
-                'color': color,
-                'extendedProps': {
-                    'taskId': task['id'],
-                    'projectId': task['project_id'],
-                    'description': task['description'],
-                    'priority': task['priority'],
-                    'completed': task['completed'],
-                    'color': task['color'],
-                    'startTime': task['planned_start_time']
-                }
-            })
-        
-        # Add deadline event if exists and it's different from planned date
-        if task['deadline'] and task['deadline'] != task['planned_date']:
-            # Use the task's color if available, otherwise default to red for deadlines
-            color = task['color'] if task['color'] else '#e03131'
-            
-            calendar_events.append({
-                'title': f"[{task['project_identifier']}-{task['id']}] DEADLINE: {task['title']}",
-                'start': task['deadline'],
-                'color': color,
-                'extendedProps': {
-                    'taskId': task['id'],
-                    'projectId': task['project_id'],
-                    'description': task['description'],
-                    'priority': task['priority'],
-                    'completed': task['completed'],
-                    'color': task['color'],
-                    'startTime': None
-                }
-            })
-    
-    return jsonify(calendar_events)
+    # The JSON array is assembled by SQLite from the stored event objects
+    events = conn.execute(f'''
+        SELECT json_group_array(json(event))
+        FROM (SELECT event FROM calendar_events {where} ORDER BY event_date)
+    ''', params).fetchone()[0]
+    
+    return app.response_class(events, mimetype='application/json')
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Per-endpoint request and SQL metrics in the Prometheus text format.
+
+    Only available when metrics are enabled (TASK_TRACKER_METRICS=1).
+    """
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# A change stream is closed after STREAM_LIFETIME seconds; EventSource then
+# reconnects with Last-Event-ID and continues where it left off. This bounds
+# how long a client holds a server thread (where streams aren't handed to
+# stream_hub), and a comment line every STREAM_KEEPALIVE seconds keeps
+# proxies from closing an idle stream.
+STREAM_LIFETIME = 300
+STREAM_KEEPALIVE = 15
+
+def stream_changes(feed, subscription, backlog, version):
+    """Yield the backlog and then every published change as server-sent events"""
+    try:
+        yield 'retry: 2000\n\n'
+        for change in backlog:
+            yield format_change_event(change)
+        deadline = time.monotonic() + STREAM_LIFETIME
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                change = subscription.get(timeout=min(STREAM_KEEPALIVE, remaining))
+            except queue.Empty:
+                yield ': keepalive\n\n'
+                continue
+            # The server is shutting down; EventSource reconnects elsewhere
+            if change is None:
+                break
+            # Changes already sent from the backlog
+            if change['version'] <= version:
+                continue
+            version = change['version']
+            yield format_change_event(change)
+    finally:
+        feed.unsubscribe(subscription)
+
+def hand_over_stream(sock, stream, head, version):
+    """Response body that gives the client connection to the stream hub, which sends ``head`` first"""
+    # Runs once the server is done with the response, so the hub is the only writer
+    hub_sock = sock.dup()
+    try:
+        stream_hub.hub.start(stream, hub_sock, head.encode('utf-8'), version, STREAM_LIFETIME, STREAM_KEEPALIVE)
+    except BaseException:
+        hub_sock.close()
+        raise
+    raise stream_hub.handed_over()
+    yield
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-sent events for every change to tasks and projects.
+
+    Each ``task-changed`` / ``project-changed`` event carries the change_log
+    row: version, action, task_id, project_id and the changed task fields.
+    Archived tasks come as one ``tasks-archived`` event per project and batch.
+    A reconnecting client sends the last version it saw as ``Last-Event-ID``
+    (or ``since``) and first receives the changes it missed; if those are no
+    longer in change_log, or after a bulk load, it gets a ``reload`` event.
+    """
+    version = request.headers.get('Last-Event-ID', type=int)
+    if version is None:
+        version = request.args.get('since', type=int)
+    
+    feed = get_change_feed(DATABASE)
+    sock = stream_hub.detachable_socket(request.environ)
+    # Subscribe before reading the backlog so nothing falls in between
+    subscription = feed.subscribe(stream_hub.hub.stream(feed) if sock is not None else None)
+    try:
+        response = stream_response(feed, subscription, sock, version)
+    except BaseException:
+        feed.unsubscribe(subscription)
+        raise
+
+    def unsubscribe():
+        # Also when the body never ran; once the hub has the stream, it
+        # unsubscribes the stream itself when it ends
+        if sock is None or not subscription.started:
+            feed.unsubscribe(subscription)
+    response.call_on_close(unsubscribe)
+    return response
+
+def stream_response(feed, subscription, sock, version):
+    """The /api/stream response for a subscribed stream: backlog since ``version``, then the changes"""
+    conn = get_db_connection()
+    backlog = []
+    if version is None:
+        version = get_data_version()
+    else:
+        oldest = oldest_version(conn)
+        if oldest is not None and oldest > version + 1:
+            return Response('retry: 2000\nevent: reload\ndata: {}\n\n', mimetype='text/event-stream')
+        backlog = changes_since(conn, version)
+        if backlog:
+            version = backlog[-1]['version']
+    
+    if sock is not None:
+        # The hub writes the response itself, on the server's socket
+        head = ''.join([
+            f"{request.environ.get('SERVER_PROTOCOL', 'HTTP/1.1')} 200 OK\r\n",
+            'Content-Type: text/event-stream; charset=utf-8\r\n',
+            'Cache-Control: no-cache\r\n',
+            'X-Accel-Buffering: no\r\n',
+            'Connection: close\r\n\r\n',
+            'retry: 2000\n\n',
+        ] + [format_change_event(change) for change in backlog])
+        return Response(hand_over_stream(sock, subscription, head, version), mimetype='text/event-stream')
+    
+    # No stream_with_context: the pooled connection goes back to the pool
+    # before streaming starts instead of being held by an idle client
+    response = Response(stream_changes(feed, subscription, backlog, version), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# A single task can also be an archived one
+TASK_DETAIL_FIELDS = {**TASK_API_FIELDS, 'archived': 't.archived'}
 
 @app.route('/api/task/<int:task_id>')
 def api_task_details(task_id):
-    """API endpoint to get details of a specific task"""
+    """API endpoint to get details of a specific task (live or archived), optionally only some ``fields``"""
+    try:
+        fields = get_task_fields(TASK_DETAIL_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     conn = get_db_connection()
-    task = conn.execute('''
-        SELECT t.*, p.identifier as project_identifier, p.name as project_name, p.responsible as project_responsible 
-        FROM tasks t 
+    task = conn.execute(f'''
+        SELECT {select_fields(fields, TASK_DETAIL_FIELDS)}
+        FROM all_tasks_v t 
         JOIN projects p ON t.project_id = p.id 
         WHERE t.id = ?
     ''', (task_id,)).fetchone()
     
-    conn.close()
-    
     if task:
         task_dict = dict(task)
         return jsonify(task_dict)
@@ -641,36 +907,31 @@ def update_task_datetime():
     if not task_id:
         return jsonify({'error': 'Task ID is required'}), 400
     
-    conn = get_db_connection()
     try:
         # Update the task with new planned date and time
         if planned_time:
             # If time is provided, update both date and time
-            conn.execute(
+            execute_write(
                 '''UPDATE tasks SET planned_date = ?, planned_start_time = ? 
                    WHERE id = ?''',
                 (planned_date, planned_time, task_id)
             )
         else:
             # If no time provided, just update the date
-            conn.execute(
+            execute_write(
                 '''UPDATE tasks SET planned_date = ?, planned_start_time = NULL 
                    WHERE id = ?''',
                 (planned_date, task_id)
             )
         
-        conn.commit()
-        
         # Get updated task data
-        updated_task = conn.execute(
+        updated_task = get_db_connection().execute(
             '''SELECT t.*, p.identifier as project_identifier 
                FROM tasks t 
                JOIN projects p ON t.project_id = p.id 
                WHERE t.id = ?''', (task_id,)
         ).fetchone()
         
-        conn.close()
-        
         if updated_task:
             task_dict = dict(updated_task)
             return jsonify({'success': True, 'task': task_dict})
@@ -678,7 +939,6 @@ def update_task_datetime():
             return jsonify({'error': 'Task not found'}), 404
             
     except Exception as e:
-        conn.close()
         return jsonify({'error': str(e)}), 500
 
 
@@ -688,10 +948,7 @@ def update_kanban_status():
     task_id = data.get('task_id')
     new_status = data.get('new_status')
     
-    conn = get_db_connection()
-    conn.execute('UPDATE tasks SET kanban_status = ? WHERE id = ?', (new_status, task_id))
-    conn.commit()
-    conn.close()
+    execute_write('UPDATE tasks SET kanban_status = ? WHERE id = ?', (new_status, task_id))
     
     return jsonify({'success': True})
 
@@ -702,11 +959,8 @@ def update_task_visibility():
     show_in_calendar = data.get('show_in_calendar')
     kanban_enabled = data.get('kanban_enabled')
     
-    conn = get_db_connection()
-    conn.execute('UPDATE tasks SET show_in_calendar = ?, kanban_enabled = ? WHERE id = ?', 
-                 (show_in_calendar, kanban_enabled, task_id))
-    conn.commit()
-    conn.close()
+    execute_write('UPDATE tasks SET show_in_calendar = ?, kanban_enabled = ? WHERE id = ?', 
+                  (show_in_calendar, kanban_enabled, task_id))
     
     return jsonify({'success': True})
 
@@ -716,16 +970,12 @@ def toggle_task_completed():
     task_id = data.get('task_id')
     completed = data.get('completed')
     
-    conn = get_db_connection()
-    
     completion_date = None
     if completed:
         completion_date = datetime.now().strftime('%Y-%m-%d')
     
-    conn.execute('UPDATE tasks SET completed = ?, completion_date = ? WHERE id = ?', 
-                 (completed, completion_date, task_id))
-    conn.commit()
-    conn.close()
+    execute_write('UPDATE tasks SET completed = ?, completion_date = ? WHERE id = ?', 
+                  (completed, completion_date, task_id))
     
     return jsonify({'success': True})
 
@@ -747,41 +997,123 @@ def move_task_to_project():
             return jsonify({'error': 'Project not found'}), 404
         
         # Update task's project
-        conn.execute('UPDATE tasks SET project_id = ? WHERE id = ?', (project_id, task_id))
-        conn.commit()
-        conn.close()
+        execute_write('UPDATE tasks SET project_id = ? WHERE id = ?', (project_id, task_id))
         
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
-def check_ip_in_whitelist(ip_address):
-    """Check if IP address is in the whitelist"""
-    try:
-        with open('../whitelist.txt', 'r') as f:
-            whitelist = f.read().strip().split('\n')
-            whitelist = [line.strip() for line in whitelist if line.strip() and not line.startswith('#')]
-    except FileNotFoundError:
-        # If whitelist file doesn't exist, allow all IPs for backward compatibility
-        return True
-    
-    # Check exact match or subnet match
-    import ipaddress
-    for entry in whitelist:
-        try:
-            if '/' in entry:  # Subnet notation
-                network = ipaddress.IPv4Network(entry, strict=False)
-                if ipaddress.IPv4Address(ip_address) in network:
-                    return True
-            else:  # Exact IP match
-                if ip_address == entry:
-                    return True
-        except ValueError:
-            # Skip invalid entries
+def is_id(value):
+    # JSON true would otherwise match ID 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def is_flag(value):
+    return isinstance(value, bool) or (is_id(value) and value in (0, 1))
+
+def is_optional_text(value):
+    return value is None or isinstance(value, str)
+
+# Task columns a bulk patch may set: (check of the value, what it must be)
+BULK_PATCH_FIELDS = {
+    'kanban_status': (lambda value: isinstance(value, str), 'a string'),
+    'planned_date': (is_optional_text, 'a date string or null'),
+    'planned_start_time': (is_optional_text, 'a time string or null'),
+    'show_in_calendar': (is_flag, 'true or false'),
+    'kanban_enabled': (is_flag, 'true or false'),
+    'completed': (is_flag, 'true or false'),
+    'project_id': (is_id, 'a project ID'),
+}
+# The most patches accepted per request
+MAX_BULK_PATCHES = 1000
+
+@app.route('/api/tasks/bulk', methods=['POST'])
+def bulk_update_tasks():
+    """Apply a list of task patches in a single transaction.
+
+    The body is a JSON list (or ``{"patches": [...]}``) of objects with a
+    ``task_id`` and the columns to set, e.g.
+    ``{"task_id": 7, "kanban_status": "В работе", "completed": true}``.
+    Setting ``completed`` also sets the completion date, as
+    /api/toggle_task_completed does. Invalid patches are reported in the
+    per-item ``results`` and skipped; the valid ones are written with one
+    ``executemany`` per run of patches setting the same columns and a single
+    commit.
+    """
+    data = request.get_json(silent=True)
+    patches = data.get('patches') if isinstance(data, dict) else data
+    if not isinstance(patches, list):
+        return jsonify({'error': 'Expected a list of task patches'}), 400
+    if len(patches) > MAX_BULK_PATCHES:
+        return jsonify({'error': f'At most {MAX_BULK_PATCHES} patches per request'}), 400
+    
+    conn = get_db_connection()
+    patches = [patch if isinstance(patch, dict) else {} for patch in patches]
+    # Look up every referenced task and project at once
+    task_ids = json.dumps([patch.get('task_id') for patch in patches if is_id(patch.get('task_id'))])
+    existing_tasks = {row[0] for row in conn.execute(
+        'SELECT id FROM tasks WHERE id IN (SELECT value FROM json_each(?))', (task_ids,))}
+    project_ids = json.dumps([patch.get('project_id') for patch in patches if is_id(patch.get('project_id'))])
+    existing_projects = {row[0] for row in conn.execute(
+        'SELECT id FROM projects WHERE id IN (SELECT value FROM json_each(?))', (project_ids,))}
+    
+    completion_date = datetime.now().strftime('%Y-%m-%d')
+    results = []
+    # Consecutive patches setting the same columns share one UPDATE statement
+    batches = []
+    for patch in patches:
+        task_id = patch.get('task_id')
+        columns = sorted(set(patch) - {'task_id'})
+        invalid = [column for column in columns
+                   if column in BULK_PATCH_FIELDS and not BULK_PATCH_FIELDS[column][0](patch[column])]
+        error = None
+        if not is_id(task_id):
+            error = 'task_id must be a task ID'
+        elif task_id not in existing_tasks:
+            error = 'Task not found'
+        elif not columns:
+            error = 'Nothing to update'
+        elif not BULK_PATCH_FIELDS.keys() >= set(columns):
+            error = f"Unknown fields: {', '.join(sorted(set(columns) - BULK_PATCH_FIELDS.keys()))}"
+        elif invalid:
+            error = 'Invalid values: ' + ', '.join(
+                f'{column} must be {BULK_PATCH_FIELDS[column][1]}' for column in invalid)
+        elif 'project_id' in columns and patch['project_id'] not in existing_projects:
+            error = 'Project not found'
+        if error:
+            results.append({'task_id': task_id, 'success': False, 'error': error})
             continue
+        
+        # Flags are stored as 0/1
+        values = [int(patch[column]) if BULK_PATCH_FIELDS[column][0] is is_flag else patch[column]
+                  for column in columns]
+        if 'completed' in columns:
+            columns.append('completion_date')
+            values.append(completion_date if patch['completed'] else None)
+        if not batches or batches[-1][0] != columns:
+            batches.append((columns, []))
+        batches[-1][1].append(values + [task_id])
+        results.append({'task_id': task_id, 'success': True})
+    
+    def apply_batches(conn):
+        for columns, rows in batches:
+            assignments = ', '.join(f'{column} = ?' for column in columns)
+            conn.executemany(f'UPDATE tasks SET {assignments} WHERE id = ?', rows)
+    
+    try:
+        # All or nothing: a failing job is rolled back on its own
+        write(apply_batches)
+    except sqlite3.Error as e:
+        return jsonify({'error': str(e)}), 500
     
-    return False
+    return jsonify({'success': all(result['success'] for result in results), 'results': results})
+
+
+whitelist = IPWhitelist()
+
+def check_ip_in_whitelist(ip_address):
+    """Check if IP address is in the whitelist"""
+    return whitelist.allows(ip_address)
 
 
 def get_client_ip():
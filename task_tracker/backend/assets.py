@@ -0,0 +1,120 @@
+"""
+Static assets (static/) with content-hashed URLs for the Task Tracker backend.
+
+Templates link assets with asset_url('css/index.css'), which returns
+/static/css/index.<hash>.css: the hash is taken from the file's content, so
+a changed file gets a new URL and a URL's content never changes. Those URLs
+are served with a one-year ``Cache-Control: immutable``; after the first
+visit a page only downloads its HTML. Requests for an outdated hash get a
+404 instead of the current file under the old, cached-forever name.
+
+The third-party libraries are vendored under static/vendor/ by
+fetch_vendor.py (see VENDOR_SOURCES, which pins each file's sha256), as
+part of the install or deploy.
+Until a library has been fetched, asset_url() links its CDN URL instead;
+run.py warns about that, and refuses to serve in production.
+"""
+
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Vendored library files: the pinned CDN URL each is fetched from, and the
+# sha256 of its content. fetch_vendor.py only writes a download whose sha256
+# matches; a file without one (None) isn't written until it is pinned here.
+VENDOR_SOURCES = {
+    'vendor/bootstrap-5.3.0/bootstrap.min.css': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+        None,
+    ),
+    'vendor/bootstrap-5.3.0/bootstrap.bundle.min.js': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+        None,
+    ),
+    # FullCalendar 6 ships its CSS inside the script
+    'vendor/fullcalendar-6.1.10/index.global.min.js': (
+        'https://cdn.jsdelivr.net/npm/fullcalendar@6.1.10/index.global.min.js',
+        None,
+    ),
+}
+
+# name.<hash>.ext
+HASHED_NAME = re.compile(r'^(?P<stem>.+)\.(?P<hash>[0-9a-f]{%d})(?P<ext>\.[^./]+)$' % HASH_LENGTH)
+
+
+class Asset:
+    __slots__ = ('mtime', 'digest', 'data')
+
+    def __init__(self, mtime, digest, data):
+        self.mtime = mtime
+        self.digest = digest
+        self.data = data
+
+
+_assets = {}
+_lock = threading.Lock()
+
+
+def load(path):
+    """The Asset for a path under static/, re-read when the file changes; None if it doesn't exist"""
+    full_path = os.path.normpath(os.path.join(STATIC_DIR, path))
+    if not full_path.startswith(STATIC_DIR + os.sep):
+        return None
+    try:
+        mtime = os.stat(full_path).st_mtime_ns
+    except OSError:
+        return None
+    asset = _assets.get(path)
+    if asset is None or asset.mtime != mtime:
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        asset = Asset(mtime, hashlib.sha256(data).hexdigest()[:HASH_LENGTH], data)
+        with _lock:
+            _assets[path] = asset
+    return asset
+
+
+def missing_vendor_files():
+    """The VENDOR_SOURCES files not fetched into static/ yet"""
+    return [path for path in VENDOR_SOURCES if not os.path.exists(os.path.join(STATIC_DIR, path))]
+
+
+def missing_vendor_message(missing):
+    return (f"{len(missing)} vendored files are missing from static/ ({', '.join(missing)}); "
+            f"the pages link them from the CDN until you run: python fetch_vendor.py")
+
+
+def hashed_path(path):
+    """css/index.css -> css/index.<hash>.css, or None if the file doesn't exist"""
+    asset = load(path)
+    if asset is None:
+        return None
+    stem, ext = os.path.splitext(path)
+    return f'{stem}.{asset.digest}{ext}'
+
+
+def resolve(filename):
+    """Asset and whether it is immutable for a requested static/ file name, or (None, False).
+
+    Hashed names must carry the current hash; plain names are served too,
+    but have to be revalidated.
+    """
+    match = HASHED_NAME.match(filename)
+    if match:
+        asset = load(match.group('stem') + match.group('ext'))
+        if asset is not None and asset.digest == match.group('hash'):
+            return asset, True
+    return load(filename), False
+
+
+def content_type(filename):
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    if mimetype.startswith('text/') or mimetype == 'application/javascript':
+        mimetype += '; charset=utf-8'
+    return mimetype
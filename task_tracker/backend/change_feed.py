@@ -0,0 +1,140 @@
+"""
+Change feed for the /api/stream endpoint.
+
+A single background thread per process reads new change_log rows and hands
+them to every subscribed stream, so the number of open pages doesn't add
+database queries. The thread is woken right after a request commits a write
+and otherwise polls at POLL_INTERVAL to pick up writes from other processes.
+"""
+
+import json
+import os
+import queue
+import threading
+
+from db import get_pool
+
+# Seconds between change_log polls when no write was announced
+POLL_INTERVAL = 1.0
+
+
+def changes_since(conn, version):
+    """change_log rows after ``version`` as event dicts, oldest first"""
+    rows = conn.execute('''
+        SELECT version, action, task_id, project_id, fields
+        FROM change_log
+        WHERE version > ?
+        ORDER BY version
+    ''', (version,)).fetchall()
+    return [
+        {
+            'version': row['version'],
+            'action': row['action'],
+            'task_id': row['task_id'],
+            'project_id': row['project_id'],
+            'fields': json.loads(row['fields']) if row['fields'] else [],
+        }
+        for row in rows
+    ]
+
+
+def oldest_version(conn):
+    """Oldest version still kept in change_log, or None if it is empty"""
+    return conn.execute('SELECT MIN(version) FROM change_log').fetchone()[0]
+
+
+def format_change_event(change):
+    """Server-sent event for a change_log row, with its version as the event ID"""
+    if change['action'] == 'reload':
+        # Bulk changes (data generation, imports) aren't logged task by task
+        event = 'reload'
+    elif change['action'] == 'archive':
+        # Logged per project and batch by archive_tasks.py, without task_id
+        event = 'tasks-archived'
+    else:
+        event = 'task-changed' if change['task_id'] else 'project-changed'
+    return f"id: {change['version']}\nevent: {event}\ndata: {json.dumps(change)}\n\n"
+
+
+class ChangeFeed:
+    """Fan-out of change_log rows to the subscribed streams."""
+
+    def __init__(self, database, poll_interval=POLL_INTERVAL):
+        self.database = database
+        self.poll_interval = poll_interval
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def subscribe(self, subscription=None):
+        """Register a stream and return what its changes are put on: a new queue or ``subscription``"""
+        if subscription is None:
+            subscription = queue.Queue()
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._thread is None:
+                # Start from the current version, so changes committed once
+                # the first stream has subscribed are all published
+                conn = get_pool(self.database).connect()
+                version = conn.execute('SELECT COALESCE(MAX(version), 0) FROM change_log').fetchone()[0]
+                self._thread = threading.Thread(target=self._run, args=(conn, version),
+                                                name='change-feed', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Stop delivering changes to a stream"""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def close(self):
+        """End every subscribed stream (None is put on their queues)"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for subscription in subscribers:
+            subscription.put(None)
+
+    def notify(self):
+        """Announce that a write was committed, so it is published right away"""
+        self._wakeup.set()
+
+    def _run(self, conn, version):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._lock:
+                subscribers = list(self._subscribers)
+            changes = changes_since(conn, version)
+            if not changes:
+                continue
+            version = changes[-1]['version']
+            for subscription in subscribers:
+                for change in changes:
+                    subscription.put(change)
+
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def get_change_feed(database):
+    """Return the shared change feed for a database file."""
+    path = os.path.abspath(database)
+    with _feeds_lock:
+        feed = _feeds.get(path)
+        if feed is None:
+            feed = _feeds[path] = ChangeFeed(path)
+        return feed
+
+
+def close_change_feeds():
+    """End the streams of every change feed, e.g. when the server shuts down."""
+    with _feeds_lock:
+        feeds = list(_feeds.values())
+    for feed in feeds:
+        feed.close()
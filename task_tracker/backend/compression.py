@@ -0,0 +1,153 @@
+"""
+Response compression for the Task Tracker backend.
+
+Responses are compressed with brotli (if the brotli package is installed) or
+gzip, whichever the client prefers in Accept-Encoding. Small bodies and
+types that don't compress (images, already encoded data) are sent as they
+are; streamed responses (exports) are gzipped chunk by chunk, except the
+server-sent event stream, whose events must not wait in a compressor.
+
+Compressing a large JSON page costs more than building it, so compressed
+bodies of responses with an ETag (the read APIs, tagged with the data
+version) are kept in a small LRU cache: a repeated poll with an unchanged
+ETag gets the stored bytes. A strong ETag is made weak on a compressed
+response, since the bytes differ from the uncompressed ones under that tag.
+
+On unless TASK_TRACKER_COMPRESSION=0 is set (e.g. behind a proxy that
+compresses).
+"""
+
+import collections
+import os
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth the compression headers and CPU
+MIN_SIZE = 1024
+GZIP_LEVEL = 6
+# Brotli's default quality (11) is meant for static files, far too slow per request
+BROTLI_QUALITY = 5
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml', 'image/svg+xml',
+}
+ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+enabled = os.environ.get('TASK_TRACKER_COMPRESSION', '1') != '0'
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return zlib.compress(data, GZIP_LEVEL, wbits=31)
+
+
+def gzip_chunks(chunks):
+    """Gzip a streamed body, flushing after every chunk so it goes out straight away"""
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        # Ends the wrapped generator (and its stream_with_context) when the client goes away
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+class CompressedCache:
+    """Compressed bodies by (encoding, URL, ETag), least recently used dropped first"""
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        # key -> (checksum of the uncompressed body, compressed body)
+        self._entries = collections.OrderedDict()
+
+    def get(self, key, checksum):
+        with self._lock:
+            entry = self._entries.get(key)
+            # A weak ETag only promises an equivalent body, so check it is the same one
+            if entry is None or entry[0] != checksum:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, checksum, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            self._entries[key] = (checksum, data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (_, dropped) = self._entries.popitem(last=False)
+                self.size -= len(dropped)
+
+
+cache = CompressedCache()
+
+
+def compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def compress_response(request, response):
+    """Compress ``response`` for ``request`` if the client accepts it and it is worth it."""
+    if (not enabled or response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers or not compressible(response)
+            or response.mimetype == 'text/event-stream'):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        if not request.accept_encodings['gzip']:
+            return response
+        response.response = gzip_chunks(response.response)
+        response.headers.pop('Content-Length', None)
+        response.content_encoding = 'gzip'
+        weaken_etag(response)
+        return response
+
+    data = response.get_data()
+    if len(data) < MIN_SIZE:
+        return response
+    etag = response.headers.get('ETag')
+    if etag:
+        key = (encoding, request.full_path, etag)
+        checksum = zlib.crc32(data)
+        compressed = cache.get(key, checksum)
+        if compressed is None:
+            compressed = compress(data, encoding)
+            cache.put(key, checksum, compressed)
+    else:
+        compressed = compress(data, encoding)
+    response.set_data(compressed)
+    response.content_encoding = encoding
+    weaken_etag(response)
+    return response
+
+
+def weaken_etag(response):
+    """Mark a strong ETag weak: it promised the bytes of the uncompressed body"""
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
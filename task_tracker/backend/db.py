@@ -0,0 +1,258 @@
+"""
+Database connection management for the Task Tracker backend.
+
+Requests read through pooled read-only connections: configured once when
+they are opened and then reused by later requests instead of reconnecting
+every time. Writes are handed to a single writer thread per database and
+process, which commits the writes queued at the same time in one
+transaction, so request threads never compete for SQLite's write lock.
+Other processes (gunicorn workers, archive_tasks.py, task_io.py) still do:
+their transactions take turns on the lock, waiting up to busy_timeout.
+"""
+
+import concurrent.futures
+import contextvars
+import os
+import queue
+import sqlite3
+import threading
+
+# Applied once to every new connection
+CONNECTION_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',        # readers never block on the writer
+    'PRAGMA synchronous = NORMAL',      # safe with WAL, one fsync per checkpoint
+    'PRAGMA busy_timeout = 5000',       # wait for the write lock instead of failing
+    'PRAGMA cache_size = -16000',       # 16 MB page cache per connection
+    'PRAGMA mmap_size = 268435456',     # 256 MB memory-mapped reads
+]
+
+# Read-only connections can't change the journal mode; they get it from the file
+READ_ONLY_PRAGMAS = [pragma for pragma in CONNECTION_PRAGMAS if 'journal_mode' not in pragma] + [
+    'PRAGMA query_only = ON',
+]
+
+# Most queued writes committed in one transaction
+WRITE_BATCH_SIZE = 100
+
+# Class of new connections (metrics.py swaps in an instrumented one)
+connection_factory = sqlite3.Connection
+
+
+def connect(database, read_only=False):
+    """Open a configured connection, read-only (mode=ro) for the pools."""
+    if read_only:
+        conn = sqlite3.connect(f'file:{database}?mode=ro', uri=True, check_same_thread=False,
+                               factory=connection_factory)
+    else:
+        conn = sqlite3.connect(database, check_same_thread=False, factory=connection_factory)
+    conn.row_factory = sqlite3.Row
+    for pragma in READ_ONLY_PRAGMAS if read_only else CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def enable_wal(database):
+    """Switch the database file to WAL (it stays so), before read-only connections open it."""
+    conn = sqlite3.connect(database)
+    try:
+        conn.execute('PRAGMA journal_mode = WAL')
+    finally:
+        conn.close()
+
+
+class ConnectionPool:
+    """Pool of configured read-only SQLite connections shared by the request threads.
+
+    A connection is checked out by a single request at a time, so it is
+    never used from two threads at once. Idle connections are kept in a LIFO
+    queue so the most recently used (warmest) connection is handed out first.
+    """
+
+    def __init__(self, database, max_idle=16):
+        self.database = database
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def connect(self):
+        """Open a new connection with the pool's settings."""
+        return connect(self.database, read_only=True)
+
+    def acquire(self):
+        """Take an idle connection from the pool or open a new one."""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any uncommitted work."""
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        """Close every idle connection."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class Writer:
+    """The thread that makes every write to a database, one transaction at a time.
+
+    A write is a function run as ``job(conn, *args)`` on the writer's
+    connection; submit() blocks until it has been committed and returns its
+    result. The jobs queued while a transaction commits are written together
+    in the next one, each in its own savepoint: a job that raises is rolled
+    back alone and its exception is raised from its submit(). Jobs must not
+    commit or roll back themselves.
+
+    If the thread stops anyway, the jobs still waiting fail with
+    sqlite3.OperationalError and get_writer() starts a new writer.
+    """
+
+    def __init__(self, database, batch_size=WRITE_BATCH_SIZE):
+        self.database = database
+        self.batch_size = batch_size
+        # A writer doesn't survive a fork (its thread stays behind)
+        self.pid = os.getpid()
+        self._queue = queue.Queue()
+        # Guards stopped against jobs queued after the thread has drained the queue
+        self._lock = threading.Lock()
+        self.stopped = False
+        # Opened here, so connection errors reach the first caller
+        self._conn = connect(database)
+        self._conn.isolation_level = None
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, job, *args):
+        """Run ``job(conn, *args)`` in the next write transaction and return its result once committed."""
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self.stopped:
+                raise sqlite3.OperationalError('The database writer has stopped')
+            # The job runs in the caller's context, so its SQL counts towards the request's metrics
+            self._queue.put((future, contextvars.copy_context(), job, args))
+        return future.result()
+
+    def set_trace_callback(self, callback):
+        """Have ``callback(sql)`` called for every statement the writer runs (None to stop), e.g. in tests."""
+        self._conn.set_trace_callback(callback)
+
+    def close(self):
+        """Write the queued jobs, then stop the thread and close the connection."""
+        with self._lock:
+            if not self.stopped:
+                self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while True:
+                batch = [self._queue.get()]
+                while batch[-1] is not None and len(batch) < self.batch_size:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = batch[-1] is None
+                if stop:
+                    batch.pop()
+                if batch:
+                    try:
+                        self._write(batch)
+                    except BaseException as e:
+                        # A bug in _write itself: fail the batch and keep serving the queue
+                        for future, _, _, _ in batch:
+                            if not future.done():
+                                future.set_exception(e)
+                        if self._conn.in_transaction:
+                            self._conn.execute('ROLLBACK')
+                if stop:
+                    break
+        finally:
+            with self._lock:
+                self.stopped = True
+            # Nothing runs the jobs queued meanwhile; don't leave their callers waiting
+            error = sqlite3.OperationalError('The database writer has stopped')
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].set_exception(error)
+            self._conn.close()
+
+    def _write(self, batch):
+        conn = self._conn
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for future, context, job, args in batch:
+                conn.execute('SAVEPOINT job')
+                try:
+                    outcomes.append((future, context.run(job, conn, *args), None))
+                except BaseException as e:
+                    # BaseException too: a job's SystemExit or KeyboardInterrupt must not end the thread
+                    conn.execute('ROLLBACK TO job')
+                    outcomes.append((future, None, e))
+                conn.execute('RELEASE job')
+            conn.execute('COMMIT')
+        except BaseException as e:
+            # Nothing of the batch was committed (e.g. the write lock of another process timed out)
+            try:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+            finally:
+                for future, _, _, _ in batch:
+                    future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_pools = {}
+_writers = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database):
+    """Return the shared pool for a database file."""
+    path = os.path.abspath(database)
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            enable_wal(path)
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def get_writer(database):
+    """Return the writer of a database file, started on first use in each process (and again if it stopped)."""
+    path = os.path.abspath(database)
+    with _pools_lock:
+        writer = _writers.get(path)
+        if writer is None or writer.pid != os.getpid() or writer.stopped:
+            writer = _writers[path] = Writer(path)
+        return writer
+
+
+def close_all_pools():
+    """Close the idle connections of every pool and stop the writers, e.g. when a worker process exits."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        writers = [writer for writer in _writers.values() if writer.pid == os.getpid()]
+        _writers.clear()
+    for pool in pools:
+        pool.close_all()
+    for writer in writers:
+        writer.close()
@@ -0,0 +1,91 @@
+"""
+IP whitelist for task editing.
+
+The whitelist file holds one IPv4/IPv6 address or CIDR network per line
+(lines starting with '#' are comments). It is parsed once into sorted,
+merged address ranges per IP version, so a lookup is a binary search
+however long the list is. The file is parsed again only when its
+modification time or size changes, so the list can be synced in place.
+"""
+
+import bisect
+import ipaddress
+import os
+import threading
+
+# whitelist.txt next to init_db.py, independent of the working directory
+WHITELIST_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'whitelist.txt')
+
+
+def parse_ranges(lines):
+    """Parse whitelist lines into {version: (starts, ends)} of merged, sorted integer ranges.
+
+    Invalid entries are skipped.
+    """
+    ranges = {4: [], 6: []}
+    for line in lines:
+        entry = line.strip()
+        if not entry or entry.startswith('#'):
+            continue
+        try:
+            network = ipaddress.ip_network(entry, strict=False)
+        except ValueError:
+            continue
+        ranges[network.version].append((int(network.network_address), int(network.broadcast_address)))
+
+    parsed = {}
+    for version, version_ranges in ranges.items():
+        starts, ends = [], []
+        for start, end in sorted(version_ranges):
+            if ends and start <= ends[-1] + 1:
+                # Overlapping or adjacent: extend the previous range
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        parsed[version] = (starts, ends)
+    return parsed
+
+
+class IPWhitelist:
+    """Whitelist loaded from a file and reloaded when the file changes."""
+
+    def __init__(self, path=WHITELIST_PATH):
+        self.path = path
+        self._signature = None
+        self._ranges = None
+        self._lock = threading.Lock()
+
+    def _current_ranges(self):
+        """Ranges from the file, or None if there is no whitelist file"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    with open(self.path, 'r') as f:
+                        self._ranges = parse_ranges(f)
+                    self._signature = signature
+        return self._ranges
+
+    def allows(self, ip_address):
+        """Check if an IP address is whitelisted (everything is allowed without a whitelist file)"""
+        ranges = self._current_ranges()
+        if ranges is None:
+            return True
+
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return False
+        # IPv4 clients seen through an IPv6 socket (::ffff:a.b.c.d)
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+
+        starts, ends = ranges[address.version]
+        value = int(address)
+        i = bisect.bisect_right(starts, value) - 1
+        return i >= 0 and value <= ends[i]
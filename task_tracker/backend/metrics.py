@@ -0,0 +1,268 @@
+"""
+Request and SQL metrics for the Task Tracker backend, exported at /metrics in
+the Prometheus text format.
+
+For every endpoint the request latency, the number and total time of the SQL
+statements it ran, the rows it fetched and the response size are recorded
+as histograms. SQL is measured by the cursors of InstrumentedConnection,
+which the connection pool uses while metrics are enabled.
+
+Metrics are off unless TASK_TRACKER_METRICS=1 is set (or enable() is called):
+the request hooks then return right away, the pool opens plain connections
+(unless the slow query log needs the instrumented ones) and /metrics
+answers 404. They are kept per process, so with several gunicorn
+workers every scrape covers the worker that answered it. Rows fetched while a
+streamed response body is sent (task export) are not counted.
+"""
+
+import bisect
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+
+import db
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 1000)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name: (help, buckets) of the per-request histograms, by endpoint and method
+HISTOGRAMS = {
+    'request_duration_seconds': ('Time to handle a request, until the response is returned', LATENCY_BUCKETS),
+    'sql_duration_seconds': ('Total time of the SQL statements run by a request', LATENCY_BUCKETS),
+    'sql_statements': ('Number of SQL statements run by a request', COUNT_BUCKETS),
+    'sql_rows_fetched': ('Number of rows a request fetched from SQL queries', ROW_BUCKETS),
+    'response_size_bytes': ('Response body size (not known for streamed responses)', SIZE_BUCKETS),
+}
+PREFIX = 'task_tracker_'
+
+enabled = os.environ.get('TASK_TRACKER_METRICS', '') not in ('', '0')
+# Statements a request spends this many seconds on are collected for the
+# slow query log (slow_queries.py); None when it is off
+slow_statement_seconds = None
+
+
+class RequestStats:
+    """SQL work of the current request"""
+    __slots__ = ('statements', 'sql_seconds', 'rows', 'slow_statements')
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        # [sql, parameters, seconds, True] of the statements over slow_statement_seconds
+        self.slow_statements = []
+
+
+# Stats of the request being handled in the current thread, if any
+current_stats = contextvars.ContextVar('current_stats', default=None)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that adds its statements, their time and the fetched rows to the current request's stats.
+
+    The time of a query includes fetching its rows, since SQLite computes
+    them as they are fetched.
+    """
+    # [sql, parameters, seconds, reported as slow] of the last statement executed
+    _statement = None
+
+    def _add_time(self, stats, seconds):
+        stats.sql_seconds += seconds
+        statement = self._statement
+        if statement is None:
+            return
+        statement[2] += seconds
+        if slow_statement_seconds is not None and not statement[3] and statement[2] >= slow_statement_seconds:
+            # Reported once; later fetches keep adding to its time
+            statement[3] = True
+            stats.slow_statements.append(statement)
+
+    def execute(self, sql, parameters=()):
+        stats = current_stats.get()
+        if stats is None:
+            return super().execute(sql, parameters)
+        self._statement = [sql, parameters, 0.0, False]
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            stats.statements += 1
+            self._add_time(stats, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        stats = current_stats.get()
+        if stats is None:
+            return super().executemany(sql, seq_of_parameters)
+        # The parameter sets may be an iterator, so they aren't kept
+        self._statement = [sql, None, 0.0, False]
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            stats.statements += 1
+            self._add_time(stats, time.perf_counter() - start)
+
+    def _fetched(self, fetch, *args):
+        stats = current_stats.get()
+        if stats is None:
+            return fetch(*args)
+        start = time.perf_counter()
+        result = fetch(*args)
+        self._add_time(stats, time.perf_counter() - start)
+        if isinstance(result, list):
+            stats.rows += len(result)
+        elif result is not None:
+            stats.rows += 1
+        return result
+
+    def fetchone(self):
+        return self._fetched(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self._fetched(super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._fetched(super().fetchall)
+
+    def __next__(self):
+        return self._fetched(super().__next__)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including those of execute()) are InstrumentedCursor"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # counts[i] observations in (buckets[i - 1], buckets[i]]; the last one is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Metrics of the requests handled by this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (endpoint, method, status) -> requests
+        self.requests = {}
+        # (endpoint, method) -> {histogram name: Histogram}
+        self.histograms = {}
+
+    def observe(self, endpoint, method, status, seconds, stats, size):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histograms = self.histograms.get((endpoint, method))
+            if histograms is None:
+                histograms = self.histograms[(endpoint, method)] = {
+                    name: Histogram(buckets) for name, (_, buckets) in HISTOGRAMS.items()
+                }
+            histograms['request_duration_seconds'].observe(seconds)
+            histograms['sql_duration_seconds'].observe(stats.sql_seconds)
+            histograms['sql_statements'].observe(stats.statements)
+            histograms['sql_rows_fetched'].observe(stats.rows)
+            if size is not None:
+                histograms['response_size_bytes'].observe(size)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            requests = sorted(self.requests.items())
+            histograms = {
+                key: {name: (list(h.counts), h.sum, h.count) for name, h in by_name.items()}
+                for key, by_name in sorted(self.histograms.items())
+            }
+
+        lines = [
+            f'# HELP {PREFIX}requests_total Requests handled, by endpoint, method and status',
+            f'# TYPE {PREFIX}requests_total counter',
+        ]
+        for (endpoint, method, status), count in requests:
+            lines.append(f'{PREFIX}requests_total{{endpoint="{endpoint}",method="{method}",status="{status}"}} {count}')
+
+        for name, (help_text, buckets) in HISTOGRAMS.items():
+            lines.append(f'# HELP {PREFIX}{name} {help_text}')
+            lines.append(f'# TYPE {PREFIX}{name} histogram')
+            for (endpoint, method), by_name in histograms.items():
+                counts, total, count = by_name[name]
+                labels = f'endpoint="{endpoint}",method="{method}"'
+                cumulative = 0
+                for bound, bucket_count in zip(list(buckets) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    lines.append(f'{PREFIX}{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{PREFIX}{name}_sum{{{labels}}} {total}')
+                lines.append(f'{PREFIX}{name}_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def enable(on=True):
+    """Turn metrics on or off; connections opened from now on are (or aren't) instrumented."""
+    global enabled
+    enabled = on
+    update_connection_factory()
+
+
+def collect_slow_statements(seconds):
+    """Collect the statements that take at least ``seconds`` (None: stop collecting)"""
+    global slow_statement_seconds
+    slow_statement_seconds = seconds
+    update_connection_factory()
+
+
+def collecting():
+    """Whether requests are instrumented (for metrics or the slow query log)"""
+    return enabled or slow_statement_seconds is not None
+
+
+def update_connection_factory():
+    db.connection_factory = InstrumentedConnection if collecting() else sqlite3.Connection
+
+
+def start_request():
+    """Start collecting the SQL stats of a request. Returns the start time."""
+    current_stats.set(RequestStats())
+    return time.perf_counter()
+
+
+def finish_request(endpoint, method, response, started):
+    """Record a finished request in the registry"""
+    stats = current_stats.get() or RequestStats()
+    size = None if response.is_streamed else response.calculate_content_length()
+    registry.observe(endpoint or 'unknown', method, response.status_code, time.perf_counter() - started, stats, size)
+
+
+def end_request():
+    """Stop attributing SQL to the request (the thread moves on to the next one). Returns its stats."""
+    stats = current_stats.get()
+    current_stats.set(None)
+    return stats
+
+
+if enabled:
+    enable()
@@ -0,0 +1,112 @@
+"""
+Slow query log for the Task Tracker backend.
+
+Off unless TASK_TRACKER_SLOW_QUERY_MS is set (or enable() is called). Then
+every SQL statement that a request spends at least that many milliseconds
+on, executing it and fetching its rows, is written to a rotating log file
+(TASK_TRACKER_SLOW_QUERY_LOG, default slow_queries.log) when the request
+ends: the SQL, its parameters, the duration, the route and the output of
+EXPLAIN QUERY PLAN. Plans that read all of the tasks table (a SCAN of tasks,
+directly or through a view) are flagged with FULL SCAN OF tasks, except
+scans a LIMIT stops early (the rows come in the requested order, without
+a temporary B-tree to sort them).
+
+Statements are timed by the instrumented connections from metrics.py.
+"""
+
+import logging
+import logging.handlers
+import os
+import re
+
+import metrics
+
+LOG_PATH = 'slow_queries.log'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+
+# Tables (and views) named after FROM/JOIN, with their optional alias
+TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+# Words that can follow a table name and aren't an alias
+SQL_KEYWORDS = {
+    'where', 'join', 'left', 'right', 'inner', 'outer', 'cross', 'natural', 'on', 'using', 'group', 'order',
+    'limit', 'union', 'except', 'intersect', 'window', 'having', 'indexed', 'not', 'set', 'values', 'returning',
+}
+PLAN_SCAN = re.compile(r'^SCAN (\w+)')
+LIMIT = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+logger = logging.getLogger('task_tracker.slow_queries')
+logger.propagate = False
+
+
+def enable(threshold_ms, path=LOG_PATH):
+    """Log statements taking at least ``threshold_ms`` to ``path`` (None: stop logging)"""
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    if threshold_ms is None:
+        metrics.collect_slow_statements(None)
+        return
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS,
+                                                   encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    metrics.collect_slow_statements(threshold_ms / 1000)
+
+
+def task_aliases(conn, sql, views=None):
+    """Names under which the tasks table appears in the plan of ``sql``, including inside views"""
+    if views is None:
+        views = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'view'").fetchall())
+    aliases = set()
+    for table, alias in TABLE_REFERENCE.findall(sql):
+        if alias.lower() in SQL_KEYWORDS:
+            alias = ''
+        if table.lower() == 'tasks':
+            aliases.add(alias or table)
+        elif table in views:
+            # A flattened view's tables show up under their alias in the view
+            aliases |= task_aliases(conn, views.pop(table), views)
+    return aliases
+
+
+def explain(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN lines of a statement and the tasks full scans among them"""
+    if parameters is None:
+        return ['(not available for executemany)'], False
+    try:
+        rows = conn.execute(f'EXPLAIN QUERY PLAN {sql}', parameters).fetchall()
+    except Exception as e:
+        return [f'(not available: {e})'], False
+
+    # Indent the plan like the sqlite3 shell does
+    depth = {0: -1}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+
+    aliases = task_aliases(conn, sql)
+    full_scan = any((match := PLAN_SCAN.match(detail)) and match.group(1) in aliases
+                    for _, _, _, detail in rows)
+    if full_scan and LIMIT.search(sql) and not any('TEMP B-TREE' in detail for _, _, _, detail in rows):
+        full_scan = False
+    return lines or ['(none)'], full_scan
+
+
+def log_statements(conn, request, statements):
+    """Write the slow statements of a finished request to the log"""
+    for sql, parameters, seconds, _ in statements:
+        plan, full_scan = explain(conn, sql, parameters)
+        sql = ' '.join(sql.split())
+        logger.info(
+            'SLOW %.1f ms %s %s (%s)%s\n  SQL: %s\n  Parameters: %r\n  Plan:\n%s',
+            seconds * 1000, request.method, request.full_path.rstrip('?'), request.endpoint,
+            ' FULL SCAN OF tasks' if full_scan else '', sql, parameters,
+            '\n'.join('    ' + line for line in plan),
+        )
+
+
+if os.environ.get('TASK_TRACKER_SLOW_QUERY_MS'):
+    enable(float(os.environ['TASK_TRACKER_SLOW_QUERY_MS']), os.environ.get('TASK_TRACKER_SLOW_QUERY_LOG', LOG_PATH))
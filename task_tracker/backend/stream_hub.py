@@ -0,0 +1,242 @@
+"""
+Change streams served from a single thread for the Task Tracker backend.
+
+Every open page keeps an /api/stream connection that mostly waits. Sent as
+a streaming response, each of them would hold a server thread for the
+stream's lifetime. Under gunicorn the stream instead takes over the client's
+socket (``environ['gunicorn.socket']``) and the worker thread is free again
+as soon as the stream is set up: one hub thread per process writes the
+events to all taken-over sockets (non-blocking, with a selector), sends the
+keepalives and ends the streams when their lifetime is over.
+
+Servers that don't hand out their sockets (the development server, the test
+client) and TLS connections get the streaming response instead.
+"""
+
+import collections
+import errno
+import selectors
+import socket
+import ssl
+import threading
+import time
+
+from change_feed import format_change_event
+
+# Unsent bytes after which a client that doesn't read is dropped; it
+# reconnects with Last-Event-ID and gets what it missed
+MAX_PENDING = 1024 * 1024
+
+
+def detachable_socket(environ):
+    """The client socket if the server lets a stream take it over, else None"""
+    sock = environ.get('gunicorn.socket')
+    # The TLS session can't be shared with another socket object
+    if sock is None or isinstance(sock, ssl.SSLSocket):
+        return None
+    return sock
+
+
+class HubStream:
+    """A change stream served by the hub: the feed puts its changes here."""
+
+    def __init__(self, hub, feed):
+        self.hub = hub
+        self.feed = feed
+        self.sock = None
+        self.version = None
+        self.pending = bytearray()
+        self.writing = False
+        self.closed = False
+        # Set once the hub owns the stream; until then the request unsubscribes it
+        self.started = False
+        self.deadline = self.next_keepalive = self.keepalive = None
+        # Changes published before the stream started, checked against its backlog then
+        self.early = []
+
+    def put(self, change):
+        """Called by the change feed thread; None ends the stream (shutdown)"""
+        self.hub.post(self, change)
+
+
+class StreamStart:
+    __slots__ = ('sock', 'head', 'version', 'lifetime', 'keepalive')
+
+    def __init__(self, sock, head, version, lifetime, keepalive):
+        self.sock = sock
+        self.head = head
+        self.version = version
+        self.lifetime = lifetime
+        self.keepalive = keepalive
+
+
+class StreamHub:
+    """The thread that writes the events of every taken-over change stream."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (stream, change / None / StreamStart) for the hub thread, in order
+        self._inbox = collections.deque()
+        self._streams = set()
+        self._thread = None
+        self._selector = None
+        self._wakeup = None
+
+    def stream(self, feed):
+        """A new stream to subscribe to ``feed`` before its backlog is read"""
+        return HubStream(self, feed)
+
+    def start(self, stream, sock, head, version, lifetime, keepalive):
+        """Take over ``sock``: send ``head`` (status, headers and backlog), then every change after ``version``.
+
+        The caller gives up the socket; its own copy of the descriptor may be
+        closed (not shut down) without ending the stream.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._selector = selectors.DefaultSelector()
+                wakeup_reader, self._wakeup = socket.socketpair()
+                wakeup_reader.setblocking(False)
+                self._wakeup.setblocking(False)
+                self._selector.register(wakeup_reader, selectors.EVENT_READ, None)
+                self._thread = threading.Thread(target=self._run, name='stream-hub', daemon=True)
+                self._thread.start()
+        stream.started = True
+        self.post(stream, StreamStart(sock, head, version, lifetime, keepalive))
+
+    def post(self, stream, item):
+        self._inbox.append((stream, item))
+        wakeup = self._wakeup
+        if wakeup is not None:
+            try:
+                wakeup.send(b'\0')
+            except OSError:
+                # The socketpair buffer is full: a wake-up is pending anyway
+                pass
+
+    def stream_count(self):
+        return len(self._streams)
+
+    def _run(self):
+        selector = self._selector
+        while True:
+            for key, events in selector.select(self._timeout()):
+                stream = key.data
+                if stream is None:
+                    try:
+                        while key.fileobj.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                if events & selectors.EVENT_READ:
+                    self._read(stream)
+                if events & selectors.EVENT_WRITE and not stream.closed:
+                    self._flush(stream)
+            while self._inbox:
+                self._handle(*self._inbox.popleft())
+            self._tick(time.monotonic())
+
+    def _timeout(self):
+        if self._inbox:
+            return 0
+        if not self._streams:
+            return None
+        next_timer = min(min(stream.deadline, stream.next_keepalive) for stream in self._streams)
+        return max(0, next_timer - time.monotonic())
+
+    def _handle(self, stream, item):
+        if stream.closed:
+            return
+        if isinstance(item, StreamStart):
+            now = time.monotonic()
+            stream.sock = item.sock
+            stream.sock.setblocking(False)
+            stream.version = item.version
+            stream.pending += item.head
+            stream.keepalive = item.keepalive
+            stream.deadline = now + item.lifetime
+            stream.next_keepalive = now + item.keepalive
+            self._streams.add(stream)
+            self._selector.register(stream.sock, selectors.EVENT_READ, stream)
+            early, stream.early = stream.early, None
+            for change in early:
+                self._handle(stream, change)
+            self._flush(stream)
+        elif stream.sock is None:
+            stream.early.append(item)
+        elif item is None:
+            # The server is shutting down; EventSource reconnects elsewhere
+            self._flush(stream)
+            self._close(stream)
+        elif item['version'] > stream.version:
+            stream.version = item['version']
+            stream.pending += format_change_event(item).encode('utf-8')
+            self._flush(stream)
+
+    def _tick(self, now):
+        for stream in list(self._streams):
+            if now >= stream.deadline:
+                self._flush(stream)
+                self._close(stream)
+            elif now >= stream.next_keepalive:
+                stream.next_keepalive = now + stream.keepalive
+                stream.pending += b': keepalive\n\n'
+                self._flush(stream)
+
+    def _read(self, stream):
+        # Clients send nothing after the request; end of file means they are gone
+        try:
+            data = stream.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close(stream)
+
+    def _flush(self, stream):
+        if stream.closed:
+            return
+        if stream.pending:
+            try:
+                sent = stream.sock.send(stream.pending)
+                del stream.pending[:sent]
+            except BlockingIOError:
+                pass
+            except OSError:
+                self._close(stream)
+                return
+        if len(stream.pending) > MAX_PENDING:
+            self._close(stream)
+            return
+        writing = bool(stream.pending)
+        if writing != stream.writing:
+            stream.writing = writing
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if writing else 0)
+            self._selector.modify(stream.sock, events, stream)
+
+    def _close(self, stream):
+        if stream.closed:
+            return
+        stream.closed = True
+        stream.feed.unsubscribe(stream)
+        self._streams.discard(stream)
+        self._selector.unregister(stream.sock)
+        try:
+            stream.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        stream.sock.close()
+
+
+hub = StreamHub()
+
+
+def handed_over():
+    """The error that makes gunicorn drop a connection taken over by a stream.
+
+    gunicorn takes a broken pipe for a client that has gone away: it closes
+    its own descriptor of the socket without writing a response.
+    """
+    return BrokenPipeError(errno.EPIPE, 'Connection taken over by the stream hub')
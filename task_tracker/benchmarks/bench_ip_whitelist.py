@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the IP whitelist lookup.
+
+Writes whitelists of growing size (random IPv4 and IPv6 networks) and
+measures the time per check_ip_in_whitelist() lookup. The lookup time should
+stay flat as the list grows.
+
+Usage: python benchmarks/bench_ip_whitelist.py [--lookups N]
+"""
+
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from ip_whitelist import IPWhitelist
+
+SIZES = [10, 100, 1000, 10000, 100000]
+
+
+def random_entry(rng):
+    """A random IPv4 or IPv6 network or single address"""
+    if rng.random() < 0.7:
+        address = ipaddress.IPv4Address(rng.getrandbits(32))
+        prefix = rng.choice([8, 16, 20, 24, 28, 32])
+    else:
+        address = ipaddress.IPv6Address(rng.getrandbits(128))
+        prefix = rng.choice([32, 48, 56, 64, 128])
+    return str(ipaddress.ip_network(f'{address}/{prefix}', strict=False))
+
+
+def random_address(rng):
+    if rng.random() < 0.7:
+        return str(ipaddress.IPv4Address(rng.getrandbits(32)))
+    return str(ipaddress.IPv6Address(rng.getrandbits(128)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark IP whitelist lookups')
+    parser.add_argument('--lookups', type=int, default=100000, help='Lookups per whitelist size')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    addresses = [random_address(rng) for _ in range(args.lookups)]
+
+    print(f"{'entries':>8}  {'load, ms':>9}  {'lookup, us':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'whitelist.txt')
+        for size in SIZES:
+            with open(path, 'w') as f:
+                f.write('\n'.join(random_entry(rng) for _ in range(size)))
+
+            whitelist = IPWhitelist(path)
+            load = timeit.timeit(lambda: whitelist.allows('127.0.0.1'), number=1)
+            total = timeit.timeit(lambda: [whitelist.allows(address) for address in addresses], number=1)
+            print(f"{size:>8}  {load * 1000:>9.1f}  {total / len(addresses) * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Route benchmark for the Task Tracker application.
+
+Generates databases of several sizes (see generate_data.py), requests every
+route of backend/app.py through the Flask test client and writes the
+timings as JSON, so runs on different commits can be compared:
+
+    python benchmarks/bench_routes.py --sizes 1000 10000 100000
+    python benchmarks/bench_routes.py --compare benchmarks/results/routes-<commit>.json
+
+Write routes are included; they run against the generated data and leave
+it slightly changed between repetitions, like real traffic would.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
+
+import app as backend_app
+from db import close_all_pools
+from generate_data import generate_dataset
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+# Tasks per project in the generated databases
+TASKS_PER_PROJECT = 1000
+# Endpoints that can't be timed as a request/response
+SKIPPED_ENDPOINTS = {'static', 'api_stream'}
+
+
+def benchmark_cases(conn):
+    """(name, endpoint, method, path, request kwargs factory) for every route"""
+    task = conn.execute('''
+        SELECT t.id, t.project_id, t.kanban_status, t.completed, p.identifier, t.task_number
+        FROM tasks t JOIN projects p ON t.project_id = p.id
+        ORDER BY t.id LIMIT 1 OFFSET (SELECT COUNT(*) / 2 FROM tasks)
+    ''').fetchone()
+    task_id, project_id, kanban_status, completed, identifier, task_number = task
+    bulk_ids = [row[0] for row in conn.execute('SELECT id FROM tasks ORDER BY id DESC LIMIT 50')]
+    today = date.today()
+    month_start = today.replace(day=1).isoformat()
+    month_end = (today.replace(day=1) + timedelta(days=42)).isoformat()
+
+    def no_body(i):
+        return {}
+
+    def task_form(i):
+        return {'data': {'title': f'Benchmark task {i}', 'description': 'Created by bench_routes.py',
+                         'planned_date': today.isoformat(), 'priority': 'Базовый'}}
+
+    return [
+        ('index', 'index', 'GET', '/', no_body),
+        ('projects', 'projects', 'GET', '/projects', no_body),
+        ('project_detail', 'project_detail', 'GET', f'/project/{project_id}', no_body),
+        ('task_detail', 'task_detail', 'GET', f'/task/{task_id}', no_body),
+        ('task_by_display_id', 'task_by_display_id', 'GET', f'/task/{identifier}-{task_number}', no_body),
+        ('create_project_form', 'create_project', 'GET', '/create_project', no_body),
+        ('create_project', 'create_project', 'POST', '/create_project',
+         lambda i: {'data': {'name': f'Benchmark {i}', 'identifier': f'BENCH{time.time_ns()}'}}),
+        ('create_task_form', 'create_task', 'GET', f'/create_task/{project_id}', no_body),
+        ('create_task', 'create_task', 'POST', f'/create_task/{project_id}', task_form),
+        ('edit_task_form', 'edit_task', 'GET', f'/edit_task/{task_id}', no_body),
+        ('edit_task', 'edit_task', 'POST', f'/edit_task/{task_id}', task_form),
+        ('completed_tasks', 'completed_tasks', 'GET', '/completed_tasks', no_body),
+        ('all_completed_tasks', 'all_completed_tasks', 'GET', '/all_completed_tasks', no_body),
+        ('kanban', 'kanban', 'GET', '/kanban', no_body),
+        ('calendar', 'calendar', 'GET', '/calendar', no_body),
+        ('select_project_for_task', 'select_project_for_task', 'GET', '/select_project_for_task', no_body),
+        ('create_task_from_calendar', 'create_task_from_calendar', 'POST', '/create_task_from_calendar',
+         lambda i: {'json': {'date': today.isoformat()}}),
+        ('create_task_without_project', 'create_task_without_project', 'POST', '/create_task_without_project',
+         no_body),
+        ('api_projects', 'api_projects', 'GET', '/api/projects', no_body),
+        ('api_tasks', 'api_tasks', 'GET', '/api/tasks', no_body),
+        ('api_tasks_overdue', 'api_tasks', 'GET', '/api/tasks?overdue=1', no_body),
+        ('api_tasks_export_ndjson', 'api_tasks', 'GET', '/api/tasks?format=ndjson', no_body),
+        ('api_search', 'api_search', 'GET', '/api/search?q=отчёт клиен', no_body),
+        ('api_calendar_events_month', 'api_calendar_events', 'GET',
+         f'/api/calendar_events?start={month_start}&end={month_end}', no_body),
+        ('api_task_details', 'api_task_details', 'GET', f'/api/task/{task_id}', no_body),
+        ('update_task_datetime', 'update_task_datetime', 'POST', '/api/update_task_datetime',
+         lambda i: {'json': {'task_id': task_id, 'planned_date': today.isoformat(), 'planned_time': '10:00'}}),
+        ('update_kanban_status', 'update_kanban_status', 'POST', '/api/update_kanban_status',
+         lambda i: {'json': {'task_id': task_id, 'new_status': kanban_status}}),
+        ('update_task_visibility', 'update_task_visibility', 'POST', '/api/update_task_visibility',
+         lambda i: {'json': {'task_id': task_id, 'show_in_calendar': True, 'kanban_enabled': True}}),
+        ('toggle_task_completed', 'toggle_task_completed', 'POST', '/api/toggle_task_completed',
+         lambda i: {'json': {'task_id': task_id, 'completed': bool(completed)}}),
+        ('move_task_to_project', 'move_task_to_project', 'POST', '/api/move_task_to_project',
+         lambda i: {'json': {'task_id': task_id, 'project_id': project_id}}),
+        ('bulk_update_tasks_50', 'bulk_update_tasks', 'POST', '/api/tasks/bulk',
+         lambda i: {'json': [{'task_id': bulk_id, 'kanban_status': 'В работе'} for bulk_id in bulk_ids]}),
+        ('share_task', 'share_task', 'GET', f'/share_task/{task_id}', no_body),
+        ('task_edit_allowed', 'task_edit_allowed', 'GET', f'/task/{task_id}/edit_allowed', no_body),
+        ('metrics', 'metrics_endpoint', 'GET', '/metrics', no_body),
+    ]
+
+
+def run_size(size, repeat, directory):
+    """Generate a database with ``size`` tasks and time every route against it"""
+    database = os.path.join(directory, f'bench-{size}.db')
+    if not os.path.exists(database):
+        print(f"Generating {size} tasks...")
+        generate_dataset(database, projects=max(1, size // TASKS_PER_PROJECT), tasks=size)
+    backend_app.DATABASE = database
+
+    conn = sqlite3.connect(database)
+    cases = benchmark_cases(conn)
+    conn.close()
+
+    covered = {endpoint for _, endpoint, _, _, _ in cases}
+    for rule in backend_app.app.url_map.iter_rules():
+        if rule.endpoint not in covered | SKIPPED_ENDPOINTS:
+            print(f"  warning: no benchmark for {rule.rule} ({rule.endpoint})")
+
+    results = []
+    with backend_app.app.test_client() as client:
+        for name, endpoint, method, path, request_kwargs in cases:
+            timings = []
+            for i in range(repeat + 1):
+                kwargs = request_kwargs(i)
+                start = time.perf_counter()
+                response = client.open(path, method=method, **kwargs)
+                body = response.get_data()
+                elapsed = time.perf_counter() - start
+                if i:  # the first request warms up caches
+                    timings.append(elapsed * 1000)
+            results.append({
+                'size': size,
+                'route': name,
+                'method': method,
+                'path': path,
+                'status': response.status_code,
+                'bytes': len(body),
+                'min_ms': round(min(timings), 3),
+                'median_ms': round(statistics.median(timings), 3),
+                'max_ms': round(max(timings), 3),
+            })
+            print(f"  {name:<30} {response.status_code}  {statistics.median(timings):>9.2f} ms  {len(body):>10} B")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline_path):
+    """Print the median time of every route next to the baseline run"""
+    with open(baseline_path) as f:
+        baseline = {(r['size'], r['route']): r for r in json.load(f)['results']}
+    print(f"\n{'size':>8}  {'route':<30} {'base ms':>9} {'new ms':>9} {'ratio':>6}")
+    for result in results:
+        base = baseline.get((result['size'], result['route']))
+        if not base:
+            continue
+        ratio = result['median_ms'] / base['median_ms'] if base['median_ms'] else float('inf')
+        flag = '  <-- slower' if ratio > 1.25 else ''
+        print(f"{result['size']:>8}  {result['route']:<30} {base['median_ms']:>9.2f} "
+              f"{result['median_ms']:>9.2f} {ratio:>6.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every Task Tracker route at several data sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Numbers of tasks')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed requests per route')
+    parser.add_argument('--output', help='JSON results file (default: benchmarks/results/routes-<commit>.json)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare with an earlier results file')
+    parser.add_argument('--data-dir', help='Keep generated databases here and reuse them between runs')
+    args = parser.parse_args()
+
+    commit = git_commit()
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f'routes-{commit}.json')
+
+    results = []
+    with tempfile.TemporaryDirectory() as temp_directory:
+        directory = args.data_dir or temp_directory
+        os.makedirs(directory, exist_ok=True)
+        for size in args.sizes:
+            print(f"\n{size} tasks:")
+            results.extend(run_size(size, args.repeat, directory))
+        close_all_pools()
+
+    report = {
+        'meta': {
+            'commit': commit,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
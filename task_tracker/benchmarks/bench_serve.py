@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Load test for the development and production servers.
+
+Generates a database, starts ``run.py`` (development server) and
+``run.py --production`` (gunicorn) against it in turn, and has a number of
+keep-alive clients request a mix of pages, API reads and kanban updates for
+a fixed time. Prints requests per second and latency percentiles per server:
+
+    python benchmarks/bench_serve.py --tasks 10000 --concurrency 16 --duration 20
+
+With --streams, that many change streams (/api/stream, one per open page)
+stay open during the load, and the streams that received the changes are
+counted:
+
+    python benchmarks/bench_serve.py --modes production --streams 500
+"""
+
+import argparse
+import http.client
+import os
+import selectors
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from generate_data import generate_dataset
+
+HOST = '127.0.0.1'
+# Every WRITE_EVERY-th request of a client is a kanban status update
+WRITE_EVERY = 10
+
+
+def request_mix(task_count):
+    """(method, path, body) requests the clients cycle through"""
+    start = date.today().replace(day=1)
+    end = start + timedelta(days=42)
+    return [
+        ('GET', '/', None),
+        ('GET', '/kanban', None),
+        ('GET', '/api/tasks?limit=50', None),
+        ('GET', f'/api/calendar_events?start={start}&end={end}', None),
+        ('GET', f'/api/search?q={quote("отчёт клиен")}', None),
+        ('GET', f'/task/{task_count // 2}', None),
+        ('GET', '/projects', None),
+    ]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def client(port, requests, task_count, stop, latencies, errors, offset):
+    conn = http.client.HTTPConnection(HOST, port, timeout=30)
+    i = offset
+    while not stop.is_set():
+        i += 1
+        if i % WRITE_EVERY == 0:
+            method, path = 'POST', '/api/update_kanban_status'
+            body = f'{{"task_id": {i % task_count + 1}, "new_status": "В работе"}}'.encode()
+        else:
+            method, path, body = requests[i % len(requests)]
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers={'Content-Type': 'application/json'} if body else {})
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection(HOST, port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - started)
+    conn.close()
+
+
+def open_streams(port, count):
+    """Open ``count`` change streams, as that many open pages would"""
+    streams = []
+    for _ in range(count):
+        sock = socket.create_connection((HOST, port), timeout=30)
+        sock.sendall(b'GET /api/stream HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n')
+        streams.append(sock)
+    return streams
+
+
+def read_streams(streams, stop, events):
+    """Count the change events every stream receives until ``stop`` is set"""
+    selector = selectors.DefaultSelector()
+    for i, sock in enumerate(streams):
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ, i)
+    while not stop.is_set():
+        for key, _ in selector.select(0.5):
+            try:
+                data = key.fileobj.recv(65536)
+            except BlockingIOError:
+                continue
+            except OSError:
+                data = b''
+            if not data:
+                selector.unregister(key.fileobj)
+                continue
+            events[key.data] += data.count(b'\nevent: ')
+    selector.close()
+
+
+def run_load(port, task_count, concurrency, duration, stream_count=0):
+    requests = request_mix(task_count)
+    stop = threading.Event()
+    latencies, errors = [], []
+    streams = open_streams(port, stream_count)
+    events = [0] * stream_count
+    threads = [threading.Thread(target=client, args=(port, requests, task_count, stop, latencies, errors, i))
+               for i in range(concurrency)]
+    threads.append(threading.Thread(target=read_streams, args=(streams, stop, events)))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    for sock in streams:
+        sock.close()
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p95_ms': latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        'errors': len(errors),
+        # Streams that received change events during the run
+        'streams': sum(1 for count in events if count),
+    }
+
+
+def serve(mode, directory, port, workers, threads):
+    """Start run.py in a new process group (the dev server's reloader forks a child)"""
+    command = [sys.executable, os.path.join(ROOT, 'run.py'), '--bind', f'{HOST}:{port}']
+    if mode == 'production':
+        # The pages aren't loaded in a browser, so the vendored files don't matter
+        command += ['--production', '--allow-cdn']
+        if workers:
+            command += ['--workers', str(workers)]
+        if threads:
+            command += ['--threads', str(threads)]
+    return subprocess.Popen(command, cwd=directory, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                            start_new_session=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare requests/sec of the development and production servers')
+    parser.add_argument('--tasks', type=int, default=10000, help='Tasks in the generated database')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of load per server')
+    parser.add_argument('--workers', type=int, help='Production worker processes (default: gunicorn.conf.py)')
+    parser.add_argument('--threads', type=int, help='Threads per production worker (default: gunicorn.conf.py)')
+    parser.add_argument('--modes', nargs='+', choices=['dev', 'production'], default=['dev', 'production'])
+    parser.add_argument('--streams', type=int, default=0, help='Change streams kept open during the load')
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}, tasks: {args.tasks}, clients: {args.concurrency}, "
+          f"streams: {args.streams}, {args.duration:.0f}s each")
+    print(f"{'server':<12} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'streams':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        generate_dataset(os.path.join(directory, 'tasks.db'), projects=max(1, args.tasks // 1000), tasks=args.tasks)
+        for mode in args.modes:
+            port = free_port()
+            server = serve(mode, directory, port, args.workers, args.threads)
+            try:
+                wait_for_port(port)
+                # Warm up the workers' connections and template caches
+                run_load(port, args.tasks, args.concurrency, 2)
+                result = run_load(port, args.tasks, args.concurrency, args.duration, args.streams)
+            finally:
+                os.killpg(server.pid, signal.SIGTERM)
+                server.wait()
+            print(f"{mode:<12} {result['requests']:>9} {result['rps']:>8.1f} {result['p50_ms']:>8.1f} "
+                  f"{result['p95_ms']:>8.1f} {result['errors']:>7} {result['streams']:>8}")
+
+
+if __name__ == '__main__':
+    main()
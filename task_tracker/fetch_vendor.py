@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Vendor Fetch Script for Task Tracker Application
+
+Downloads the third-party libraries the pages use (Bootstrap, FullCalendar)
+into static/vendor/, so they are served by the app with content-hashed URLs
+like the rest of static/ instead of from a CDN:
+
+    python fetch_vendor.py              # fetch the missing files
+    python fetch_vendor.py --force      # fetch all files again
+
+The versions and the sha256 of every file are pinned in
+assets.VENDOR_SOURCES; a download with another sha256 is not written. A
+library upgrade is a new directory there (e.g. vendor/bootstrap-5.3.3/)
+with the new files' sha256, fetched with this script. A file without a
+pinned sha256 is refused too, with the sha256 of what was downloaded:
+check it against the library's release before pinning it. Until a file has
+been fetched the pages link its CDN URL.
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from assets import STATIC_DIR, VENDOR_SOURCES
+
+DOWNLOAD_TIMEOUT = 60
+
+
+def fetch_vendor(force=False):
+    """Download the missing (or, with ``force``, all) vendored files.
+
+    Returns the paths fetched and the (path, reason) of the downloads refused
+    because their sha256 isn't the pinned one.
+    """
+    fetched = []
+    refused = []
+    for path, (url, sha256) in VENDOR_SOURCES.items():
+        target = os.path.join(STATIC_DIR, path)
+        if os.path.exists(target) and not force:
+            continue
+        with urllib.request.urlopen(url, timeout=DOWNLOAD_TIMEOUT) as response:
+            data = response.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if sha256 is None:
+            refused.append((path, f"no sha256 pinned in VENDOR_SOURCES (the download's is {digest})"))
+            continue
+        if digest != sha256:
+            refused.append((path, f"sha256 {digest} instead of the pinned {sha256}"))
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Written under a temporary name so a running app never serves half a file
+        with open(target + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(target + '.tmp', target)
+        fetched.append(path)
+    return fetched, refused
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Download the vendored JS/CSS libraries into static/vendor')
+    parser.add_argument('--force', action='store_true', help='Download files that already exist too')
+    args = parser.parse_args()
+
+    try:
+        fetched, refused = fetch_vendor(args.force)
+    except OSError as e:
+        print(f"Error downloading vendored files: {e}", file=sys.stderr)
+        sys.exit(1)
+    for path in fetched:
+        print(f"Fetched static/{path}")
+    for path, reason in refused:
+        print(f"Refused static/{path}: {reason}", file=sys.stderr)
+    print(f"{len(fetched)} of {len(VENDOR_SOURCES)} files fetched")
+    if refused:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
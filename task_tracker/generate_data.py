@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Synthetic Data Generator for Task Tracker Application
+
+Builds a database with a configurable number of projects and tasks for
+performance testing: planned dates and deadlines spread around today,
+a share of completed tasks, descriptions of varying length, kanban
+statuses, priorities and colors. Rows are written with bulk inserts in a
+single transaction; the derived tables (calendar events, search index)
+are rebuilt once at the end.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+
+from init_db import DATABASE, init_database, bulk_load
+
+PRIORITIES = ['Срочный', 'Важный', 'Базовый', 'Низкий', 'Прочее']
+PRIORITY_WEIGHTS = [1, 2, 5, 2, 1]
+KANBAN_STATUSES = ['Новая', 'В работе', 'Важно', 'Горит', 'Базовое', 'Буфер']
+COLORS = ['#1098ad', '#e03131', '#ff9f43', '#2f9e44', '#7048e8', '#6c757d']
+START_TIMES = ['09:00', '10:00', '11:30', '13:00', '14:30', '16:00', '17:30']
+WORDS = (
+    'отчёт встреча клиент договор проект релиз тест сервер база данные интерфейс дизайн '
+    'бюджет план задача ошибка исправить проверить обновить подготовить согласовать '
+    'report meeting release deploy review invoice backup migration api client server '
+    'search calendar kanban sprint roadmap budget contract support ticket feature'
+).split()
+
+INSERT_BATCH_SIZE = 10000
+
+
+def random_text(rng, min_words, max_words):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(min_words, max_words)))
+
+
+def generate_tasks(rng, project_ids, count, days, completed_ratio, description_words):
+    """Yield task rows (tuples for the INSERT in generate_dataset), numbered per project"""
+    today = date.today()
+    task_counters = dict.fromkeys(project_ids, 0)
+    for _ in range(count):
+        project_id = rng.choice(project_ids)
+        task_counters[project_id] += 1
+
+        planned = today + timedelta(days=rng.randint(-days, days // 4))
+        planned_date = planned.isoformat() if rng.random() < 0.8 else ''
+        planned_start_time = rng.choice(START_TIMES) if planned_date and rng.random() < 0.4 else ''
+        deadline = (planned + timedelta(days=rng.randint(0, 14))).isoformat() if rng.random() < 0.5 else ''
+        completed = rng.random() < completed_ratio
+        completion_date = None
+        if completed:
+            completion_date = min(planned + timedelta(days=rng.randint(-3, 10)), today).isoformat()
+
+        yield (
+            project_id,
+            task_counters[project_id],
+            random_text(rng, 2, 6).capitalize(),
+            random_text(rng, *description_words),
+            planned_date,
+            planned_start_time,
+            deadline,
+            rng.choices(PRIORITIES, PRIORITY_WEIGHTS)[0],
+            rng.random() < 0.8,
+            completed,
+            completion_date,
+            rng.choice(COLORS),
+            rng.random() < 0.7,
+            rng.choice(KANBAN_STATUSES),
+            '',
+        )
+
+
+def batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate_dataset(database=DATABASE, projects=10, tasks=10000, days=365,
+                     completed_ratio=0.6, description_words=(0, 60), seed=42):
+    """Create (or extend) a database with generated projects and tasks."""
+    init_database(database)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(database)
+    cursor = conn.cursor()
+
+    with bulk_load(conn):
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM projects")
+        first_project = cursor.fetchone()[0] + 1
+        cursor.executemany(
+            "INSERT INTO projects (id, name, identifier, responsible) VALUES (?, ?, ?, ?)",
+            [(first_project + i, f"Проект {first_project + i}", f"P{first_project + i}", '')
+             for i in range(projects)]
+        )
+        project_ids = list(range(first_project, first_project + projects))
+
+        rows = generate_tasks(rng, project_ids, tasks, days, completed_ratio, description_words)
+        for batch in batched(rows, INSERT_BATCH_SIZE):
+            cursor.executemany('''
+                INSERT INTO tasks (project_id, task_number, title, description, planned_date, planned_start_time,
+                                   deadline, priority, show_in_calendar, completed, completion_date, color,
+                                   kanban_enabled, kanban_status, responsible)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', batch)
+
+        cursor.execute('''
+            UPDATE projects SET task_counter = (
+                SELECT COALESCE(MAX(task_number), 0) FROM tasks WHERE tasks.project_id = projects.id
+            )
+            WHERE id >= ?
+        ''', (first_project,))
+
+    conn.commit()
+    cursor.execute("ANALYZE")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a large Task Tracker database')
+    parser.add_argument('--database', default=DATABASE, help='Database file (default: %(default)s)')
+    parser.add_argument('--projects', type=int, default=10, help='Number of projects')
+    parser.add_argument('--tasks', type=int, default=10000, help='Number of tasks')
+    parser.add_argument('--days', type=int, default=365,
+                        help='Planned dates are spread over this many days before today (and a quarter of it after)')
+    parser.add_argument('--completed-ratio', type=float, default=0.6, help='Share of completed tasks')
+    parser.add_argument('--description-words', type=int, nargs=2, default=[0, 60], metavar=('MIN', 'MAX'),
+                        help='Number of words in a task description')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--replace', action='store_true', help='Delete the database file first')
+    args = parser.parse_args()
+
+    if args.replace:
+        for path in (args.database, args.database + '-wal', args.database + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+
+    print(f"Generating {args.projects} projects and {args.tasks} tasks in {args.database}...")
+    generate_dataset(args.database, args.projects, args.tasks, args.days,
+                     args.completed_ratio, tuple(args.description_words), args.seed)
+    print("Data generation complete!")
+
+
+if __name__ == "__main__":
+    main()
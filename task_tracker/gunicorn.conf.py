@@ -0,0 +1,83 @@
+"""
+Gunicorn settings for serving Task Tracker in production:
+
+    python run.py --production --workers 2 --threads 32
+    gunicorn -c gunicorn.conf.py run:app
+
+Like the development server, it uses tasks.db in the current directory.
+Workers and threads can also be set with TASK_TRACKER_WORKERS and
+TASK_TRACKER_THREADS, the address with TASK_TRACKER_BIND.
+
+SQLite has a single writer at a time, so extra processes don't make writes
+faster, they only take turns on the write lock (PRAGMA busy_timeout). A few
+worker processes, for page rendering, with many threads each work best:
+WAL lets readers run next to the writer, and a process's threads share its
+read-only connection pool and its writer thread, which batches their writes.
+
+Open pages don't count against the threads: a change stream (/api/stream)
+hands its socket to the worker's stream hub thread (backend/stream_hub.py)
+and frees its thread right away, so the threads only bound the requests
+running at once. That needs plain sockets between gunicorn and the proxy;
+with gunicorn's own TLS (certfile) every stream would hold a thread again,
+so terminate TLS at the proxy.
+"""
+
+import os
+import signal
+
+bind = os.environ.get('TASK_TRACKER_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('TASK_TRACKER_WORKERS', min(os.cpu_count() or 1, 4)))
+threads = int(os.environ.get('TASK_TRACKER_THREADS', 32))
+worker_class = 'gthread'
+# run:app is found from any directory
+pythonpath = os.path.dirname(os.path.abspath(__file__))
+
+# Import the app and create/check the schema once in the master process;
+# workers are forked from it and open their own connections lazily
+preload_app = True
+
+timeout = 30
+# Requests still running this long after a shutdown signal are cut off
+graceful_timeout = 10
+keepalive = 5
+accesslog = '-'
+
+
+def on_starting(server):
+    """Warn about setups that work, but not as intended in production.
+
+    With gunicorn terminating TLS the change streams can't leave their
+    threads; without the vendored libraries the pages load them from a CDN.
+    """
+    from assets import missing_vendor_files, missing_vendor_message
+
+    missing = missing_vendor_files()
+    if missing:
+        server.log.warning(missing_vendor_message(missing))
+    if server.cfg.is_ssl:
+        server.log.warning("TLS is terminated by gunicorn: every open change stream holds a worker thread; "
+                           "terminate TLS at the proxy instead")
+
+
+def post_worker_init(worker):
+    """End the open change streams as soon as a graceful shutdown starts.
+
+    Otherwise every open page would hold its worker until graceful_timeout;
+    the pages reconnect to another worker (or the restarted server).
+    """
+    from change_feed import close_change_feeds
+
+    handle_exit = worker.handle_exit
+
+    def handle_exit_and_close_streams(sig, frame):
+        handle_exit(sig, frame)
+        close_change_feeds()
+
+    signal.signal(signal.SIGTERM, handle_exit_and_close_streams)
+
+
+def worker_exit(server, worker):
+    """Close the pooled connections and stop the writer, which also checkpoints the WAL."""
+    from db import close_all_pools
+
+    close_all_pools()
@@ -1,22 +1,802 @@
 import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
 
-def init_database():
-    """Initialize the database with required tables."""
-    conn = sqlite3.connect('tasks.db')
+DATABASE = 'tasks.db'
+
+# Indexes backing the list queries in backend/app.py. The partial indexes only
+# hold the rows a page actually shows (open tasks, kanban cards, completed
+# tasks, overdue candidates), so they stay small as history grows. The
+# calendar reads calendar_events (see below) and needs no index on tasks.
+TASK_INDEXES = [
+    ('idx_tasks_open', 'tasks(id) WHERE completed = 0'),
+    ('idx_tasks_kanban', 'tasks(id) WHERE kanban_enabled = 1'),
+    ('idx_tasks_completed', 'tasks(completion_date) WHERE completed = 1'),
+    ('idx_tasks_project', 'tasks(project_id)'),
+    ('idx_tasks_overdue_deadline', 'tasks(deadline) WHERE completed = 0'),
+    ('idx_tasks_overdue_planned', 'tasks(planned_date) WHERE completed = 0'),
+]
+
+# Indexes of earlier schema versions, dropped by create_indexes()
+OBSOLETE_TASK_INDEXES = [
+    'idx_tasks_calendar',       # replaced by idx_tasks_calendar_planned
+    'idx_tasks_deadline',       # replaced by the partial idx_tasks_overdue_* indexes
+    'idx_tasks_planned_date',
+    'idx_tasks_calendar_planned',   # unused since the calendar reads calendar_events
+    'idx_tasks_calendar_deadline',
+]
+
+
+def create_indexes(conn):
+    """Create the task indexes if they don't exist yet."""
+    cursor = conn.cursor()
+    for name in OBSOLETE_TASK_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    for name, definition in TASK_INDEXES:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+
+# An open task is overdue once its deadline or planned date (if set) is in the
+# past; completed tasks never are. Empty dates are stored as ''.
+OVERDUE_CONDITION = '''(
+    t.completed = 0 AND (
+        (t.deadline > '' AND t.deadline < date('now', 'localtime'))
+        OR (t.planned_date > '' AND t.planned_date < date('now', 'localtime'))
+    )
+)'''
+
+# IDs of the overdue tasks, for filtering: one range of each partial
+# idx_tasks_overdue_* index. SQLite doesn't combine partial indexes for the
+# OR in OVERDUE_CONDITION and would scan all open tasks instead.
+OVERDUE_TASK_IDS = '''
+    SELECT id FROM tasks
+    WHERE completed = 0 AND deadline > '' AND deadline < date('now', 'localtime')
+    UNION
+    SELECT id FROM tasks
+    WHERE completed = 0 AND planned_date > '' AND planned_date < date('now', 'localtime')
+'''
+
+# Tasks with their project columns and the overdue flag, as shown by the task lists
+TASK_LIST_VIEW = f'''
+    CREATE VIEW task_list_v AS
+    SELECT
+        t.*,
+        p.name AS project_name,
+        p.identifier AS project_identifier,
+        p.responsible AS project_responsible,
+        {OVERDUE_CONDITION} AS overdue
+    FROM tasks t
+    JOIN projects p ON t.project_id = p.id
+'''
+
+
+def create_task_list_view(conn):
+    """(Re)create the task_list_v view."""
     cursor = conn.cursor()
+    cursor.execute("DROP VIEW IF EXISTS task_list_v")
+    cursor.execute(TASK_LIST_VIEW)
+
+
+# Calendar events are materialized into their own table so the calendar API is
+# a single range read. calendar_events_source expands a task into its planned
+# date and deadline events (FullCalendar event objects stored as JSON); the
+# triggers below keep calendar_events in sync with tasks and projects.
+CALENDAR_EVENTS_SOURCE = '''
+    CREATE VIEW IF NOT EXISTS calendar_events_source AS
+    SELECT
+        t.id AS task_id,
+        'planned' AS kind,
+        t.project_id AS project_id,
+        t.planned_date AS event_date,
+        json_object(
+            'title', '[' || p.identifier || '-' || t.task_number || '] ' || t.title,
+            'start', CASE WHEN t.planned_start_time > ''
+                          THEN t.planned_date || 'T' || t.planned_start_time
+                          ELSE t.planned_date END,
+            -- Use the task's color if available, otherwise default to priority-based colors
+            'color', CASE WHEN t.color > '' THEN t.color
+                          WHEN t.priority = 'Срочный' THEN '#e03131'
+                          WHEN t.priority = 'Важный' THEN '#ff9f43'
+                          WHEN t.priority = 'Базовый' THEN '#1098ad'
+                          WHEN t.priority = 'Низкий' THEN '#6c757d'
+                          ELSE '#3498db' END,
+            'extendedProps', json_object(
+                'taskId', t.id,
+                'projectId', t.project_id,
+                'description', t.description,
+                'priority', t.priority,
+                'completed', t.completed,
+                'color', t.color,
+                'startTime', t.planned_start_time
+            )
+        ) AS event
+    FROM tasks t
+    JOIN projects p ON t.project_id = p.id
+    WHERE t.show_in_calendar = 1 AND t.planned_date > ''
+    UNION ALL
+    SELECT
+        t.id,
+        'deadline',
+        t.project_id,
+        t.deadline,
+        json_object(
+            'title', '[' || p.identifier || '-' || t.task_number || '] DEADLINE: ' || t.title,
+            'start', t.deadline,
+            -- Use the task's color if available, otherwise default to red for deadlines
+            'color', CASE WHEN t.color > '' THEN t.color ELSE '#e03131' END,
+            'extendedProps', json_object(
+                'taskId', t.id,
+                'projectId', t.project_id,
+                'description', t.description,
+                'priority', t.priority,
+                'completed', t.completed,
+                'color', t.color,
+                'startTime', NULL
+            )
+        )
+    FROM tasks t
+    JOIN projects p ON t.project_id = p.id
+    WHERE t.show_in_calendar = 1 AND t.deadline > '' AND t.deadline IS NOT t.planned_date
+'''
+
+# Task columns that appear in a calendar event
+CALENDAR_EVENT_COLUMNS = (
+    'project_id, task_number, title, description, planned_date, planned_start_time, deadline, '
+    'priority, show_in_calendar, completed, color'
+)
+
+CALENDAR_EVENTS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS calendar_events_task_insert AFTER INSERT ON tasks
+    BEGIN
+        INSERT INTO calendar_events (task_id, kind, project_id, event_date, event)
+        SELECT * FROM calendar_events_source WHERE task_id = NEW.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS calendar_events_task_update AFTER UPDATE OF {CALENDAR_EVENT_COLUMNS} ON tasks
+    BEGIN
+        DELETE FROM calendar_events WHERE task_id = OLD.id;
+        INSERT INTO calendar_events (task_id, kind, project_id, event_date, event)
+        SELECT * FROM calendar_events_source WHERE task_id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS calendar_events_task_delete AFTER DELETE ON tasks
+    BEGIN
+        DELETE FROM calendar_events WHERE task_id = OLD.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS calendar_events_project_insert AFTER INSERT ON projects
+    BEGIN
+        INSERT INTO calendar_events (task_id, kind, project_id, event_date, event)
+        SELECT * FROM calendar_events_source WHERE project_id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS calendar_events_project_update AFTER UPDATE OF identifier ON projects
+    BEGIN
+        DELETE FROM calendar_events WHERE project_id = OLD.id;
+        INSERT INTO calendar_events (task_id, kind, project_id, event_date, event)
+        SELECT * FROM calendar_events_source WHERE project_id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS calendar_events_project_delete AFTER DELETE ON projects
+    BEGIN
+        DELETE FROM calendar_events WHERE project_id = OLD.id;
+    END
+    ''',
+]
+
+
+CALENDAR_EVENTS_TRIGGER_NAMES = [
+    'calendar_events_task_insert', 'calendar_events_task_update', 'calendar_events_task_delete',
+    'calendar_events_project_insert', 'calendar_events_project_update', 'calendar_events_project_delete',
+]
+
+
+def create_calendar_events(conn, replace=False):
+    """Create the calendar_events table with its view and triggers.
+
+    The table is filled from the existing tasks when it is first created.
+    With ``replace`` the view and triggers are recreated from the current
+    definitions (the caller should then rebuild the table).
+    """
+    cursor = conn.cursor()
+    if replace:
+        cursor.execute("DROP VIEW IF EXISTS calendar_events_source")
+        for name in CALENDAR_EVENTS_TRIGGER_NAMES:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='calendar_events'")
+    table_exists = cursor.fetchone() is not None
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS calendar_events (
+            task_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            project_id INTEGER,
+            event_date DATE NOT NULL,
+            event TEXT NOT NULL,
+            PRIMARY KEY (task_id, kind)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_calendar_events_date ON calendar_events(event_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_calendar_events_project ON calendar_events(project_id)")
+    cursor.execute(CALENDAR_EVENTS_SOURCE)
+    for trigger in CALENDAR_EVENTS_TRIGGERS:
+        cursor.execute(trigger)
     
-    # Create projects table
+    if not table_exists:
+        rebuild_calendar_events(conn)
+
+
+def rebuild_calendar_events(conn):
+    """Recompute every calendar event from the tasks table. Returns the number of events."""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM calendar_events")
+    # In primary key order, so the rows are appended to the table instead of
+    # splitting pages all over it
+    cursor.execute('''
+        INSERT INTO calendar_events (task_id, kind, project_id, event_date, event)
+        SELECT * FROM calendar_events_source
+        ORDER BY task_id, kind
+    ''')
+    return cursor.rowcount
+
+
+# Full-text search: tasks_fts indexes each task's title and description with
+# its project's name and identifier (rowid = task id). The triggers keep it
+# in sync with tasks and projects. Prefix indexes for 2 and 3 characters keep
+# typeahead queries ("ab*") fast.
+TASK_SEARCH_TABLE = '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description, project_name, project_identifier,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+'''
+
+# Memory for pending search index terms, in bytes (FTS5 default: 1 MB)
+SEARCH_HASH_SIZE = 64 * 1024 * 1024
+
+# Search index row for the tasks matching the condition
+TASK_SEARCH_SOURCE = '''
+    INSERT INTO tasks_fts (rowid, title, description, project_name, project_identifier)
+    SELECT t.id, t.title, t.description, p.name, p.identifier
+    FROM tasks t
+    LEFT JOIN projects p ON t.project_id = p.id
+    WHERE {condition}
+'''
+
+TASK_SEARCH_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_task_insert AFTER INSERT ON tasks
+    BEGIN
+        {TASK_SEARCH_SOURCE.format(condition='t.id = NEW.id')};
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_task_update AFTER UPDATE OF title, description, project_id ON tasks
+    BEGIN
+        DELETE FROM tasks_fts WHERE rowid = OLD.id;
+        {TASK_SEARCH_SOURCE.format(condition='t.id = NEW.id')};
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_task_delete AFTER DELETE ON tasks
+    BEGIN
+        DELETE FROM tasks_fts WHERE rowid = OLD.id;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_project_update AFTER UPDATE OF name, identifier ON projects
+    BEGIN
+        DELETE FROM tasks_fts WHERE rowid IN (SELECT id FROM tasks WHERE project_id = OLD.id);
+        {TASK_SEARCH_SOURCE.format(condition='t.project_id = NEW.id')};
+    END
+    ''',
+]
+
+TASK_SEARCH_TRIGGER_NAMES = [
+    'tasks_fts_task_insert', 'tasks_fts_task_update', 'tasks_fts_task_delete', 'tasks_fts_project_update',
+]
+
+
+def create_task_search(conn):
+    """Create the tasks_fts search index and its triggers.
+
+    The index is filled from the existing tasks when it is first created.
+    Raises sqlite3.OperationalError if SQLite was built without FTS5.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks_fts'")
+    table_exists = cursor.fetchone() is not None
+    
+    cursor.execute(TASK_SEARCH_TABLE)
+    for trigger in TASK_SEARCH_TRIGGERS:
+        cursor.execute(trigger)
+    
+    if not table_exists:
+        rebuild_task_search(conn)
+
+
+def rebuild_task_search(conn):
+    """Re-index every task for full-text search. Returns the number of tasks indexed."""
+    cursor = conn.cursor()
+    # Dropping the table is much faster than deleting its rows one by one
+    cursor.execute("DROP TABLE IF EXISTS tasks_fts")
+    cursor.execute(TASK_SEARCH_TABLE)
+    # Let FTS5 buffer more terms in memory before it writes an index segment
+    cursor.execute("INSERT INTO tasks_fts (tasks_fts, rank) VALUES ('hashsize', ?)", (SEARCH_HASH_SIZE,))
+    cursor.execute(TASK_SEARCH_SOURCE.format(condition='1'))
+    count = cursor.rowcount
+    # Merge the freshly written index segments
+    cursor.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('optimize')")
+    return count
+
+
+# Every task gets a number within its project (the N in PROJ-N), taken from the
+# project's task_counter when the task is created or moved to another project.
+TASK_NUMBER_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS task_number_insert AFTER INSERT ON tasks
+    WHEN NEW.task_number IS NULL
+    BEGIN
+        UPDATE projects SET task_counter = task_counter + 1 WHERE id = NEW.project_id;
+        UPDATE tasks SET task_number = (SELECT task_counter FROM projects WHERE id = NEW.project_id)
+        WHERE id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS task_number_move AFTER UPDATE OF project_id ON tasks
+    WHEN NEW.project_id IS NOT OLD.project_id
+    BEGIN
+        UPDATE projects SET task_counter = task_counter + 1 WHERE id = NEW.project_id;
+        UPDATE tasks SET task_number = (SELECT task_counter FROM projects WHERE id = NEW.project_id)
+        WHERE id = NEW.id;
+    END
+    ''',
+]
+
+
+def create_task_numbers(conn):
+    """Create the per-project task number index and triggers."""
+    cursor = conn.cursor()
+    # Not UNIQUE: a moved task briefly keeps its old number until task_number_move renumbers it
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_number ON tasks(project_id, task_number)")
+    for trigger in TASK_NUMBER_TRIGGERS:
+        cursor.execute(trigger)
+
+
+def backfill_task_numbers(conn):
+    """Number the tasks that have no task number yet. Returns the number of tasks updated.
+
+    Numbers continue after each project's counter in ID order, so for a
+    database that never had stored numbers they match the numbers shown
+    before (position of the task within its project).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM tasks WHERE task_number IS NULL AND project_id IN (SELECT id FROM projects)")
+    updated = cursor.fetchone()[0]
+    cursor.execute('''
+        WITH numbered AS (
+            SELECT t.id,
+                   COALESCE(p.task_counter, 0) + ROW_NUMBER() OVER (PARTITION BY t.project_id ORDER BY t.id) AS task_number
+            FROM tasks t
+            JOIN projects p ON t.project_id = p.id
+            WHERE t.task_number IS NULL
+        )
+        UPDATE tasks SET task_number = numbered.task_number
+        FROM numbered
+        WHERE tasks.id = numbered.id
+    ''')
+    cursor.execute('''
+        UPDATE projects SET task_counter = (
+            SELECT COALESCE(MAX(task_number), 0) FROM tasks WHERE tasks.project_id = projects.id
+        )
+    ''')
+    return updated
+
+
+# Every write to tasks or projects appends a row to change_log. Its latest
+# version is the data version the read APIs use as their ETag, so a poll
+# can be answered without running the query, and the /api/stream change feed
+# publishes the rows to the open pages. Only the most recent CHANGE_LOG_SIZE
+# rows are kept.
+CHANGE_LOG_SIZE = 10000
+
+# Task columns whose changes are listed in change_log.fields
+TASK_COLUMNS = [
+    'project_id', 'title', 'description', 'planned_date', 'planned_start_time', 'deadline',
+    'priority', 'show_in_calendar', 'completed', 'completion_date', 'color', 'kanban_enabled',
+    'kanban_status', 'responsible', 'task_number',
+]
+
+# JSON array with the names of the task columns that differ between OLD and NEW
+CHANGED_TASK_FIELDS = (
+    'SELECT json_group_array(column1) AS fields FROM (VALUES '
+    + ', '.join(f"('{column}', OLD.{column} IS NOT NEW.{column})" for column in TASK_COLUMNS)
+    + ') WHERE column2'
+)
+
+CHANGE_LOG_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS change_log_task_insert AFTER INSERT ON tasks
+    BEGIN
+        INSERT INTO change_log (action, task_id, project_id) VALUES ('insert', NEW.id, NEW.project_id);
+    END
+    ''',
+    # Updates that leave every column as it was aren't logged, nor the
+    # numbering of task_number_insert and task_number_move: it is part of the
+    # insert or move that is logged itself
+    f'''
+    CREATE TRIGGER IF NOT EXISTS change_log_task_update AFTER UPDATE ON tasks
+    BEGIN
+        INSERT INTO change_log (action, task_id, project_id, fields)
+        SELECT 'update', NEW.id, NEW.project_id, fields
+        FROM ({CHANGED_TASK_FIELDS})
+        WHERE fields NOT IN ('[]', '["task_number"]');
+    END
+    ''',
+    # Archived tasks (archive_tasks.py) get one 'archive' entry per batch instead
+    '''
+    CREATE TRIGGER IF NOT EXISTS change_log_task_delete AFTER DELETE ON tasks
+    WHEN NOT EXISTS (SELECT 1 FROM tasks_archive WHERE id = OLD.id)
+    BEGIN
+        INSERT INTO change_log (action, task_id, project_id) VALUES ('delete', OLD.id, OLD.project_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS change_log_project_insert AFTER INSERT ON projects
+    BEGIN
+        INSERT INTO change_log (action, project_id) VALUES ('insert', NEW.id);
+    END
+    ''',
+    # task_counter is bookkeeping for task numbers, not a visible change
+    '''
+    CREATE TRIGGER IF NOT EXISTS change_log_project_update AFTER UPDATE OF name, identifier, responsible ON projects
+    BEGIN
+        INSERT INTO change_log (action, project_id) VALUES ('update', NEW.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS change_log_project_delete AFTER DELETE ON projects
+    BEGIN
+        INSERT INTO change_log (action, project_id) VALUES ('delete', OLD.id);
+    END
+    ''',
+]
+
+CHANGE_LOG_TRIGGER_NAMES = [
+    'change_log_prune',
+    'change_log_task_insert', 'change_log_task_update', 'change_log_task_delete',
+    'change_log_project_insert', 'change_log_project_update', 'change_log_project_delete',
+]
+
+
+def create_change_log(conn, replace=False):
+    """Create the change_log table and the triggers that fill it.
+
+    With ``replace`` the triggers are recreated from the current definitions.
+    """
+    cursor = conn.cursor()
+    if replace:
+        for name in CHANGE_LOG_TRIGGER_NAMES:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            action TEXT,
+            task_id INTEGER,
+            project_id INTEGER,
+            fields TEXT,
+            changed_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS change_log_prune AFTER INSERT ON change_log
+        BEGIN
+            DELETE FROM change_log WHERE version <= NEW.version - {CHANGE_LOG_SIZE};
+        END
+    ''')
+    for trigger in CHANGE_LOG_TRIGGERS:
+        cursor.execute(trigger)
+
+
+# Completed tasks are eventually moved from tasks to tasks_archive (by
+# archive_tasks.py), so the live table and its indexes only hold open and
+# recently completed work. Archived tasks keep their IDs and numbers and can
+# still be read through all_tasks_v, but they leave the calendar and the
+# search index.
+TASK_ARCHIVE_COLUMNS = ', '.join(['id'] + TASK_COLUMNS)
+
+# Live and archived tasks with an archived flag. SQLite runs a query on the
+# view as one query per table, so filters and ORDER BY ... LIMIT still use
+# each table's indexes.
+ALL_TASKS_VIEW = f'''
+    CREATE VIEW IF NOT EXISTS all_tasks_v AS
+    SELECT {TASK_ARCHIVE_COLUMNS}, 0 AS archived FROM tasks
+    UNION ALL
+    SELECT {TASK_ARCHIVE_COLUMNS}, 1 AS archived FROM tasks_archive
+'''
+
+
+def create_task_archive(conn):
+    """Create the tasks_archive table and the all_tasks_v view."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,
+            project_id INTEGER,
+            title TEXT NOT NULL,
+            description TEXT,
+            planned_date DATE,
+            planned_start_time TIME,
+            deadline DATE,
+            priority TEXT,
+            show_in_calendar BOOLEAN,
+            completed BOOLEAN,
+            completion_date DATE,
+            color TEXT,
+            kanban_enabled BOOLEAN,
+            kanban_status TEXT,
+            responsible TEXT,
+            task_number INTEGER,
+            FOREIGN KEY (project_id) REFERENCES projects (id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_completed ON tasks_archive(completion_date)")
+    # task_number first: an index led by project_id would tempt the planner to
+    # read the archive project by project and sort it for a completed tasks page
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_number ON tasks_archive(task_number, project_id)")
+    cursor.execute(ALL_TASKS_VIEW)
+
+
+# Task counts per project for the project overviews, kept exact by the
+# triggers below so a page reads one row per project instead of grouping all
+# tasks. Whether a task is overdue depends on the current date, so instead of
+# an overdue counter project_due_dates holds the open tasks per project and
+# due date (the earlier of deadline and planned date, see OVERDUE_CONDITION);
+# the overdue count is the sum over the dates before today. Archived tasks
+# still count as completed.
+
+# Due date of a task row ('NEW' or 'OLD'), NULL without deadline and planned date
+TASK_DUE_DATE = (
+    "COALESCE(min(NULLIF({row}.deadline, ''), NULLIF({row}.planned_date, '')), "
+    "NULLIF({row}.deadline, ''), NULLIF({row}.planned_date, ''))"
+)
+
+# Statements that add a task row to the counts, and that take it out again
+PROJECT_STATS_ADD = '''
+    INSERT INTO project_stats (project_id, open_tasks, completed_tasks)
+    SELECT {row}.project_id, {row}.completed IS 0, {row}.completed IS 1
+    WHERE {row}.project_id IS NOT NULL
+    ON CONFLICT (project_id) DO UPDATE SET
+        open_tasks = open_tasks + excluded.open_tasks,
+        completed_tasks = completed_tasks + excluded.completed_tasks;
+    INSERT INTO project_due_dates (project_id, due_date, open_tasks)
+    SELECT {row}.project_id, {due_date}, 1
+    WHERE {row}.project_id IS NOT NULL AND {row}.completed IS 0 AND {due_date} IS NOT NULL
+    ON CONFLICT (project_id, due_date) DO UPDATE SET open_tasks = open_tasks + 1;
+'''
+PROJECT_STATS_REMOVE = '''
+    UPDATE project_stats SET
+        open_tasks = open_tasks - ({row}.completed IS 0),
+        completed_tasks = completed_tasks - ({row}.completed IS 1)
+    WHERE project_id = {row}.project_id;
+    UPDATE project_due_dates SET open_tasks = open_tasks - 1
+    WHERE project_id = {row}.project_id AND due_date = {due_date} AND {row}.completed IS 0;
+    DELETE FROM project_due_dates
+    WHERE project_id = {row}.project_id AND due_date = {due_date} AND open_tasks = 0;
+'''
+
+
+def project_stats_statements(template, row):
+    return template.format(row=row, due_date=TASK_DUE_DATE.format(row=row))
+
+
+PROJECT_STATS_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS project_stats_task_insert AFTER INSERT ON tasks
+    BEGIN
+        {project_stats_statements(PROJECT_STATS_ADD, 'NEW')}
+    END
+    ''',
+    # Also covers moves to another project (/api/move_task_to_project)
+    f'''
+    CREATE TRIGGER IF NOT EXISTS project_stats_task_update
+    AFTER UPDATE OF project_id, completed, deadline, planned_date ON tasks
+    WHEN OLD.project_id IS NOT NEW.project_id OR OLD.completed IS NOT NEW.completed
+        OR OLD.deadline IS NOT NEW.deadline OR OLD.planned_date IS NOT NEW.planned_date
+    BEGIN
+        {project_stats_statements(PROJECT_STATS_REMOVE, 'OLD')}
+        {project_stats_statements(PROJECT_STATS_ADD, 'NEW')}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS project_stats_task_delete AFTER DELETE ON tasks
+    WHEN NOT EXISTS (SELECT 1 FROM tasks_archive WHERE id = OLD.id)
+    BEGIN
+        {project_stats_statements(PROJECT_STATS_REMOVE, 'OLD')}
+    END
+    ''',
+]
+
+PROJECT_STATS_TRIGGER_NAMES = ['project_stats_task_insert', 'project_stats_task_update', 'project_stats_task_delete']
+
+
+def create_project_stats(conn):
+    """Create the project_stats and project_due_dates tables and their triggers.
+
+    The tables are filled from the existing tasks when they are first created.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='project_stats'")
+    table_exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS project_stats (
+            project_id INTEGER PRIMARY KEY,
+            open_tasks INTEGER NOT NULL DEFAULT 0,
+            completed_tasks INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS project_due_dates (
+            project_id INTEGER NOT NULL,
+            due_date DATE NOT NULL,
+            open_tasks INTEGER NOT NULL,
+            PRIMARY KEY (project_id, due_date)
+        ) WITHOUT ROWID
+    ''')
+    for trigger in PROJECT_STATS_TRIGGERS:
+        cursor.execute(trigger)
+
+    if not table_exists:
+        rebuild_project_stats(conn)
+
+
+def rebuild_project_stats(conn):
+    """Recount the tasks of every project. Returns the number of projects with tasks."""
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM project_stats")
+    cursor.execute("DELETE FROM project_due_dates")
+    cursor.execute('''
+        INSERT INTO project_stats (project_id, open_tasks, completed_tasks)
+        SELECT project_id, SUM(completed IS 0), SUM(completed IS 1)
+        FROM all_tasks_v
+        WHERE project_id IS NOT NULL
+        GROUP BY project_id
+    ''')
+    count = cursor.rowcount
+    cursor.execute(f'''
+        INSERT INTO project_due_dates (project_id, due_date, open_tasks)
+        SELECT project_id, due_date, COUNT(*)
+        FROM (SELECT project_id, {TASK_DUE_DATE.format(row='tasks')} AS due_date FROM tasks WHERE completed IS 0)
+        WHERE project_id IS NOT NULL AND due_date IS NOT NULL
+        GROUP BY project_id, due_date
+    ''')
+    return count
+
+
+@contextmanager
+def bulk_load(conn, drop_indexes=False):
+    """Write many tasks without maintaining the derived tables row by row.
+
+    The calendar event, search index, project stats and change log triggers
+    are dropped for the duration of the block. Afterwards they are recreated,
+    calendar_events, tasks_fts and the project stats are rebuilt in one pass
+    each, and a single 'reload' entry in change_log tells open pages to
+    reload. Task numbers are still assigned by their triggers unless the
+    inserted rows carry them.
+
+    With ``drop_indexes`` the task indexes are dropped as well and built once
+    at the end, which is faster than updating them for every inserted row.
+    """
+    cursor = conn.cursor()
+    # Everything, including the dropped triggers and indexes, is one transaction
+    # that the caller commits; on an error it is rolled back as a whole
+    if not conn.in_transaction:
+        cursor.execute("BEGIN")
+    try:
+        if drop_indexes:
+            for name, _ in TASK_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {name}")
+            cursor.execute("DROP INDEX IF EXISTS idx_tasks_number")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='tasks_fts'")
+        has_search = cursor.fetchone() is not None
+        trigger_names = CALENDAR_EVENTS_TRIGGER_NAMES + PROJECT_STATS_TRIGGER_NAMES + CHANGE_LOG_TRIGGER_NAMES
+        if has_search:
+            trigger_names = trigger_names + TASK_SEARCH_TRIGGER_NAMES
+        for name in trigger_names:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        
+        yield
+        
+        if drop_indexes:
+            create_indexes(conn)
+            create_task_numbers(conn)
+        create_calendar_events(conn, replace=True)
+        rebuild_calendar_events(conn)
+        if has_search:
+            create_task_search(conn)
+            rebuild_task_search(conn)
+        create_project_stats(conn)
+        rebuild_project_stats(conn)
+        create_change_log(conn)
+        cursor.execute("INSERT INTO change_log (action) VALUES ('reload')")
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+# Schema migrations
+#
+# PRAGMA user_version holds the number of migrations applied to a database.
+# A current database is recognized with that single pragma read; otherwise
+# the pending migrations run in one IMMEDIATE transaction (together with the
+# version bump), so a process either sees the old schema or the complete new
+# one, and concurrent starts wait for each other instead of migrating twice.
+# Migrations never change once released: a schema change is a new function
+# appended to MIGRATIONS. Every migration also has to cope with databases
+# created before the migrations existed (user_version 0 with any part of the
+# schema present), hence IF NOT EXISTS and add_missing_columns.
+
+# Seconds a starting process waits for another one's migration to finish
+MIGRATION_LOCK_TIMEOUT = 600
+
+# Columns added after the first release, as (name, definition)
+ADDED_COLUMNS = {
+    'projects': [
+        ('responsible', 'TEXT'),
+        ('task_counter', 'INTEGER NOT NULL DEFAULT 0'),
+    ],
+    'tasks': [
+        ('planned_start_time', 'TIME'),
+        ('color', "TEXT DEFAULT '#1098ad'"),
+        ('kanban_enabled', 'BOOLEAN DEFAULT 1'),
+        ('kanban_status', "TEXT DEFAULT 'Новая'"),
+        ('completed', 'BOOLEAN DEFAULT 0'),
+        ('completion_date', 'DATE'),
+        ('show_in_calendar', 'BOOLEAN DEFAULT 1'),
+        ('responsible', 'TEXT'),
+        ('task_number', 'INTEGER'),
+    ],
+    'change_log': [
+        ('action', 'TEXT'),
+        ('fields', 'TEXT'),
+    ],
+}
+
+
+def add_missing_columns(conn, table):
+    """Add the ADDED_COLUMNS a table doesn't have yet. Returns their names."""
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    added = []
+    for name, definition in ADDED_COLUMNS[table]:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            added.append(name)
+    return added
+
+
+def migrate_create_tables(conn):
+    cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS projects (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             identifier TEXT UNIQUE NOT NULL,
-            responsible TEXT
+            responsible TEXT,
+            task_counter INTEGER NOT NULL DEFAULT 0
         )
     ''')
-    
-    # Create tasks table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS tasks (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -34,18 +814,125 @@ def init_database():
             kanban_enabled BOOLEAN DEFAULT 1,
             kanban_status TEXT DEFAULT 'Новая',
             responsible TEXT,
+            task_number INTEGER,
             FOREIGN KEY (project_id) REFERENCES projects (id)
         )
     ''')
+    # Databases from before the migrations may have older tables
+    add_missing_columns(conn, 'projects')
+    add_missing_columns(conn, 'tasks')
+
+
+def migrate_task_numbers(conn):
+    create_indexes(conn)
+    backfill_task_numbers(conn)
+    create_task_numbers(conn)
+
+
+def migrate_calendar_events(conn):
+    create_calendar_events(conn, replace=True)
+    rebuild_calendar_events(conn)
+
+
+def migrate_change_log(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='change_log'")
+    if cursor.fetchone():
+        add_missing_columns(conn, 'change_log')
+    create_change_log(conn, replace=True)
+
+
+def migrate_task_archive(conn):
+    create_task_archive(conn)
+    # Skip the archived tasks in change_log_task_delete
+    create_change_log(conn, replace=True)
+
+
+def migrate_change_log_numbering(conn):
+    # change_log_task_update no longer logs task numbering as a second change
+    create_change_log(conn, replace=True)
+
+
+def migrate_overdue_open_tasks(conn):
+    # Completed tasks are no longer overdue; the overdue indexes only hold open tasks
+    create_indexes(conn)
+    create_task_list_view(conn)
+
+
+def migrate_task_search(conn):
+    try:
+        create_task_search(conn)
+    except sqlite3.OperationalError as e:
+        # SQLite without FTS5: search stays unavailable until the index is
+        # created with update_db.py --rebuild-search-index
+        print(f"Could not create the search index ({e}). Full-text search is disabled.")
+
+
+def migrate_drop_calendar_task_indexes(conn):
+    # The calendar reads calendar_events; the calendar indexes on tasks only slowed down writes
+    create_indexes(conn)
+
+
+# (description, function) of every migration; migration N is MIGRATIONS[N - 1]
+MIGRATIONS = [
+    ('projects and tasks tables', migrate_create_tables),
+    ('task indexes and project task numbers', migrate_task_numbers),
+    ('task list view', create_task_list_view),
+    ('materialized calendar events', migrate_calendar_events),
+    ('change log', migrate_change_log),
+    ('full-text search index', migrate_task_search),
+    ('task archive', migrate_task_archive),
+    ('per-project task counts', create_project_stats),
+    ('one change log entry per task insert', migrate_change_log_numbering),
+    ('only open tasks are overdue', migrate_overdue_open_tasks),
+    ('no calendar indexes on tasks', migrate_drop_calendar_task_indexes),
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply the pending migrations in one transaction. Returns the number applied."""
+    if schema_version(conn) >= SCHEMA_VERSION:
+        return 0
     
-    # Commit changes and close connection
-    conn.commit()
-    conn.close()
-    print("Database initialized successfully!")
+    cursor = conn.cursor()
+    # Take the write lock first, then check again: another process may have
+    # migrated the database while this one was waiting
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        version = schema_version(conn)
+        for number in range(version + 1, SCHEMA_VERSION + 1):
+            description, migration = MIGRATIONS[number - 1]
+            print(f"Applying migration {number}: {description}")
+            migration(conn)
+            cursor.execute(f"PRAGMA user_version = {number}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return max(SCHEMA_VERSION - version, 0)
+
+
+def init_database(database=DATABASE):
+    """Create the database or bring its schema up to date.
+
+    For a current database this is a single PRAGMA user_version read.
+    """
+    conn = sqlite3.connect(database, timeout=MIGRATION_LOCK_TIMEOUT)
+    try:
+        applied = migrate(conn)
+    finally:
+        conn.close()
+    if applied:
+        print(f"Database schema is at version {SCHEMA_VERSION} ({applied} migrations applied)")
 
-def populate_sample_data():
+def populate_sample_data(database=DATABASE):
     """Add sample data to demonstrate the application."""
-    conn = sqlite3.connect('tasks.db')
+    conn = sqlite3.connect(database)
     cursor = conn.cursor()
     
     # Add sample project
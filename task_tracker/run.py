@@ -2,24 +2,76 @@
 """
 Task Tracker Application
 A simple task management system with projects, tasks, and calendar view.
+
+    python run.py                  # development server (debugger, reloader)
+    python run.py --production     # gunicorn, settings in gunicorn.conf.py
 """
 
+import argparse
+import runpy
 import sys
 import os
 
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
 # Add the project root directory to the path to find the init_db module
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
 
 # Initialize the database before importing the app
 from init_db import init_database
 init_database()
 
 # Add the backend directory to the path to find the app module
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
+sys.path.insert(0, os.path.join(ROOT, 'backend'))
 
 from app import app
+from assets import missing_vendor_files, missing_vendor_message
+
+GUNICORN_CONFIG = os.path.join(ROOT, 'gunicorn.conf.py')
+
+
+def serve_production(options):
+    """Serve the app with gunicorn; ``options`` override gunicorn.conf.py."""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        sys.exit("gunicorn is not installed, run: pip install -r requirements.txt")
+
+    class TaskTrackerServer(BaseApplication):
+        def load_config(self):
+            settings = runpy.run_path(GUNICORN_CONFIG)
+            settings.update((key, value) for key, value in options.items() if value is not None)
+            for key, value in settings.items():
+                if key in self.cfg.settings:
+                    self.cfg.set(key, value)
+
+        def load(self):
+            # Already imported (and the schema initialized) in this process
+            return app
+
+    TaskTrackerServer().run()
+
 
 if __name__ == "__main__":
-    print("Starting Task Tracker Application...")
-    print("Visit http://localhost:5000 to access the application")
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Run the Task Tracker application')
+    parser.add_argument('--production', action='store_true',
+                        help='Serve with gunicorn worker processes instead of the development server')
+    parser.add_argument('--bind', help='HOST:PORT to listen on (default: 0.0.0.0:5000)')
+    parser.add_argument('--workers', type=int, help='Worker processes (production only)')
+    parser.add_argument('--threads', type=int, help='Threads per worker process (production only)')
+    parser.add_argument('--allow-cdn', action='store_true',
+                        help='Serve in production even if the vendored libraries have not been fetched')
+    args = parser.parse_args()
+
+    missing = missing_vendor_files()
+    if args.production:
+        if missing and not args.allow_cdn:
+            sys.exit(missing_vendor_message(missing) + " (or pass --allow-cdn)")
+        serve_production({'bind': args.bind, 'workers': args.workers, 'threads': args.threads})
+    else:
+        host, _, port = (args.bind or '0.0.0.0:5000').rpartition(':')
+        if missing:
+            print(f"Warning: {missing_vendor_message(missing)}", file=sys.stderr)
+        print("Starting Task Tracker Application...")
+        print(f"Visit http://localhost:{port} to access the application")
+        app.run(host=host, port=int(port), debug=True)
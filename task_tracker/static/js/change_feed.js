@@ -0,0 +1,90 @@
+(function() {
+    const streamUrl = document.currentScript.dataset.streamUrl;
+    if (!('EventSource' in window)) {
+        return;
+    }
+    const patching = {};
+
+    function insertByNewest(container, item, taskId) {
+        // Lists are ordered by ID, newest first
+        const next = Array.from(container.children).find(child => parseInt(child.dataset.taskId) < taskId);
+        if (next) {
+            container.insertBefore(item, next);
+        } else if (!document.getElementById('load-more')) {
+            container.appendChild(item);
+        } else {
+            // Older than everything loaded so far: it comes with a later page
+            return false;
+        }
+        return true;
+    }
+
+    function patchTask(taskId) {
+        const containers = document.querySelectorAll('[data-page-items]');
+        if (!containers.length) {
+            return;
+        }
+        if (patching[taskId]) {
+            patching[taskId] = 'again';
+            return;
+        }
+        patching[taskId] = 'loading';
+
+        const url = new URL(window.location.href);
+        url.searchParams.delete('after');
+        url.searchParams.set('task_id', taskId);
+        fetch(url)
+            .then(response => response.text())
+            .then(html => {
+                const page = new DOMParser().parseFromString(html, 'text/html');
+                const added = [];
+                containers.forEach(container => {
+                    const selector = `:scope > [data-task-id="${taskId}"]`;
+                    const current = container.querySelector(selector);
+                    const source = page.getElementById(container.id);
+                    const updated = source && source.querySelector(selector);
+                    if (current && updated) {
+                        current.replaceWith(updated);
+                        added.push(updated);
+                    } else if (current) {
+                        current.remove();
+                    } else if (updated && insertByNewest(container, updated, taskId)) {
+                        added.push(updated);
+                    }
+                });
+                if (added.length) {
+                    document.dispatchEvent(new CustomEvent('page-loaded', { detail: { items: added } }));
+                }
+            })
+            .catch(error => console.error('Error updating task:', error))
+            .finally(() => {
+                const again = patching[taskId] === 'again';
+                delete patching[taskId];
+                if (again) {
+                    patchTask(taskId);
+                }
+            });
+    }
+
+    const changes = new EventSource(streamUrl);
+    ['task-changed', 'project-changed'].forEach(type => {
+        changes.addEventListener(type, function(e) {
+            const change = JSON.parse(e.data);
+            if (change.task_id) {
+                patchTask(change.task_id);
+            }
+            document.dispatchEvent(new CustomEvent(type, { detail: change }));
+        });
+    });
+    // Old completed tasks moved to the archive (one event per project):
+    // re-check the completed tasks shown, the archived ones are removed
+    changes.addEventListener('tasks-archived', function(e) {
+        const change = JSON.parse(e.data);
+        document.querySelectorAll('[data-page-items] > .completed-task[data-task-id]').forEach(item => {
+            patchTask(parseInt(item.dataset.taskId));
+        });
+        document.dispatchEvent(new CustomEvent('tasks-archived', { detail: change }));
+    });
+    // Bulk changes, or the missed changes are no longer available
+    changes.addEventListener('reload', () => window.location.reload());
+})();
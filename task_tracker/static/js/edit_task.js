@@ -0,0 +1,41 @@
+// The task from the data-task-id attribute of the script tag
+const editedTaskId = Number(document.currentScript.dataset.taskId);
+
+document.addEventListener('DOMContentLoaded', function() {
+    const moveTaskBtn = document.getElementById('moveTaskBtn');
+    const taskId = editedTaskId;
+
+    moveTaskBtn.addEventListener('click', function() {
+        const targetProjectId = document.getElementById('targetProject').value;
+
+        // Send AJAX request to move task to another project
+        fetch('/api/move_task_to_project', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                task_id: taskId,
+                project_id: parseInt(targetProjectId)
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // Close modal and reload page
+                const modal = bootstrap.Modal.getInstance(document.getElementById('moveToProjectModal'));
+                modal.hide();
+
+                // Show success message and reload
+                alert('Задача успешно перемещена в проект!');
+                location.reload();
+            } else {
+                alert('Ошибка перемещения задачи: ' + (data.error || 'Неизвестная ошибка'));
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Ошибка соединения: ' + error.message);
+        });
+    });
+});
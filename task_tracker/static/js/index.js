@@ -0,0 +1,321 @@
+// URL from the data-events-url attribute of the script tag
+const miniCalendarEventsUrl = document.currentScript.dataset.eventsUrl;
+
+document.addEventListener('DOMContentLoaded', function() {
+    // Initialize mini calendar with day view
+    var miniCalendarEl = document.getElementById('mini-calendar');
+
+    if (miniCalendarEl) {
+        var miniCalendar = new FullCalendar.Calendar(miniCalendarEl, {
+            initialView: 'dayGridDay',  // Set to day view as requested
+            locale: 'ru',
+            headerToolbar: {
+                left: 'prev,next today',
+                center: 'title',
+                right: 'dayGridMonth,timeGridWeek,timeGridDay'
+            },
+            events: miniCalendarEventsUrl,  // Loaded for the visible date range only
+            height: 400,
+            editable: true,
+            eventDrop: function(info) {
+                // Handle moving an event to a new date/time
+                const taskId = info.event.extendedProps.taskId;
+                const newDate = info.event.start;
+
+                // Format date as YYYY-MM-DD
+                const dateStr = newDate.toISOString().split('T')[0];
+                let timeStr = null;
+
+                // Extract time if it's a timed event
+                if (info.event.start) {
+                    timeStr = newDate.toTimeString().substring(0, 5); // HH:MM format
+                }
+
+                // Update the task with the new planned date/time via API
+                fetch('/api/update_task_datetime', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({
+                        task_id: parseInt(taskId),
+                        planned_date: dateStr,
+                        planned_time: timeStr
+                    })
+                })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success) {
+                        showNotification('Задача успешно перемещена');
+                    } else {
+                        console.error('Error updating task:', data.error);
+
+                        // Revert the event to its original position
+                        info.revert();
+                    }
+                })
+                .catch(error => {
+                    console.error('Error updating task datetime:', error);
+
+                    // Revert the event to its original position
+                    info.revert();
+                });
+            },
+            eventClick: function(info) {
+                // Handle click on calendar event - open in modal
+                const taskId = info.event.extendedProps.taskId;
+                loadTaskDetails(taskId);
+            }
+        });
+
+        miniCalendar.render();
+
+        // Show changes made by anyone
+        document.addEventListener('task-changed', () => miniCalendar.refetchEvents());
+        document.addEventListener('project-changed', () => miniCalendar.refetchEvents());
+        document.addEventListener('tasks-archived', () => miniCalendar.refetchEvents());
+    }
+
+    // Kanban drag-and-drop functionality
+    const tasks = document.querySelectorAll('.kanban-task');
+    const columns = document.querySelectorAll('.kanban-column');
+
+    // Simple notification function
+    function showNotification(message) {
+        // Create notification element
+        const notification = document.createElement('div');
+        notification.style.position = 'fixed';
+        notification.style.bottom = '20px';
+        notification.style.right = '20px';
+        notification.style.backgroundColor = '#28a745';
+        notification.style.color = 'white';
+        notification.style.padding = '15px 20px';
+        notification.style.borderRadius = '5px';
+        notification.style.zIndex = '9999';
+        notification.style.boxShadow = '0 4px 6px rgba(0,0,0,0.1)';
+        notification.style.opacity = '0';
+        notification.style.transition = 'opacity 0.3s ease-in-out';
+        notification.textContent = message;
+
+        document.body.appendChild(notification);
+
+        // Fade in
+        setTimeout(() => {
+            notification.style.opacity = '1';
+        }, 10);
+
+        // Remove after 3 seconds
+        setTimeout(() => {
+            notification.style.opacity = '0';
+            setTimeout(() => {
+                document.body.removeChild(notification);
+            }, 300);
+        }, 3000);
+    }
+
+    function bindTask(task) {
+        task.addEventListener('dragstart', dragStart);
+        task.addEventListener('dragend', dragEnd);
+        task.addEventListener('click', function(e) {
+            // Prevent click when dragging
+            if (this.classList.contains('dragging')) {
+                return;
+            }
+
+            const taskId = this.dataset.taskId;
+            loadTaskDetails(taskId);
+        });
+    }
+
+    tasks.forEach(bindTask);
+
+    // Cards appended by "load more"
+    document.addEventListener('page-loaded', function(e) {
+        e.detail.items.filter(item => item.classList.contains('kanban-task')).forEach(bindTask);
+    });
+
+    columns.forEach(column => {
+        column.addEventListener('dragover', dragOver);
+        column.addEventListener('dragenter', dragEnter);
+        column.addEventListener('dragleave', dragLeave);
+        column.addEventListener('drop', drop);
+    });
+
+    function dragStart(e) {
+        e.dataTransfer.setData('text/plain', e.target.dataset.taskId);
+        e.target.classList.add('dragging');
+
+        // Add temporary styling to all possible drop targets
+        columns.forEach(col => col.classList.add('drop-target'));
+
+        // Also indicate that this is coming from kanban
+        e.dataTransfer.effectAllowed = 'copy';
+    }
+
+    function dragEnd(e) {
+        e.target.classList.remove('dragging');
+
+        // Remove temporary styling from all possible drop targets
+        columns.forEach(col => col.classList.remove('drop-target'));
+    }
+
+    function dragOver(e) {
+        e.preventDefault();
+    }
+
+    function dragEnter(e) {
+        e.preventDefault();
+        e.target.closest('.kanban-column').classList.add('drag-over');
+    }
+
+    function dragLeave(e) {
+        e.target.closest('.kanban-column').classList.remove('drag-over');
+    }
+
+    function drop(e) {
+        e.preventDefault();
+        const column = e.target.closest('.kanban-column');
+        column.classList.remove('drag-over');
+
+        const taskId = e.dataTransfer.getData('text/plain');
+        const newStatus = column.dataset.status;
+
+        // Update the task status via API
+        fetch('/api/update_kanban_status', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                task_id: parseInt(taskId),
+                new_status: newStatus
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // Move the task element to the new column
+                const taskElement = document.querySelector(`.kanban-task[data-task-id="${taskId}"]`);
+                column.appendChild(taskElement);
+
+                // If the new status is "Закрытые", also mark the task as completed
+                if (newStatus === 'Закрытые') {
+                    fetch('/api/toggle_task_completed', {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json',
+                        },
+                        body: JSON.stringify({
+                            task_id: parseInt(taskId),
+                            completed: true
+                        })
+                    })
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.success) {
+                            // Update the UI to reflect the completed status
+                            const taskElement = document.querySelector(`.kanban-task[data-task-id="${taskId}"]`);
+                            if (taskElement) {
+                                taskElement.classList.add('completed-task');
+                            }
+                        }
+                    });
+                }
+            }
+        })
+        .catch(error => {
+            console.error('Error updating task status:', error);
+        });
+    }
+
+    // Function to load task details into modal
+    function loadTaskDetails(taskId) {
+        fetch(`/api/task/${taskId}?fields=title,project_identifier,task_number,description,planned_date,deadline,priority,kanban_status,project_name,completed`)
+            .then(response => response.json())
+            .then(taskData => {
+                // Populate modal with task details
+                document.getElementById('modal-task-title').textContent = taskData.title;
+                document.getElementById('modal-task-id').textContent = `[${taskData.project_identifier}-${taskData.task_number}]`;
+                document.getElementById('modal-task-description').textContent = taskData.description || '-';
+                document.getElementById('modal-task-planned-date').textContent = taskData.planned_date || '-';
+                document.getElementById('modal-task-deadline').textContent = taskData.deadline || '-';
+                document.getElementById('modal-task-priority').innerHTML = `
+                    <span class="badge 
+                        ${taskData.priority === 'Срочный' ? 'bg-danger' :
+                          taskData.priority === 'Важный' ? 'bg-warning text-dark' :
+                          taskData.priority === 'Базовый' ? 'bg-primary' :
+                          taskData.priority === 'Низкий' ? 'bg-secondary' : 'bg-info'}
+                    ">${taskData.priority}</span>
+                `;
+                document.getElementById('modal-task-status').textContent = taskData.kanban_status || 'Не указан';
+                document.getElementById('modal-task-project').textContent = `${taskData.project_name} (${taskData.project_identifier})`;
+
+                // Set completion status and button state
+                const completedCheckbox = document.getElementById('modal-task-completed');
+                completedCheckbox.checked = taskData.completed;
+
+                // Update the completed button text
+                const completedBtn = document.getElementById('toggle-completed-btn');
+                if (taskData.completed) {
+                    completedBtn.className = 'btn btn-success btn-sm';
+                    completedBtn.textContent = 'Выполнено ✓';
+                } else {
+                    completedBtn.className = 'btn btn-outline-secondary btn-sm';
+                    completedBtn.textContent = 'Выполнить';
+                }
+
+                // Store task ID in modal for later use
+                document.getElementById('task-modal').dataset.taskId = taskData.id;
+
+                // Show the modal
+                const modal = new bootstrap.Modal(document.getElementById('task-modal'));
+                modal.show();
+            })
+            .catch(error => {
+                console.error('Error loading task details:', error);
+                alert('Ошибка загрузки деталей задачи');
+            });
+    }
+
+    // Handle completion button click
+    document.getElementById('toggle-completed-btn').addEventListener('click', function() {
+        const taskId = document.getElementById('task-modal').dataset.taskId;
+        const isCompleted = document.getElementById('modal-task-completed').checked;
+
+        fetch('/api/toggle_task_completed', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                task_id: parseInt(taskId),
+                completed: !isCompleted
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // Update checkbox and button
+                const checkbox = document.getElementById('modal-task-completed');
+                checkbox.checked = !isCompleted;
+
+                const completedBtn = document.getElementById('toggle-completed-btn');
+                if (!isCompleted) { // Task is now completed
+                    completedBtn.className = 'btn btn-success btn-sm';
+                    completedBtn.textContent = 'Выполнено ✓';
+                } else { // Task is now incomplete
+                    completedBtn.className = 'btn btn-outline-secondary btn-sm';
+                    completedBtn.textContent = 'Выполнить';
+                }
+
+                // The list, board and calendar are updated by the change feed
+            } else {
+                alert('Ошибка обновления статуса задачи');
+            }
+        })
+        .catch(error => {
+            console.error('Error updating task completion:', error);
+            alert('Ошибка обновления статуса задачи');
+        });
+    });
+});
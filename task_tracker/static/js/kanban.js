@@ -0,0 +1,119 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const tasks = document.querySelectorAll('.kanban-task');
+    const columns = document.querySelectorAll('.kanban-column');
+
+    function bindTask(task) {
+        task.addEventListener('dragstart', dragStart);
+        task.addEventListener('dragend', dragEnd);
+        task.addEventListener('click', function(e) {
+            // Проверяем, что клик не был по элементу перетаскивания или другому внутреннему элементу
+            if (!e.target.classList.contains('kanban-task') && !e.target.closest('.kanban-task')) {
+                return;
+            }
+
+            const taskId = this.dataset.taskId;
+            window.location.href = '/task/' + taskId;
+        });
+    }
+
+    tasks.forEach(bindTask);
+
+    // Cards appended by "load more"
+    document.addEventListener('page-loaded', function(e) {
+        e.detail.items.filter(item => item.classList.contains('kanban-task')).forEach(bindTask);
+    });
+
+    columns.forEach(column => {
+        column.addEventListener('dragover', dragOver);
+        column.addEventListener('dragenter', dragEnter);
+        column.addEventListener('dragleave', dragLeave);
+        column.addEventListener('drop', drop);
+    });
+
+    function dragStart(e) {
+        e.dataTransfer.setData('text/plain', e.target.dataset.taskId);
+        e.target.classList.add('dragging');
+
+        // Add temporary styling to all possible drop targets
+        columns.forEach(col => col.classList.add('drop-target'));
+
+        // Also indicate that this is coming from kanban
+        e.dataTransfer.effectAllowed = 'copy';
+    }
+
+    function dragEnd(e) {
+        e.target.classList.remove('dragging');
+
+        // Remove temporary styling from all possible drop targets
+        columns.forEach(col => col.classList.remove('drop-target'));
+    }
+
+    function dragOver(e) {
+        e.preventDefault();
+    }
+
+    function dragEnter(e) {
+        e.preventDefault();
+        e.target.closest('.kanban-column').classList.add('drag-over');
+    }
+
+    function dragLeave(e) {
+        e.target.closest('.kanban-column').classList.remove('drag-over');
+    }
+
+    function drop(e) {
+        e.preventDefault();
+        const column = e.target.closest('.kanban-column');
+        column.classList.remove('drag-over');
+
+        const taskId = e.dataTransfer.getData('text/plain');
+        const newStatus = column.dataset.status;
+
+        // Update the task status via API
+        fetch('/api/update_kanban_status', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                task_id: parseInt(taskId),
+                new_status: newStatus
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // Move the task element to the new column
+                const taskElement = document.querySelector(`[data-task-id="${taskId}"]`);
+                column.appendChild(taskElement);
+
+                // If the new status is "Закрытые", also mark the task as completed
+                if (newStatus === 'Закрытые') {
+                    fetch('/api/toggle_task_completed', {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json',
+                        },
+                        body: JSON.stringify({
+                            task_id: parseInt(taskId),
+                            completed: true
+                        })
+                    })
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.success) {
+                            // Update the UI to reflect the completed status
+                            const taskElement = document.querySelector(`[data-task-id="${taskId}"]`);
+                            if (taskElement) {
+                                taskElement.classList.add('completed-task');
+                            }
+                        }
+                    });
+                }
+            }
+        })
+        .catch(error => {
+            console.error('Error updating task status:', error);
+        });
+    }
+});
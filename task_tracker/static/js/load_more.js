@@ -0,0 +1,43 @@
+function loadNextPage() {
+    const loadMore = document.getElementById('load-more');
+    if (!loadMore || loadMore.dataset.loading) {
+        return;
+    }
+    loadMore.dataset.loading = 'true';
+
+    fetch(loadMore.dataset.nextPage)
+        .then(response => response.text())
+        .then(html => {
+            const page = new DOMParser().parseFromString(html, 'text/html');
+            const added = [];
+            page.querySelectorAll('[data-page-items]').forEach(container => {
+                const target = document.getElementById(container.id);
+                Array.from(container.children).forEach(item => {
+                    target.appendChild(item);
+                    added.push(item);
+                });
+            });
+            document.dispatchEvent(new CustomEvent('page-loaded', { detail: { items: added } }));
+
+            const nextLoadMore = page.getElementById('load-more');
+            if (nextLoadMore) {
+                loadMore.dataset.nextPage = nextLoadMore.dataset.nextPage;
+                delete loadMore.dataset.loading;
+            } else {
+                loadMore.remove();
+            }
+        })
+        .catch(error => {
+            console.error('Error loading next page:', error);
+            delete loadMore.dataset.loading;
+        });
+}
+
+// Infinite scroll: load the next page as soon as the control scrolls into view
+if ('IntersectionObserver' in window) {
+    new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting)) {
+            loadNextPage();
+        }
+    }).observe(document.getElementById('load-more'));
+}
@@ -0,0 +1,25 @@
+// URL from the data-create-task-url attribute of the script tag
+const quickTaskUrl = document.currentScript.dataset.createTaskUrl;
+
+function createQuickTask() {
+    fetch(quickTaskUrl, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.redirect_url) {
+            window.location.href = data.redirect_url;
+        } else {
+            // Fallback if JSON response is not as expected
+            window.location.reload();
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        // Fallback to regular navigation if fetch fails
+        window.location.href = quickTaskUrl;
+    });
+}
@@ -0,0 +1,61 @@
+// Typeahead search over /api/search
+(function() {
+    const searchUrl = document.currentScript.dataset.searchUrl;
+    const input = document.getElementById('task-search');
+    const results = document.getElementById('task-search-results');
+    let timer = null;
+    let controller = null;
+
+    function showResults(tasks) {
+        results.innerHTML = '';
+        tasks.forEach(task => {
+            const item = document.createElement('a');
+            item.className = 'list-group-item list-group-item-action';
+            item.href = task.url;
+            const title = document.createElement('div');
+            title.className = 'fw-bold';
+            title.textContent = `[${task.id_display}] ${task.title}`;
+            const snippet = document.createElement('small');
+            snippet.className = 'text-muted';
+            snippet.innerHTML = task.snippet;  // escaped by the server, matches in <mark>
+            item.append(title, snippet);
+            results.appendChild(item);
+        });
+        if (!tasks.length) {
+            const empty = document.createElement('div');
+            empty.className = 'list-group-item text-muted';
+            empty.textContent = 'Ничего не найдено';
+            results.appendChild(empty);
+        }
+        results.style.display = 'block';
+    }
+
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            results.style.display = 'none';
+            return;
+        }
+        timer = setTimeout(() => {
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+            fetch(`${searchUrl}?q=${encodeURIComponent(query)}`, { signal: controller.signal })
+                .then(response => response.json())
+                .then(tasks => showResults(Array.isArray(tasks) ? tasks : []))
+                .catch(error => {
+                    if (error.name !== 'AbortError') {
+                        console.error('Error searching tasks:', error);
+                    }
+                });
+        }, 200);
+    });
+
+    document.addEventListener('click', function(e) {
+        if (!e.target.closest('#task-search, #task-search-results')) {
+            results.style.display = 'none';
+        }
+    });
+})();
@@ -0,0 +1,92 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const selectedProjectId = new URLSearchParams(window.location.search).get('project_id');
+    const dateParam = new URLSearchParams(window.location.search).get('date');
+
+    // Highlight selected project if passed as parameter
+    if (selectedProjectId) {
+        const projectItem = document.querySelector(`[data-project-id="${selectedProjectId}"]`);
+        if (projectItem) {
+            projectItem.classList.add('selected');
+        }
+    }
+
+    // Handle project selection
+    document.querySelectorAll('.project-item').forEach(item => {
+        item.addEventListener('click', function() {
+            // Remove selection from other items
+            document.querySelectorAll('.project-item').forEach(el => {
+                el.classList.remove('selected');
+            });
+
+            // Select clicked item
+            this.classList.add('selected');
+
+            // Get project ID and name
+            const projectId = this.dataset.projectId;
+            const projectName = this.dataset.projectName;
+
+            // Build URL with date parameter if exists
+            let redirectUrl = `/create_task/${projectId}`;
+            if (dateParam) {
+                redirectUrl += `?date=${dateParam}`;
+            }
+
+            // Redirect to create task page
+            window.location.href = redirectUrl;
+        });
+    });
+
+    // Refresh projects button
+    document.getElementById('refreshProjectsBtn').addEventListener('click', function() {
+        // Reload the page to get updated projects
+        location.reload();
+    });
+
+    // Create project button
+    document.getElementById('createProjectBtn').addEventListener('click', function() {
+        const modal = new bootstrap.Modal(document.getElementById('createProjectModal'));
+        modal.show();
+    });
+
+    // Save project button
+    document.getElementById('saveProjectBtn').addEventListener('click', function() {
+        const name = document.getElementById('projectName').value;
+        const identifier = document.getElementById('projectIdentifier').value;
+
+        if (!name || !identifier) {
+            alert('Пожалуйста, заполните все поля');
+            return;
+        }
+
+        // Send AJAX request to create project
+        fetch('/create_project', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/x-www-form-urlencoded',
+            },
+            body: `name=${encodeURIComponent(name)}&identifier=${encodeURIComponent(identifier)}`
+        })
+        .then(response => {
+            if (response.ok) {
+                // Close modal and reload page
+                const modal = bootstrap.Modal.getInstance(document.getElementById('createProjectModal'));
+                modal.hide();
+
+                // Clear form
+                document.getElementById('createProjectForm').reset();
+
+                // Reload to show new project
+                setTimeout(() => {
+                    location.reload();
+                }, 500);
+            } else {
+                return response.text().then(text => {
+                    alert('Ошибка создания проекта: ' + text);
+                });
+            }
+        })
+        .catch(error => {
+            alert('Ошибка соединения: ' + error.message);
+        });
+    });
+});
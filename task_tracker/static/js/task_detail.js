@@ -0,0 +1,145 @@
+// The task from the data-task-id and data-completed attributes of the script tag
+const taskDetail = document.currentScript.dataset;
+
+document.addEventListener('DOMContentLoaded', function() {
+    const taskId = Number(taskDetail.taskId);
+    const calendarToggle = document.getElementById('calendarToggle');
+    const kanbanToggle = document.getElementById('kanbanToggle');
+    const calendarStatus = document.getElementById('calendarStatus');
+    const kanbanStatus = document.getElementById('kanbanStatus');
+
+    // Check if current IP is allowed to edit this task
+    fetch(`/task/${taskId}/edit_allowed`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.can_edit) {
+                // Disable edit button if IP is not in whitelist
+                const editBtn = document.getElementById('editButton');
+                editBtn.classList.remove('btn-primary');
+                editBtn.classList.add('btn-secondary');
+                editBtn.classList.add('disabled');
+                editBtn.setAttribute('aria-disabled', 'true');
+                editBtn.innerHTML = 'Просмотр (редакт. запрещено)';
+                editBtn.href = '#';
+
+                // Disable toggle switches
+                calendarToggle.disabled = true;
+                kanbanToggle.disabled = true;
+            }
+        })
+        .catch(error => {
+            console.error('Error checking edit permissions:', error);
+        });
+
+    // Function to update task visibility
+    function updateTaskVisibility() {
+        fetch('/api/update_task_visibility', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                task_id: taskId,
+                show_in_calendar: calendarToggle.checked,
+                kanban_enabled: kanbanToggle.checked
+            })
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // Update status text
+                calendarStatus.textContent = calendarToggle.checked ? 'Да' : 'Нет';
+                kanbanStatus.textContent = kanbanToggle.checked ? 'Да' : 'Нет';
+            } else {
+                alert('Ошибка обновления видимости задачи');
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Ошибка обновления видимости задачи');
+        });
+    }
+
+    // Add event listeners to toggles
+    calendarToggle.addEventListener('change', updateTaskVisibility);
+    kanbanToggle.addEventListener('change', updateTaskVisibility);
+});
+
+function shareTask() {
+    const taskId = Number(taskDetail.taskId);
+    fetch(`/share_task/${taskId}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.success) {
+                // Copy to clipboard and show notification
+                navigator.clipboard.writeText(data.url).then(function() {
+                    // Show temporary notification
+                    const originalText = document.querySelector('.btn-success').textContent;
+                    document.querySelector('.btn-success').textContent = 'Скопировано!';
+
+                    setTimeout(function() {
+                        document.querySelector('.btn-success').textContent = originalText;
+                    }, 2000);
+                }).catch(err => {
+                    console.error('Failed to copy: ', err);
+                    // Fallback: show modal with link
+                    alert('Ссылка для задачи: ' + data.url);
+                });
+            } else {
+                alert('Ошибка при генерации ссылки');
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('Ошибка при получении ссылки');
+        });
+}
+
+// Handle completion button click
+document.getElementById('toggle-completed-btn').addEventListener('click', function() {
+    const taskId = Number(taskDetail.taskId);
+    const isCompleted = taskDetail.completed === '1';
+
+    fetch('/api/toggle_task_completed', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            task_id: taskId,
+            completed: !isCompleted
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Update the button appearance
+            const completedBtn = document.getElementById('toggle-completed-btn');
+            if (!isCompleted) { // Task is now completed
+                completedBtn.className = 'btn btn-success w-100 mb-2';
+                completedBtn.textContent = 'Выполнено ✓';
+
+                // Update the status badge
+                document.querySelector('.badge.bg-secondary').className = 'badge bg-success';
+                document.querySelector('.badge.bg-success').textContent = 'Выполнено';
+                document.querySelector('.badge.bg-success').insertAdjacentHTML('afterend', `<span class=\"ms-2\">(${new Date().toISOString().split('T')[0]})</span>`);
+            } else { // Task is now incomplete
+                completedBtn.className = 'btn btn-outline-secondary w-100 mb-2';
+                completedBtn.textContent = 'Выполнить';
+
+                // Update the status badge
+                document.querySelector('.badge.bg-success').className = 'badge bg-secondary';
+                document.querySelector('.badge.bg-secondary').textContent = 'Не выполнено';
+            }
+
+            // Change the background color of the entire page to reflect the task status
+            document.body.style.backgroundColor = !isCompleted ? '#cccccc' : '#f5f5f5';
+        } else {
+            alert('Ошибка обновления статуса задачи');
+        }
+    })
+    .catch(error => {
+        console.error('Error updating task completion:', error);
+        alert('Ошибка обновления статуса задачи');
+    });
+});
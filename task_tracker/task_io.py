@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Task Import/Export Script for Task Tracker Application
+
+Streams tasks between the database and CSV or JSONL files (one task per
+row/line), e.g. to migrate history from another tracker:
+
+    python task_io.py export tasks.csv
+    python task_io.py import tasks.jsonl
+    python task_io.py export - --format jsonl | gzip > tasks.jsonl.gz
+
+Every task refers to its project by identifier (``project``); projects
+that don't exist yet are created, named after ``project_name`` if given.
+The import runs in one transaction with executemany batches, while the
+task indexes and the derived tables (calendar events, search index) are
+rebuilt once at the end instead of row by row.
+"""
+
+import argparse
+import csv
+import json
+import operator
+import sqlite3
+import sys
+import time
+
+from init_db import DATABASE, init_database, bulk_load
+
+# Columns of an export, in order; an import needs at least project and title
+TASK_FIELDS = [
+    'project', 'project_name', 'task_number', 'title', 'description', 'planned_date', 'planned_start_time',
+    'deadline', 'priority', 'show_in_calendar', 'completed', 'completion_date', 'color', 'kanban_enabled',
+    'kanban_status', 'responsible',
+]
+# SQL defaults for missing or empty fields, as in the tasks table definition
+DEFAULTS = {
+    'priority': "'Базовый'",
+    'show_in_calendar': '1',
+    'completed': '0',
+    'color': "'#1098ad'",
+    'kanban_enabled': '1',
+    'kanban_status': "'Новая'",
+}
+BOOLEAN_FIELDS = {'show_in_calendar', 'completed', 'kanban_enabled'}
+BOOLEAN_WORDS = {True: ['1', 'true', 'yes', 'on'], False: ['0', 'false', 'no', 'off']}
+# Columns filled from the fields of the same name, after project_id and task_number
+TASK_COLUMNS = TASK_FIELDS[3:]
+
+IMPORT_BATCH_SIZE = 50000
+EXPORT_BATCH_SIZE = 5000
+# Errors listed in the import report (all of them are counted)
+MAX_REPORTED_ERRORS = 20
+
+
+def detect_format(path, file_format):
+    """Format from the --format option or the file extension"""
+    if file_format:
+        return file_format
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    raise ValueError(f"Can't tell the format of {path!r}, use --format csv or --format jsonl")
+
+
+def open_file(path, mode):
+    """Open a file for the csv module, '-' meaning stdin/stdout"""
+    if path == '-':
+        return open((sys.stdin if 'r' in mode else sys.stdout).fileno(), mode, encoding='utf-8',
+                    newline='', closefd=False)
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def read_records(f, file_format):
+    """Yield (line number, field values in TASK_FIELDS order) from a CSV or JSONL file.
+
+    Fields missing from the file are None.
+    """
+    if file_format == 'csv':
+        reader = csv.reader(f)
+        header = next(reader, [])
+        # Missing fields are read from a None appended to every row
+        fields = operator.itemgetter(*[header.index(field) if field in header else -1 for field in TASK_FIELDS])
+        for line_number, row in enumerate(reader, start=2):
+            if not row:
+                continue
+            if len(row) != len(header):
+                # Short or long row: pad or cut it to the header
+                row = (row + [None] * len(header))[:len(header)]
+            row.append(None)
+            yield line_number, fields(row)
+    else:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                record = json.loads(line)
+                yield line_number, [record.get(field) for field in TASK_FIELDS]
+
+
+def column_value(column):
+    """SQL expression for a task column value given as a parameter.
+
+    CSV values are all strings and JSON ones may be typed, so empty values
+    get the column default and flags accept 1/0, true/false, yes/no, on/off.
+    """
+    if column in BOOLEAN_FIELDS:
+        # A CASE rather than IN (...), which builds a lookup table on every call
+        cases = ' '.join(f"WHEN '{word}' THEN {int(flag)}" for flag, words in BOOLEAN_WORDS.items() for word in words)
+        return f"CASE lower(?) {cases} ELSE {DEFAULTS[column]} END"
+    if column in DEFAULTS:
+        return f"COALESCE(NULLIF(?, ''), {DEFAULTS[column]})"
+    if column == 'completion_date':
+        return "NULLIF(?, '')"
+    return '?'
+
+
+INSERT_TASK = f'''
+    INSERT INTO tasks (project_id, task_number, {', '.join(TASK_COLUMNS)})
+    VALUES (?, ?, {', '.join(column_value(column) for column in TASK_COLUMNS)})
+'''
+
+
+def import_tasks(database, path, file_format=None, batch_size=IMPORT_BATCH_SIZE):
+    """Import tasks from a CSV/JSONL file. Returns a report dict.
+
+    Task numbers from the file are kept for projects the import creates;
+    tasks of existing projects are numbered after the project's last task.
+    Records without a project or title are skipped and reported.
+    """
+    file_format = detect_format(path, file_format)
+    init_database(database)
+    started = time.perf_counter()
+    report = {'tasks': 0, 'projects_created': 0, 'skipped': 0, 'errors': []}
+
+    conn = sqlite3.connect(database)
+    conn.execute('PRAGMA cache_size = -200000')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    cursor = conn.cursor()
+    # identifier -> [project id, last task number, created by this import]
+    projects = {identifier: [project_id, counter, False]
+                for project_id, identifier, counter in cursor.execute('SELECT id, identifier, task_counter FROM projects')}
+
+    with open_file(path, 'r') as f, bulk_load(conn, drop_indexes=True):
+        batch = []
+        for line_number, (identifier, project_name, number, *values) in read_records(f, file_format):
+            identifier = str(identifier or '').strip()
+            if not identifier or not values[0]:
+                report['skipped'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append(f"line {line_number}: a task needs a project and a title")
+                continue
+
+            project = projects.get(identifier)
+            if project is None:
+                cursor.execute('INSERT INTO projects (name, identifier, responsible) VALUES (?, ?, ?)',
+                               (project_name or identifier, identifier, ''))
+                project = projects[identifier] = [cursor.lastrowid, 0, True]
+                report['projects_created'] += 1
+
+            if project[2] and str(number).isdigit():
+                number = int(number)
+                if number > project[1]:
+                    project[1] = number
+            else:
+                project[1] += 1
+                number = project[1]
+
+            batch.append((project[0], number, *values))
+            if len(batch) >= batch_size:
+                cursor.executemany(INSERT_TASK, batch)
+                report['tasks'] += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(INSERT_TASK, batch)
+            report['tasks'] += len(batch)
+
+        cursor.executemany('UPDATE projects SET task_counter = ? WHERE id = ?',
+                           [(counter, project_id) for project_id, counter, _ in projects.values()])
+
+    conn.commit()
+    conn.close()
+    report['seconds'] = time.perf_counter() - started
+    return report
+
+
+def export_tasks(database, path, file_format=None):
+    """Export every task, archived ones included, to a CSV/JSONL file in ID order. Returns the number of tasks."""
+    file_format = detect_format(path, file_format)
+    init_database(database)
+    conn = sqlite3.connect(database)
+    # With t.id among the result columns SQLite merges the live and the archived
+    # tasks in ID order, instead of collecting and sorting all of them first
+    cursor = conn.execute(f'''
+        SELECT p.identifier, p.name, t.task_number, {', '.join('t.' + column for column in TASK_COLUMNS)}, t.id
+        FROM all_tasks_v t
+        JOIN projects p ON t.project_id = p.id
+        ORDER BY t.id
+    ''')
+    count = 0
+    with open_file(path, 'w') as f:
+        if file_format == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(TASK_FIELDS)
+        while True:
+            rows = [row[:-1] for row in cursor.fetchmany(EXPORT_BATCH_SIZE)]
+            if not rows:
+                break
+            if file_format == 'csv':
+                writer.writerows(['' if value is None else value for value in row] for row in rows)
+            else:
+                f.writelines(json.dumps(dict(zip(TASK_FIELDS, row)), ensure_ascii=False) + '\n' for row in rows)
+            count += len(rows)
+    conn.close()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import or export Task Tracker tasks as CSV or JSONL')
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('file', help="CSV/JSONL file, or '-' for stdin/stdout")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='File format (default: from the extension)')
+    parser.add_argument('--database', default=DATABASE, help='Database file (default: %(default)s)')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE, help='Rows per executemany batch')
+    args = parser.parse_args()
+
+    # Progress goes to stderr so an export to stdout stays clean
+    try:
+        if args.command == 'import':
+            report = import_tasks(args.database, args.file, args.format, args.batch_size)
+            rate = report['tasks'] / report['seconds'] if report['seconds'] else 0
+            print(f"Imported {report['tasks']} tasks in {report['seconds']:.1f}s ({rate:,.0f} tasks/s), "
+                  f"created {report['projects_created']} projects, skipped {report['skipped']} records",
+                  file=sys.stderr)
+            for error in report['errors']:
+                print(f"  {error}", file=sys.stderr)
+        else:
+            started = time.perf_counter()
+            count = export_tasks(args.database, args.file, args.format)
+            seconds = time.perf_counter() - started
+            rate = count / seconds if seconds else 0
+            print(f"Exported {count} tasks in {seconds:.1f}s ({rate:,.0f} tasks/s)", file=sys.stderr)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error during {args.command}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
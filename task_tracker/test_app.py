@@ -5,13 +5,56 @@ Test script to verify the Task Tracker application functionality
 
 import sys
 import os
+import re
+import json
+from datetime import date, timedelta
+
+import pytest
 
 # Add the backend directory to the path to find the app module
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
+import app as backend_app
 from app import app, init_db
 import sqlite3
 
+
+@pytest.fixture(autouse=True)
+def temp_database(tmp_path, monkeypatch):
+    """Run every test against a fresh database instead of the checked-in tasks.db"""
+    monkeypatch.chdir(tmp_path)
+    init_db()
+    return tmp_path / backend_app.DATABASE
+
+
+@pytest.fixture
+def traced_statements(monkeypatch):
+    """The SQL statements run on the request connections, in order"""
+    statements = []
+    original_get_db_connection = backend_app.get_db_connection
+
+    def tracing_connection():
+        conn = original_get_db_connection()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(backend_app, 'get_db_connection', tracing_connection)
+    return statements
+
+
+def create_sample_task(**fields):
+    """Insert a project (if needed) and a task, return the task id"""
+    conn = sqlite3.connect(backend_app.DATABASE)
+    conn.execute("INSERT OR IGNORE INTO projects (id, name, identifier) VALUES (1, 'Sample Project', 'SP')")
+    task = {'project_id': 1, 'title': 'Sample task', 'description': 'Sample description'}
+    task.update(fields)
+    columns = ', '.join(task)
+    placeholders = ', '.join('?' for _ in task)
+    cursor = conn.execute(f'INSERT INTO tasks ({columns}) VALUES ({placeholders})', tuple(task.values()))
+    conn.commit()
+    conn.close()
+    return cursor.lastrowid
+
 def test_app_creation():
     """Test that the Flask app can be created successfully"""
     assert app is not None
@@ -77,6 +120,1126 @@ def test_routes():
         assert response.status_code == 200
         print("✓ API route (/api/tasks) works")
 
+def test_list_routes_use_indexes(traced_statements):
+    """Test that the list routes never fall back to a full scan of the tasks table"""
+    create_sample_task(planned_date='2024-01-10', deadline='2024-01-12')
+    create_sample_task(completed=1, completion_date='2024-01-05')
+
+    routes = ['/', '/kanban', '/calendar', '/completed_tasks', '/all_completed_tasks',
+              '/project/1', '/api/calendar_events',
+              '/api/calendar_events?start=2024-01-01&end=2024-02-01']
+    with app.test_client() as client:
+        for route in routes:
+            assert client.get(route).status_code == 200, route
+
+    queries = [sql for sql in traced_statements if sql.lstrip().upper().startswith('SELECT')]
+    assert queries
+
+    # Any SCAN of tasks (also one along an index) reads the whole table unless a LIMIT stops it early
+    import slow_queries
+    conn = sqlite3.connect(backend_app.DATABASE)
+    for sql in queries:
+        plan, full_scan = slow_queries.explain(conn, sql, ())
+        assert not full_scan, (sql, plan)
+    conn.close()
+
+
+def test_connection_pool_reuses_configured_connections():
+    """Test that requests share pooled connections set up for WAL"""
+    opened = []
+    pool = backend_app.get_pool(backend_app.DATABASE)
+    original_connect = pool.connect
+
+    def counting_connect():
+        conn = original_connect()
+        opened.append(conn)
+        return conn
+
+    pool.connect = counting_connect
+    with app.test_client() as client:
+        for _ in range(3):
+            assert client.get('/projects').status_code == 200
+    assert len(opened) == 1
+
+    conn = pool.acquire()
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+    pool.release(conn)
+
+
+def test_calendar_events_date_range():
+    """Test that the calendar API only returns events inside the requested range"""
+    january = create_sample_task(title='January', planned_date='2024-01-10', deadline='2024-03-01')
+    create_sample_task(title='March', planned_date='2024-03-05')
+    create_sample_task(title='Hidden', planned_date='2024-01-11', show_in_calendar=0)
+
+    with app.test_client() as client:
+        response = client.get('/api/calendar_events?start=2024-01-01T00:00:00+03:00&end=2024-02-01T00:00:00+03:00')
+        assert response.status_code == 200
+        events = response.get_json()
+        assert [(e['extendedProps']['taskId'], e['start']) for e in events] == [(january, '2024-01-10')]
+
+        # The deadline in March is returned for a window that covers it
+        events = client.get('/api/calendar_events?start=2024-03-01&end=2024-04-01').get_json()
+        assert sorted(e['start'] for e in events) == ['2024-03-01', '2024-03-05']
+
+        # Without a range every calendar event is returned
+        assert len(client.get('/api/calendar_events').get_json()) == 3
+
+
+def test_calendar_events_follow_task_changes():
+    """Test that the trigger-maintained calendar events track task and project changes"""
+    task_id = create_sample_task(title='Planned', planned_date='2024-05-02', planned_start_time='09:30',
+                                 deadline='2024-05-03', color='', priority='Срочный')
+
+    def events():
+        with app.test_client() as client:
+            return client.get('/api/calendar_events').get_json()
+
+    planned, deadline = events()
+    assert planned['title'] == '[SP-1] Planned'
+    assert planned['start'] == '2024-05-02T09:30'
+    assert planned['color'] == '#e03131'
+    assert deadline['title'] == '[SP-1] DEADLINE: Planned'
+    assert deadline['extendedProps']['startTime'] is None
+
+    conn = sqlite3.connect(backend_app.DATABASE)
+    conn.execute("UPDATE tasks SET deadline = planned_date, title = 'Renamed' WHERE id = ?", (task_id,))
+    conn.execute("UPDATE projects SET identifier = 'NEW' WHERE id = 1")
+    conn.commit()
+    assert [e['title'] for e in events()] == ['[NEW-1] Renamed']
+
+    # A full rebuild produces the same rows as the triggers
+    from init_db import rebuild_calendar_events
+    before = conn.execute('SELECT * FROM calendar_events').fetchall()
+    rebuild_calendar_events(conn)
+    assert conn.execute('SELECT * FROM calendar_events').fetchall() == before
+
+    conn.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+    conn.commit()
+    conn.close()
+    assert events() == []
+
+
+def test_api_tasks_keyset_pagination():
+    """Test that /api/tasks pages cover every task once, even with inserts between pages"""
+    task_ids = [create_sample_task(title=f'Task {i}') for i in range(5)]
+
+    seen = []
+    with app.test_client() as client:
+        url = '/api/tasks?limit=2'
+        while url:
+            response = client.get(url)
+            seen.extend(task['id'] for task in response.get_json())
+            # A task created while paging shows up at the end instead of shifting pages
+            if len(seen) == 2:
+                task_ids.append(create_sample_task(title='Concurrent'))
+            link = response.headers.get('Link')
+            url = link[1:link.index('>')] if link else None
+            if url:
+                assert response.headers['X-Next-Cursor'] == str(seen[-1])
+
+    assert seen == task_ids
+
+
+def test_all_completed_tasks_pagination():
+    """Test that completed tasks page through dated and undated tasks in order"""
+    undated = create_sample_task(title='Undated', completed=1)
+    older = create_sample_task(title='Older', completed=1, completion_date='2024-01-01')
+    newer = create_sample_task(title='Newer', completed=1, completion_date='2024-02-01')
+    same_day = create_sample_task(title='Same day', completed=1, completion_date='2024-02-01')
+
+    def task_links(html):
+        return [int(task_id) for task_id in re.findall(r'/task/(\d+)"', html)]
+
+    with app.test_client() as client:
+        first = client.get('/all_completed_tasks?limit=2').get_data(as_text=True)
+        assert task_links(first) == [same_day, newer]
+        next_url = re.search(r'data-next-page="([^"]+)"', first).group(1).replace('&amp;', '&')
+
+        second = client.get(next_url).get_data(as_text=True)
+        assert task_links(second) == [older, undated]
+        assert 'data-next-page' not in second
+
+
+def test_all_completed_tasks_ignores_malformed_cursor():
+    """Test that a malformed completed-tasks cursor shows the first page instead of failing"""
+    task_id = create_sample_task(title='Done', completed=1, completion_date='2024-01-01')
+
+    with app.test_client() as client:
+        for after in ['garbage', '2024-01-01:', ':', '2024-01-01:x', ':-1']:
+            response = client.get('/all_completed_tasks', query_string={'after': after})
+            assert response.status_code == 200, after
+            assert f'/task/{task_id}"' in response.get_data(as_text=True)
+
+
+def test_kanban_pagination():
+    """Test that the kanban board renders one page of cards and links to the next"""
+    task_ids = [create_sample_task(title=f'Card {i}') for i in range(3)]
+
+    with app.test_client() as client:
+        html = client.get('/kanban?limit=2').get_data(as_text=True)
+        assert re.findall(r'data-task-id="(\d+)"', html) == [str(task_ids[2]), str(task_ids[1])]
+        assert f'after={task_ids[1]}' in html
+
+        html = client.get(f'/kanban?limit=2&after={task_ids[1]}').get_data(as_text=True)
+        assert re.findall(r'data-task-id="(\d+)"', html) == [str(task_ids[0])]
+
+
+def test_api_tasks_streaming_export(monkeypatch):
+    """Test that the streaming formats export every task, not just one page"""
+    monkeypatch.setattr(backend_app, 'STREAM_BATCH_SIZE', 2)
+    task_ids = [create_sample_task(title=f'Задача {i}') for i in range(5)]
+
+    with app.test_client() as client:
+        response = client.get('/api/tasks?format=ndjson&limit=1')
+        assert response.is_streamed
+        assert response.mimetype == 'application/x-ndjson'
+        lines = response.get_data(as_text=True).splitlines()
+        exported = [json.loads(line) for line in lines]
+        assert [task['id'] for task in exported] == task_ids
+        assert exported[0]['title'] == 'Задача 0'
+        assert exported[0]['id_display'] == 'SP-1'
+
+        response = client.get(f'/api/tasks?format=json-stream&after={task_ids[1]}')
+        assert json.loads(response.get_data(as_text=True)) == exported[2:]
+
+        assert client.get('/api/tasks?format=xml').status_code == 400
+
+
+def test_task_apis_project_fields_and_columns(traced_statements):
+    """Test that fields= narrows the SELECT and format=columns sends each field name once"""
+    first = create_sample_task(title='Первая', description='Long ' * 100, deadline='2020-01-01')
+    second = create_sample_task(title='Вторая', kanban_status='В работе',
+                                planned_date='2999-01-01', deadline='2999-01-02')
+    with app.test_client() as client:
+        full = client.get('/api/tasks').get_json()
+        assert full[0]['description'].startswith('Long') and full[0]['id_display'] == 'SP-1'
+
+        tasks = client.get('/api/tasks?fields=title,id_display,overdue').get_json()
+        assert tasks == [{'id': first, 'title': 'Первая', 'id_display': 'SP-1', 'overdue': 1},
+                         {'id': second, 'title': 'Вторая', 'id_display': 'SP-2', 'overdue': 0}]
+        query = next(sql for sql in reversed(traced_statements) if 'FROM tasks t' in sql)
+        assert 'description' not in query and 't.*' not in query
+
+        response = client.get('/api/tasks?fields=kanban_status,title&format=columns&limit=1')
+        assert response.get_json() == {'columns': ['id', 'kanban_status', 'title'],
+                                       'rows': [[first, 'Новая', 'Первая']]}
+        assert response.headers['X-Next-Cursor'] == str(first)
+        lines = client.get('/api/tasks?fields=title&format=ndjson').get_data(as_text=True).splitlines()
+        assert json.loads(lines[1]) == {'id': second, 'title': 'Вторая'}
+
+        task = client.get(f'/api/task/{second}?fields=title,project_name,archived').get_json()
+        assert task == {'id': second, 'title': 'Вторая', 'project_name': 'Sample Project', 'archived': 0}
+        assert client.get(f'/api/task/{second}').get_json()['kanban_status'] == 'В работе'
+
+        response = client.get('/api/tasks?fields=title,secret')
+        assert response.status_code == 400 and 'secret' in response.get_json()['error']
+        assert client.get(f'/api/task/{second}?fields=id;DROP').status_code == 400
+
+
+def test_responses_are_compressed_and_reused_per_etag(monkeypatch):
+    """Test that large responses are gzipped when accepted, and the same ETag reuses the compressed body"""
+    import gzip
+    import compression
+    monkeypatch.setattr(compression, 'cache', compression.CompressedCache())
+    monkeypatch.setattr(compression, 'ENCODINGS', ['gzip'])
+    calls = []
+    original_compress = compression.compress
+
+    def counting_compress(data, encoding):
+        calls.append(encoding)
+        return original_compress(data, encoding)
+
+    monkeypatch.setattr(compression, 'compress', counting_compress)
+    for i in range(30):
+        create_sample_task(title=f'Задача {i}', description='Описание задачи ' * 5)
+
+    with app.test_client() as client:
+        plain = client.get('/api/tasks')
+        assert 'Content-Encoding' not in plain.headers and plain.headers['Vary'] == 'Accept-Encoding'
+
+        response = client.get('/api/tasks', headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(response.get_data()) == plain.get_data()
+        assert int(response.headers['Content-Length']) < len(plain.get_data()) / 4
+        assert client.get('/api/tasks', headers={'Accept-Encoding': 'gzip'}).get_data() == response.get_data()
+        assert calls == ['gzip']
+        # A new data version means a new body to compress
+        create_sample_task(title='Новая')
+        client.get('/api/tasks', headers={'Accept-Encoding': 'gzip'})
+        assert calls == ['gzip', 'gzip']
+
+        assert 'Content-Encoding' not in client.get('/api/tasks', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+        small = client.get('/api/tasks?limit=1&fields=title', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in small.headers
+        page = client.get('/', headers={'Accept-Encoding': 'gzip'})
+        assert page.headers['Content-Encoding'] == 'gzip' and b'</html>' in gzip.decompress(page.get_data())
+
+        # Streamed exports are compressed chunk by chunk
+        export = client.get('/api/tasks?format=ndjson', headers={'Accept-Encoding': 'gzip'})
+        assert export.is_streamed and export.headers['Content-Encoding'] == 'gzip'
+        assert len(gzip.decompress(export.get_data()).splitlines()) == 31
+
+
+def test_static_assets_have_hashed_urls_and_are_cached_for_good():
+    """Test that pages link their scripts and styles by content-hashed URLs served as immutable"""
+    import re
+    task_id = create_sample_task(title='Static')
+    with app.test_client() as client:
+        page = client.get('/').get_data(as_text=True)
+        # No inline scripts or styles left in the pages
+        assert '<style>' not in page and '<script>' not in page
+        assert '<script>' not in client.get(f'/task/{task_id}').get_data(as_text=True)
+        urls = re.findall(r'(?:src|href)="(/static/[^"]+)"', page)
+        assert any(re.fullmatch(r'/static/js/index\.[0-9a-f]{12}\.js', url) for url in urls)
+
+        for url in urls:
+            response = client.get(url)
+            assert response.status_code == 200, url
+            assert response.headers['Cache-Control'] == 'public, max-age=31536000, immutable'
+            assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+        # Outdated hashes aren't served under the cached-forever name; plain names are revalidated
+        assert client.get('/static/js/index.000000000000.js').status_code == 404
+        plain = client.get('/static/js/index.js')
+        assert plain.status_code == 200 and plain.headers['Cache-Control'] == 'no-cache'
+        assert plain.content_type == 'text/javascript; charset=utf-8'
+        # Gzipped bytes under the same tag as the plain ones: the ETag can only be weak
+        compressed = client.get('/static/js/index.js', headers={'Accept-Encoding': 'gzip'})
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert compressed.headers['ETag'] == plain.headers['ETag'] and plain.headers['ETag'].startswith('W/')
+        assert client.get('/static/js/index.js', headers={'Accept-Encoding': 'gzip',
+                                                          'If-None-Match': compressed.headers['ETag']}).status_code == 304
+        assert client.get('/static/../backend/app.py').status_code == 404
+
+
+def test_vendored_files_are_only_written_with_their_pinned_sha256(tmp_path, monkeypatch):
+    """Test that fetch_vendor.py writes a download only if its sha256 is the pinned one"""
+    import hashlib
+    import io
+    import fetch_vendor
+    data = b'/* library */'
+    digest = hashlib.sha256(data).hexdigest()
+    monkeypatch.setattr(fetch_vendor, 'STATIC_DIR', str(tmp_path))
+    monkeypatch.setattr(fetch_vendor, 'VENDOR_SOURCES', {
+        'vendor/good.js': ('https://cdn.example/good.js', digest),
+        'vendor/changed.js': ('https://cdn.example/changed.js', '0' * 64),
+        'vendor/unpinned.js': ('https://cdn.example/unpinned.js', None),
+    })
+    monkeypatch.setattr(fetch_vendor.urllib.request, 'urlopen', lambda url, timeout: io.BytesIO(data))
+
+    fetched, refused = fetch_vendor.fetch_vendor()
+    assert fetched == ['vendor/good.js']
+    assert [path for path, _ in refused] == ['vendor/changed.js', 'vendor/unpinned.js']
+    assert digest in refused[1][1]
+    assert sorted(os.listdir(tmp_path / 'vendor')) == ['good.js']
+
+
+def test_task_numbers_are_stored_per_project():
+    """Test that task numbers are assigned per project and survive moves of other tasks"""
+    first = create_sample_task(title='First')
+    second = create_sample_task(title='Second')
+    conn = sqlite3.connect(backend_app.DATABASE)
+    conn.execute("INSERT INTO projects (id, name, identifier) VALUES (2, 'Other', 'OT')")
+    conn.commit()
+    other = create_sample_task(project_id=2, title='Other first')
+
+    with app.test_client() as client:
+        # Moving the first task doesn't renumber the second one
+        response = client.post('/api/move_task_to_project', json={'task_id': first, 'project_id': 2})
+        assert response.get_json() == {'success': True}
+
+        numbers = dict(conn.execute('SELECT id, task_number FROM tasks').fetchall())
+        assert numbers == {first: 2, second: 2, other: 1}
+        assert conn.execute('SELECT task_counter FROM projects ORDER BY id').fetchall() == [(2,), (2,)]
+
+        assert 'SP-2' in client.get(f'/task/{second}').get_data(as_text=True)
+        assert 'OT-2' in client.get(f'/edit_task/{first}').get_data(as_text=True)
+
+        # Display IDs resolve with a single indexed lookup
+        response = client.get('/task/OT-2')
+        assert response.status_code == 302
+        assert response.headers['Location'].endswith(f'/task/{first}')
+        assert client.get('/task/OT-9').status_code == 404
+    conn.close()
+
+
+def test_backfill_task_numbers_matches_previous_numbering():
+    """Test that the back-fill numbers existing tasks by their position in the project"""
+    from init_db import backfill_task_numbers
+    task_ids = [create_sample_task(title=f'Task {i}') for i in range(3)]
+    conn = sqlite3.connect(backend_app.DATABASE)
+    conn.execute('UPDATE tasks SET task_number = NULL')
+    conn.execute('UPDATE projects SET task_counter = 0')
+    assert backfill_task_numbers(conn) == 3
+    assert conn.execute('SELECT id, task_number FROM tasks ORDER BY id').fetchall() == [
+        (task_id, number) for number, task_id in enumerate(task_ids, start=1)]
+    assert conn.execute('SELECT task_counter FROM projects').fetchone()[0] == 3
+    conn.close()
+
+
+def test_overdue_flag_and_filter():
+    """Test that overdue tasks are flagged by the query and can be filtered in the API"""
+    late = create_sample_task(title='Late', deadline='2000-01-01')
+    planned_late = create_sample_task(title='Planned late', planned_date='2000-01-01', deadline='2999-01-01')
+    create_sample_task(title='Future', planned_date='2999-01-01', deadline='')
+    create_sample_task(title='Undated', planned_date='', deadline='')
+    create_sample_task(title='Done late', deadline='2000-01-01', planned_date='2000-01-01',
+                       completed=1, completion_date='2000-01-02')
+
+    with app.test_client() as client:
+        tasks = client.get('/api/tasks').get_json()
+        assert {task['title']: task['overdue'] for task in tasks} == {
+            'Late': 1, 'Planned late': 1, 'Future': 0, 'Undated': 0, 'Done late': 0}
+        assert [task['id'] for task in client.get('/api/tasks?overdue=1').get_json()] == [late, planned_late]
+        export = client.get('/api/tasks?overdue=1&format=ndjson').get_data(as_text=True)
+        assert [json.loads(line)['id'] for line in export.splitlines()] == [late, planned_late]
+        assert client.get('/').get_data(as_text=True).count('overdue-task"') == 2
+
+    conn = sqlite3.connect(backend_app.DATABASE)
+    plan = ' '.join(row[3] for row in conn.execute(
+        f'EXPLAIN QUERY PLAN SELECT * FROM task_list_v t WHERE t.id IN ({backend_app.OVERDUE_TASK_IDS})'))
+    assert 'idx_tasks_overdue_deadline (deadline>? AND deadline<?)' in plan
+    assert 'idx_tasks_overdue_planned (planned_date>? AND planned_date<?)' in plan
+    conn.close()
+
+
+def test_read_apis_answer_conditional_requests(traced_statements):
+    """Test that unchanged data is answered with 304 without querying the tasks"""
+    task_id = create_sample_task(planned_date='2024-01-10')
+    with app.test_client() as client:
+        for route in ['/api/tasks', '/api/projects', '/api/calendar_events?start=2024-01-01&end=2024-02-01']:
+            response = client.get(route)
+            etag = response.headers['ETag']
+            assert response.status_code == 200 and etag.startswith('W/')
+
+            traced_statements.clear()
+            response = client.get(route, headers={'If-None-Match': etag})
+            assert response.status_code == 304, route
+            assert not response.get_data()
+            assert all('change_log' in sql for sql in traced_statements), traced_statements
+            # Dates only have whole seconds: writes within a second would go unnoticed
+            assert 'Last-Modified' not in response.headers
+            response = client.get(route, headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+            assert response.status_code == 200, route
+
+        client.post('/api/update_kanban_status', json={'task_id': task_id, 'new_status': 'В работе'})
+        response = client.get('/api/tasks', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+
+def read_stream_event(chunks):
+    """Next server-sent event from a streamed response as (event, data)"""
+    for chunk in chunks:
+        fields = dict(line.split(': ', 1) for line in chunk.decode().splitlines() if ': ' in line)
+        if 'event' in fields:
+            return fields['event'], json.loads(fields['data'])
+
+
+def test_change_stream_publishes_task_changes():
+    """Test that committed writes are pushed to the change stream with the changed fields"""
+    task_id = create_sample_task(kanban_status='Новая')
+    other_id = create_sample_task(title='Other')
+    with app.test_client() as client:
+        response = client.get('/api/stream', buffered=False)
+        assert response.mimetype == 'text/event-stream'
+        chunks = response.iter_encoded()
+        assert next(chunks) == b'retry: 2000\n\n'
+
+        client.post('/api/update_kanban_status', json={'task_id': task_id, 'new_status': 'В работе'})
+        event, change = read_stream_event(chunks)
+        response.close()
+        assert event == 'task-changed'
+        assert change['task_id'] == task_id
+        assert change['action'] == 'update'
+        assert change['fields'] == ['kanban_status']
+
+        # A reconnecting client first gets the changes it missed
+        response = client.get('/api/stream', headers={'Last-Event-ID': str(change['version'] - 1)}, buffered=False)
+        assert read_stream_event(response.iter_encoded()) == (event, change)
+        response.close()
+
+        # Pages re-render a single changed task in place
+        kanban = client.get(f'/kanban?task_id={task_id}').get_data(as_text=True)
+        assert f'data-task-id="{task_id}"' in kanban
+        assert f'data-task-id="{other_id}"' not in kanban
+        assert f'api/stream?since={change["version"]}' in kanban
+
+
+def test_task_numbering_is_not_logged_as_a_separate_change():
+    """Test that inserting or moving a task logs one change, not another one for its new number"""
+    conn = sqlite3.connect(backend_app.DATABASE)
+    conn.execute("INSERT INTO projects (id, name, identifier) VALUES (2, 'Other', 'OT')")
+    conn.commit()
+    version = conn.execute('SELECT COALESCE(MAX(version), 0) FROM change_log').fetchone()[0]
+    task_id = create_sample_task(title='Numbered')
+    with app.test_client() as client:
+        client.post('/api/move_task_to_project', json={'task_id': task_id, 'project_id': 2})
+
+    changes = conn.execute('SELECT action, fields FROM change_log WHERE version > ? AND task_id = ?',
+                           (version, task_id)).fetchall()
+    assert changes == [('insert', None), ('update', '["project_id"]')]
+    assert conn.execute('SELECT task_number FROM tasks WHERE id = ?', (task_id,)).fetchone()[0] == 1
+    conn.close()
+
+
+def test_change_streams_end_on_shutdown():
+    """Test that closing the change feeds ends the open streams right away"""
+    from change_feed import close_change_feeds
+    with app.test_client() as client:
+        response = client.get('/api/stream', buffered=False)
+        chunks = response.iter_encoded()
+        assert next(chunks) == b'retry: 2000\n\n'
+        close_change_feeds()
+        assert list(chunks) == []
+        response.close()
+
+
+def test_change_streams_unsubscribe_on_every_exit(monkeypatch):
+    """Test that streams which end early, or are never handed over, don't stay subscribed"""
+    import socket
+    import stream_hub
+    from change_feed import get_change_feed
+    feed = get_change_feed(backend_app.DATABASE)
+    subscribers = feed.subscriber_count()
+    server_side, client_side = socket.socketpair()
+    with app.test_client() as client:
+        response = client.get('/api/stream', buffered=False)
+        response.close()
+        assert feed.subscriber_count() == subscribers
+
+        def broken_start(*args):
+            raise OSError('Too many open files')
+        monkeypatch.setattr(stream_hub.hub, 'start', broken_start)
+        # Buffered: the response is closed after its body failed, as gunicorn does
+        with pytest.raises(OSError):
+            client.get('/api/stream', environ_base={'gunicorn.socket': server_side}, buffered=True)
+        assert feed.subscriber_count() == subscribers
+
+        def broken_changes_since(conn, version):
+            raise sqlite3.OperationalError('disk I/O error')
+        monkeypatch.setattr(backend_app, 'changes_since', broken_changes_since)
+        assert client.get('/api/stream?since=0').status_code == 500
+        assert feed.subscriber_count() == subscribers
+    server_side.close()
+    client_side.close()
+
+
+def test_handed_over_change_streams_share_one_thread():
+    """Test that hundreds of streams taken over from the server are served by the hub thread alone"""
+    import socket
+    import threading
+    import time
+    import stream_hub
+    task_id = create_sample_task()
+    clients = []
+
+    def open_stream(client):
+        server_side, client_side = socket.socketpair()
+        # The request ends once the hub has the connection, as under gunicorn
+        with pytest.raises(BrokenPipeError):
+            client.get('/api/stream', environ_base={'gunicorn.socket': server_side})
+        server_side.close()
+        client_side.settimeout(5)
+        clients.append(client_side)
+        return client_side
+
+    def wait_for_streams(count):
+        # The hub thread registers and drops streams on its own time
+        deadline = time.monotonic() + 5
+        while stream_hub.hub.stream_count() != count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return stream_hub.hub.stream_count()
+
+    def read_until(sock, marker):
+        data = b''
+        while marker not in data:
+            chunk = sock.recv(65536)
+            assert chunk, data
+            data += chunk
+        return data
+
+    with app.test_client() as client:
+        head = read_until(open_stream(client), b'retry: 2000\n\n')
+        assert head.startswith(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream')
+        threads = threading.active_count()
+        streams = stream_hub.hub.stream_count()
+        for _ in range(299):
+            open_stream(client)
+        assert threading.active_count() == threads
+        assert wait_for_streams(streams + 299) == streams + 299
+
+        # Pages and writes are answered next to the open streams
+        assert client.get('/kanban').status_code == 200
+        client.post('/api/update_kanban_status', json={'task_id': task_id, 'new_status': 'В работе'})
+        for sock in clients:
+            assert b'event: task-changed' in read_until(sock, b'event: task-changed')
+
+    # Closed clients are dropped
+    for sock in clients:
+        sock.close()
+    assert wait_for_streams(streams - 1) == streams - 1
+
+
+def test_bulk_update_tasks_in_one_transaction():
+    """Test that bulk patches are applied with one commit and reported per item"""
+    first = create_sample_task(title='First')
+    second = create_sample_task(title='Second')
+    statements = []
+    # Writes are made on the writer thread's connection
+    backend_app.get_writer(backend_app.DATABASE).set_trace_callback(statements.append)
+
+    patches = [
+        {'task_id': first, 'kanban_status': 'В работе'},
+        {'task_id': second, 'kanban_status': 'Буфер', 'completed': True},
+        {'task_id': 999, 'kanban_status': 'Буфер'},
+        {'task_id': first, 'title': 'Renamed'},
+        {'task_id': first, 'project_id': 42},
+    ]
+    with app.test_client() as client:
+        response = client.post('/api/tasks/bulk', json={'patches': patches})
+        assert response.status_code == 200
+        result = response.get_json()
+        assert not result['success']
+        assert [item['success'] for item in result['results']] == [True, True, False, False, False]
+        assert result['results'][2]['error'] == 'Task not found'
+        assert result['results'][3]['error'] == 'Unknown fields: title'
+        assert result['results'][4]['error'] == 'Project not found'
+
+        assert client.post('/api/tasks/bulk', json={'patches': 'nope'}).status_code == 400
+
+    assert sum(sql.upper().startswith('COMMIT') for sql in statements) == 1
+    conn = sqlite3.connect(backend_app.DATABASE)
+    rows = conn.execute('SELECT title, kanban_status, completed, completion_date IS NOT NULL FROM tasks ORDER BY id')
+    assert rows.fetchall() == [('First', 'В работе', 0, 0), ('Second', 'Буфер', 1, 1)]
+    conn.close()
+
+
+def test_bulk_update_tasks_validates_ids_and_values():
+    """Test that bulk patches with mistyped IDs or values are reported per item, not stored"""
+    task_id = create_sample_task(title='Typed')
+    patches = [
+        {'task_id': [task_id], 'kanban_status': 'Буфер'},
+        {'task_id': True, 'kanban_status': 'Буфер'},
+        {'task_id': task_id, 'completed': 'false'},
+        {'task_id': task_id, 'project_id': True, 'kanban_enabled': 2},
+        {'task_id': task_id, 'kanban_status': None},
+        {'task_id': task_id, 'completed': True, 'show_in_calendar': 0, 'planned_date': None},
+    ]
+    with app.test_client() as client:
+        response = client.post('/api/tasks/bulk', json=patches)
+        assert response.status_code == 200
+        results = response.get_json()['results']
+
+    assert [result['success'] for result in results] == [False, False, False, False, False, True]
+    assert results[0]['error'] == results[1]['error'] == 'task_id must be a task ID'
+    assert results[2]['error'] == 'Invalid values: completed must be true or false'
+    assert results[3]['error'] == ('Invalid values: kanban_enabled must be true or false, '
+                                   'project_id must be a project ID')
+    assert results[4]['error'] == 'Invalid values: kanban_status must be a string'
+    conn = sqlite3.connect(backend_app.DATABASE)
+    row = conn.execute('SELECT kanban_status, completed, show_in_calendar, completion_date IS NOT NULL '
+                       'FROM tasks WHERE id = ?', (task_id,)).fetchone()
+    assert row == ('Новая', 1, 0, 1)
+    assert conn.execute('SELECT open_tasks, completed_tasks FROM project_stats WHERE project_id = 1').fetchone() == (0, 1)
+    conn.close()
+
+
+def test_parallel_writes_are_serialized_by_the_writer():
+    """Test that 50 concurrent writing requests all succeed, committed by the writer thread in batches"""
+    import threading
+    task_ids = [create_sample_task(title=f'Task {i}') for i in range(50)]
+    statements = []
+    backend_app.get_writer(backend_app.DATABASE).set_trace_callback(statements.append)
+    start = threading.Barrier(len(task_ids))
+    responses = {}
+
+    def drag(task_id):
+        with app.test_client() as client:
+            start.wait()
+            if task_id % 2:
+                responses[task_id] = client.post('/api/update_kanban_status',
+                                                 json={'task_id': task_id, 'new_status': 'В работе'})
+            else:
+                responses[task_id] = client.post('/api/tasks/bulk', json=[
+                    {'task_id': task_id, 'kanban_status': 'В работе', 'completed': True}])
+
+    threads = [threading.Thread(target=drag, args=(task_id,)) for task_id in task_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [(task_id, responses[task_id].status_code) for task_id in task_ids] == [(task_id, 200) for task_id in task_ids]
+    assert all(response.get_json()['success'] for response in responses.values())
+    assert 1 <= sum(sql == 'COMMIT' for sql in statements) <= len(task_ids)
+    conn = sqlite3.connect(backend_app.DATABASE)
+    rows = conn.execute("SELECT id, completed FROM tasks WHERE kanban_status = 'В работе' ORDER BY id").fetchall()
+    assert rows == [(task_id, 0 if task_id % 2 else 1) for task_id in task_ids]
+    conn.close()
+
+
+def test_failing_write_is_rolled_back_alone():
+    """Test that a write failing in the writer's batch doesn't undo or fail the others"""
+    with app.test_client() as client:
+        assert client.post('/create_project', data={'name': 'A', 'identifier': 'SAME'}).status_code == 302
+        assert client.post('/create_project', data={'name': 'B', 'identifier': 'SAME'}).status_code == 400
+        assert client.get('/create_task_without_project').status_code == 302
+    conn = sqlite3.connect(backend_app.DATABASE)
+    assert conn.execute("SELECT name FROM projects WHERE identifier = 'SAME'").fetchall() == [('A',)]
+    conn.close()
+
+
+def test_request_connections_are_read_only():
+    """Test that the pooled request connections refuse to write"""
+    pool = backend_app.get_pool(backend_app.DATABASE)
+    read_conn = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        read_conn.execute("UPDATE tasks SET title = 'x'")
+    pool.release(read_conn)
+
+
+def test_writer_survives_failing_jobs_and_is_replaced_when_stopped(monkeypatch):
+    """Test that no exception leaves writes waiting for a writer thread that is gone"""
+    from db import get_writer
+
+    def insert(conn, title):
+        return conn.execute("INSERT INTO projects (name, identifier) VALUES (?, ?)", (title, title)).lastrowid
+
+    def leave(conn):
+        insert(conn, 'EXIT')
+        raise SystemExit
+
+    writer = get_writer(backend_app.DATABASE)
+    with pytest.raises(SystemExit):
+        writer.submit(leave)
+    assert writer.submit(insert, 'ONE')
+
+    # An error outside any job fails that batch only
+    with monkeypatch.context() as patch:
+        patch.setattr(writer, '_write', lambda batch: 1 / 0)
+        with pytest.raises(ZeroDivisionError):
+            writer.submit(insert, 'LOST')
+    assert writer.submit(insert, 'TWO')
+
+    writer.close()
+    with pytest.raises(sqlite3.OperationalError):
+        writer.submit(insert, 'LATE')
+    replacement = get_writer(backend_app.DATABASE)
+    assert replacement is not writer
+    assert replacement.submit(insert, 'THREE')
+
+    conn = sqlite3.connect(backend_app.DATABASE)
+    assert [row[0] for row in conn.execute('SELECT identifier FROM projects ORDER BY id')] == ['ONE', 'TWO', 'THREE']
+    conn.close()
+
+
+def test_writers_of_several_processes_wait_for_each_other():
+    """Test that writers in separate processes (e.g. gunicorn workers) take turns without lock errors"""
+    import subprocess
+    script = (
+        "import sys\n"
+        "from db import Writer\n"
+        "writer = Writer('tasks.db')\n"
+        "for i in range(100):\n"
+        "    writer.submit(lambda conn, i: conn.execute(\n"
+        "        'INSERT INTO projects (name, identifier) VALUES (?, ?)', (sys.argv[1], f'{sys.argv[1]}{i}')), i)\n"
+        "writer.close()\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.path.join(os.path.dirname(__file__), 'backend'))
+    processes = [subprocess.Popen([sys.executable, '-c', script, f'P{n}'], env=env, stderr=subprocess.PIPE, text=True)
+                 for n in range(4)]
+    for process in processes:
+        _, errors = process.communicate(timeout=60)
+        assert process.returncode == 0, errors
+
+    conn = sqlite3.connect(backend_app.DATABASE)
+    assert conn.execute('SELECT name, COUNT(*) FROM projects GROUP BY name ORDER BY name').fetchall() == [
+        (f'P{n}', 100) for n in range(4)]
+    conn.close()
+
+
+def test_ip_whitelist_matches_ipv4_and_ipv6(tmp_path):
+    """Test that the whitelist matches IPv4/IPv6 networks and reloads when the file changes"""
+    from ip_whitelist import IPWhitelist
+    path = tmp_path / 'whitelist.txt'
+    whitelist = IPWhitelist(str(path))
+    assert whitelist.allows('8.8.8.8')  # no whitelist file: everything is allowed
+
+    path.write_text('# Office\n127.0.0.1\n10.0.0.0/8\n10.1.0.0/16\n2001:db8::/32\nnot-an-ip\n')
+    assert whitelist.allows('127.0.0.1')
+    assert whitelist.allows('10.200.3.4')
+    assert whitelist.allows('::ffff:10.0.0.1')
+    assert whitelist.allows('2001:db8:1::5')
+    assert not whitelist.allows('127.0.0.2')
+    assert not whitelist.allows('11.0.0.0')
+    assert not whitelist.allows('2001:db9::1')
+    assert not whitelist.allows('garbage')
+
+    path.write_text('192.168.0.0/16\n')
+    os.utime(path, ns=(0, 1))
+    assert whitelist.allows('192.168.1.1')
+    assert not whitelist.allows('10.200.3.4')
+
+    with app.test_client() as client:
+        allowed = client.get('/task/1/edit_allowed', headers={'X-Forwarded-For': '192.168.5.5'}).get_json()
+        denied = client.get('/task/1/edit_allowed', headers={'X-Forwarded-For': '2001:db8::1'}).get_json()
+    assert allowed['can_edit'] and not denied['can_edit']
+
+
+def test_search_ranks_prefix_matches_with_snippets():
+    """Test full-text search with typeahead prefixes, ranking, snippets and index upkeep"""
+    report = create_sample_task(title='Квартальный отчёт', description='Собрать <цифры> для отчёта')
+    create_sample_task(title='Позвонить клиенту', description='Обсудить отчёт')
+    create_sample_task(title='Unrelated', description='Nothing here')
+
+    with app.test_client() as client:
+        results = client.get('/api/search?q=отч').get_json()
+        assert [result['title'] for result in results] == ['Квартальный отчёт', 'Позвонить клиенту']
+        assert results[0]['id_display'] == 'SP-1'
+        assert results[0]['snippet'] == 'Квартальный <mark>отчёт</mark>'
+        assert client.get('/api/search?q=цифр').get_json()[0]['snippet'] == 'Собрать &lt;<mark>цифры</mark>&gt; для отчёта'
+        assert client.get('/api/search?q=SP клиент').get_json()[0]['title'] == 'Позвонить клиенту'
+        assert client.get('/api/search?q=" OR *').get_json() == []
+        assert client.get('/api/search?q=').get_json() == []
+
+        client.post('/edit_task/%d' % report, data={'title': 'Annual review', 'description': ''})
+        assert [result['id'] for result in client.get('/api/search?q=annual').get_json()] == [report]
+        assert len(client.get('/api/search?q=отч').get_json()) == 1
+
+    conn = sqlite3.connect(backend_app.DATABASE)
+    conn.execute("UPDATE projects SET name = 'Renamed Project' WHERE id = 1")
+    conn.commit()
+    conn.close()
+    with app.test_client() as client:
+        assert len(client.get('/api/search?q=renamed').get_json()) == 3
+
+
+def test_generate_dataset_builds_consistent_data():
+    """Test that generated data has per-project numbers and up-to-date derived tables"""
+    from generate_data import generate_dataset
+    generate_dataset(backend_app.DATABASE, projects=3, tasks=300, completed_ratio=0.5)
+    conn = sqlite3.connect(backend_app.DATABASE)
+    assert conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0] == 300
+    numbers = conn.execute('SELECT project_id, task_number FROM tasks ORDER BY project_id, id').fetchall()
+    counters = dict(conn.execute('SELECT id, task_counter FROM projects'))
+    for project_id, count in counters.items():
+        assert [n for p, n in numbers if p == project_id] == list(range(1, count + 1))
+    assert sum(counters.values()) == 300
+    assert (conn.execute('SELECT COUNT(*) FROM calendar_events').fetchone()[0]
+            == conn.execute('SELECT COUNT(*) FROM calendar_events_source').fetchone()[0])
+    assert conn.execute('SELECT COUNT(*) FROM tasks_fts').fetchone()[0] == 300
+    assert conn.execute('SELECT action FROM change_log ORDER BY version DESC LIMIT 1').fetchone()[0] == 'reload'
+    conn.close()
+
+    # Triggers are back in place after the bulk load
+    with app.test_client() as client:
+        client.post('/api/update_kanban_status', json={'task_id': 1, 'new_status': 'Буфер'})
+    conn = sqlite3.connect(backend_app.DATABASE)
+    last_change = conn.execute('SELECT action, task_id FROM change_log ORDER BY version DESC LIMIT 1').fetchone()
+    assert last_change == ('update', 1)
+    conn.close()
+
+
+def test_import_export_round_trip(tmp_path):
+    """Test that exported tasks import into another database with indexes and derived tables rebuilt"""
+    from task_io import import_tasks, export_tasks
+    create_sample_task(title='Отчёт', completed=1, completion_date='2024-01-02', planned_date='2024-01-01')
+    create_sample_task(title='Second, with "quotes"', description='line 1\nline 2', show_in_calendar=0)
+
+    for name in ('tasks.csv', 'tasks.jsonl'):
+        path = str(tmp_path / name)
+        assert export_tasks(backend_app.DATABASE, path) == 2
+        database = str(tmp_path / f'{name}.db')
+        report = import_tasks(database, path)
+        assert report['tasks'] == 2 and report['projects_created'] == 1 and report['skipped'] == 0
+        export_path = str(tmp_path / f'again-{name}')
+        export_tasks(database, export_path)
+        with open(path, encoding='utf-8') as original, open(export_path, encoding='utf-8') as again:
+            assert original.read() == again.read()
+
+        conn = sqlite3.connect(database)
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'idx_tasks_number'").fetchone()[0] == 1
+        assert conn.execute('SELECT COUNT(*) FROM calendar_events').fetchone()[0] == 1
+        assert conn.execute("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'отчёт'").fetchall() == [(1,)]
+        conn.close()
+
+    # Into an existing project: numbered after its tasks; defaults fill empty fields
+    path = tmp_path / 'more.csv'
+    path.write_text('project,title,task_number,completed,priority\n'
+                    'SP,Imported,1,yes,\n'
+                    ',No project,,,\n', encoding='utf-8')
+    report = import_tasks(backend_app.DATABASE, str(path))
+    assert report['tasks'] == 1 and report['skipped'] == 1
+    assert report['errors'] == ['line 3: a task needs a project and a title']
+    conn = sqlite3.connect(backend_app.DATABASE)
+    task = conn.execute("SELECT task_number, completed, priority, kanban_status FROM tasks WHERE title = 'Imported'").fetchone()
+    assert task == (3, 1, 'Базовый', 'Новая')
+    assert conn.execute("SELECT task_counter FROM projects WHERE identifier = 'SP'").fetchone()[0] == 3
+    conn.close()
+
+
+def test_failed_bulk_load_keeps_triggers_and_indexes():
+    """Test that an error inside bulk_load rolls back the dropped triggers and indexes with the data"""
+    from init_db import bulk_load
+    conn = sqlite3.connect(backend_app.DATABASE)
+    schema = conn.execute('SELECT type, name FROM sqlite_master ORDER BY name').fetchall()
+    conn.execute("INSERT INTO projects (id, name, identifier) VALUES (1, 'Sample Project', 'SP')")
+    conn.commit()
+
+    with pytest.raises(RuntimeError):
+        with bulk_load(conn, drop_indexes=True):
+            conn.execute("INSERT INTO tasks (project_id, title, planned_date) VALUES (1, 'Lost', '2024-01-01')")
+            raise RuntimeError('import failed')
+    assert conn.execute('SELECT type, name FROM sqlite_master ORDER BY name').fetchall() == schema
+    assert conn.execute('SELECT COUNT(*) FROM tasks').fetchone()[0] == 0
+
+    # The triggers still maintain the derived tables
+    create_sample_task(planned_date='2024-01-01')
+    assert conn.execute('SELECT COUNT(*) FROM calendar_events').fetchone()[0] == 1
+    assert conn.execute("SELECT action FROM change_log ORDER BY version DESC LIMIT 1").fetchone()[0] == 'insert'
+    conn.close()
+
+
+def test_failed_search_rebuild_keeps_the_index(monkeypatch):
+    """Test that update_db drops and refills the search index in one transaction"""
+    import update_db
+    from init_db import rebuild_task_search
+    task_id = create_sample_task(title='Searchable task')
+
+    def failing_rebuild(conn):
+        rebuild_task_search(conn)
+        raise sqlite3.OperationalError('disk I/O error')
+    monkeypatch.setattr(update_db, 'rebuild_task_search', failing_rebuild)
+    with pytest.raises(sqlite3.OperationalError):
+        update_db.rebuild_search()
+
+    conn = sqlite3.connect(backend_app.DATABASE)
+    assert conn.execute("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'searchable'").fetchall() == [(task_id,)]
+    triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert {'tasks_fts_task_insert', 'tasks_fts_task_update'} <= triggers
+    conn.close()
+
+    monkeypatch.setattr(update_db, 'rebuild_task_search', rebuild_task_search)
+    update_db.rebuild_search()
+    conn = sqlite3.connect(backend_app.DATABASE)
+    assert conn.execute("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'searchable'").fetchall() == [(task_id,)]
+    conn.close()
+
+
+def test_migrations_upgrade_legacy_database(tmp_path):
+    """Test that an unversioned database from before the migrations is brought up to date"""
+    import init_db
+    database = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(database)
+    conn.execute('CREATE TABLE projects (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, identifier TEXT UNIQUE NOT NULL)')
+    conn.execute('''CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER, title TEXT NOT NULL,
+                    description TEXT, planned_date DATE, deadline DATE, priority TEXT DEFAULT 'Базовый')''')
+    conn.execute("INSERT INTO projects (name, identifier) VALUES ('Legacy', 'LG')")
+    conn.executemany("INSERT INTO tasks (project_id, title, planned_date) VALUES (1, ?, '2024-05-01')", [('A',), ('B',)])
+    conn.commit()
+    conn.close()
+
+    init_db.init_database(database)
+    conn = sqlite3.connect(database)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == init_db.SCHEMA_VERSION
+    assert conn.execute('SELECT task_number, kanban_status FROM tasks ORDER BY id').fetchall() == [(1, 'Новая'), (2, 'Новая')]
+    assert conn.execute('SELECT COUNT(*) FROM calendar_events').fetchone()[0] == 2
+    assert conn.execute('SELECT COUNT(*) FROM tasks_fts').fetchone()[0] == 2
+    # Indexes created by earlier migrations and replaced later are gone
+    indexes = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tasks' AND sql IS NOT NULL")}
+    assert indexes == {name for name, _ in init_db.TASK_INDEXES} | {'idx_tasks_number'}
+
+    # A current schema is recognized with a single pragma read
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert init_db.migrate(conn) == 0
+    assert statements == ['PRAGMA user_version']
+    conn.close()
+
+
+def test_failed_migration_leaves_schema_unchanged(tmp_path, monkeypatch):
+    """Test that pending migrations are applied all together or not at all"""
+    import init_db
+    database = str(tmp_path / 'partial.db')
+
+    def broken_migration(conn):
+        raise sqlite3.OperationalError('broken migration')
+
+    monkeypatch.setattr(init_db, 'MIGRATIONS', init_db.MIGRATIONS + [('broken', broken_migration)])
+    monkeypatch.setattr(init_db, 'SCHEMA_VERSION', len(init_db.MIGRATIONS))
+    with pytest.raises(sqlite3.OperationalError):
+        init_db.init_database(database)
+    conn = sqlite3.connect(database)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'tasks'").fetchone()[0] == 0
+    conn.close()
+
+
+def test_archived_tasks_leave_live_table_but_stay_readable():
+    """Test that old completed tasks move to the archive in batches and are still shown by id"""
+    from archive_tasks import archive_tasks
+    old_ids = [create_sample_task(title=f'Old {i}', completed=1, completion_date=f'2020-01-0{i}',
+                                  planned_date='2020-01-01')
+               for i in range(1, 4)]
+    recent = create_sample_task(title='Recent', completed=1, completion_date=date.today().isoformat())
+    open_task = create_sample_task(title='Open', planned_date='2020-01-01')
+    conn = sqlite3.connect(backend_app.DATABASE)
+    version = conn.execute('SELECT MAX(version) FROM change_log').fetchone()[0]
+    conn.close()
+
+    assert archive_tasks(backend_app.DATABASE, days=30, batch_size=2) == 3
+    assert archive_tasks(backend_app.DATABASE, days=30) == 0
+
+    conn = sqlite3.connect(backend_app.DATABASE)
+    assert [row[0] for row in conn.execute('SELECT id FROM tasks ORDER BY id')] == [recent, open_task]
+    assert [row[0] for row in conn.execute('SELECT id FROM tasks_archive ORDER BY id')] == old_ids
+    # One change per project and batch instead of a delete per task
+    assert conn.execute('SELECT action, task_id, project_id FROM change_log WHERE version > ?',
+                        (version,)).fetchall() == [('archive', None, 1), ('archive', None, 1)]
+    assert conn.execute('SELECT COUNT(*) FROM calendar_events WHERE task_id IN (?, ?, ?)', old_ids).fetchone()[0] == 0
+    conn.close()
+
+    with app.test_client() as client:
+        response = client.get(f'/task/{old_ids[0]}')
+        assert response.status_code == 200
+        assert 'В архиве' in response.get_data(as_text=True)
+        task = client.get(f'/api/task/{old_ids[1]}').get_json()
+        assert task['title'] == 'Old 2' and task['archived'] == 1 and task['project_identifier'] == 'SP'
+        assert client.get('/api/task/999').status_code == 404
+        response = client.get('/task/SP-3')
+        assert response.status_code == 302 and response.location.endswith(f'/task/{old_ids[2]}')
+        # Archived tasks can't be edited: the edit form leads back to the read-only page
+        for method in (client.get, client.post):
+            response = method(f'/edit_task/{old_ids[0]}', data={'title': 'Changed'})
+            assert response.status_code == 302 and response.location.endswith(f'/task/{old_ids[0]}')
+        assert client.get('/edit_task/999').status_code == 404
+
+        # Open pages hear about it as its own event, with the project
+        response = client.get('/api/stream', headers={'Last-Event-ID': str(version)}, buffered=False)
+        event, change = read_stream_event(response.iter_encoded())
+        response.close()
+        assert event == 'tasks-archived' and change['project_id'] == 1
+
+        # Live and archived tasks in one list, newest completion first, across pages
+        page = client.get('/all_completed_tasks?limit=2').get_data(as_text=True)
+        assert page.index('Recent') < page.index('Old 3') and 'Old 2' not in page
+        after = re.search(r'after=([^"&]+)', page).group(1)
+        page = client.get(f'/all_completed_tasks?limit=2&after={after}').get_data(as_text=True)
+        assert page.index('Old 2') < page.index('Old 1') and 'Recent' not in page
+        # The recent list only reads the live table
+        assert 'Old 1' not in client.get('/completed_tasks').get_data(as_text=True)
+
+
+def test_project_stats_follow_task_changes():
+    """Test that the trigger-maintained project counts match a full recount after every kind of change"""
+    from archive_tasks import archive_tasks
+    from init_db import OVERDUE_CONDITION
+    today = date.today()
+    first = create_sample_task(title='Overdue', deadline=(today - timedelta(days=2)).isoformat())
+    second = create_sample_task(title='Planned late', planned_date=(today - timedelta(days=1)).isoformat(),
+                                deadline=(today + timedelta(days=5)).isoformat())
+    create_sample_task(title='Future', deadline=(today + timedelta(days=1)).isoformat())
+    create_sample_task(title='Done long ago', completed=1, completion_date='2020-01-01', deadline='2019-12-01')
+    conn = sqlite3.connect(backend_app.DATABASE)
+    conn.execute("INSERT INTO projects (id, name, identifier) VALUES (2, 'Other', 'OT')")
+    conn.commit()
+
+    def counts():
+        recount = {row[0]: row[1:] for row in conn.execute(f'''
+            SELECT project_id, SUM(completed = 0), SUM(completed = 1),
+                   SUM(completed = 0 AND {OVERDUE_CONDITION})
+            FROM all_tasks_v t GROUP BY project_id''')}
+        with app.test_client() as client:
+            projects = client.get('/api/projects').get_json()
+        stats = {p['id']: (p['open_tasks'], p['completed_tasks'], p['overdue_tasks']) for p in projects}
+        assert stats == {project_id: recount.get(project_id, (0, 0, 0)) for project_id in (1, 2)}
+        return stats
+
+    assert counts() == {1: (3, 1, 2), 2: (0, 0, 0)}
+    with app.test_client() as client:
+        client.post('/api/move_task_to_project', json={'task_id': first, 'project_id': 2})
+        assert counts() == {1: (2, 1, 1), 2: (1, 0, 1)}
+        client.post('/api/toggle_task_completed', json={'task_id': first, 'completed': True})
+        assert counts() == {1: (2, 1, 1), 2: (0, 1, 0)}
+        client.post('/api/tasks/bulk', json=[{'task_id': second, 'planned_date': today.isoformat()}])
+        assert counts() == {1: (2, 1, 0), 2: (0, 1, 0)}
+        page = client.get('/projects').get_data(as_text=True)
+        assert 'Открыто: 2' in page and 'Выполнено: 1' in page
+        assert 'Открыто: 2' in client.get('/project/1').get_data(as_text=True)
+    # Archived tasks still count as completed
+    assert archive_tasks(backend_app.DATABASE, days=30) == 1
+    assert counts() == {1: (2, 1, 0), 2: (0, 1, 0)}
+    conn.execute('DELETE FROM tasks WHERE id = ?', (second,))
+    conn.commit()
+    assert counts() == {1: (1, 1, 0), 2: (0, 1, 0)}
+    conn.close()
+
+
+def test_metrics_record_latency_and_sql_per_endpoint(monkeypatch):
+    """Test that enabled metrics count requests, SQL statements, rows and bytes per endpoint"""
+    import metrics
+    create_sample_task()
+    with app.test_client() as client:
+        assert client.get('/metrics').status_code == 404
+
+    monkeypatch.setattr(metrics, 'registry', metrics.Registry())
+    metrics.enable()
+    try:
+        with app.test_client() as client:
+            kanban = client.get('/kanban')
+            client.get('/kanban')
+            text = client.get('/metrics').get_data(as_text=True)
+    finally:
+        metrics.enable(False)
+
+    values = dict(line.rsplit(' ', 1) for line in text.splitlines() if not line.startswith('#'))
+    labels = '{endpoint="kanban",method="GET"}'
+    assert values['task_tracker_requests_total{endpoint="kanban",method="GET",status="200"}'] == '2'
+    assert values[f'task_tracker_request_duration_seconds_count{labels}'] == '2'
+    assert values['task_tracker_request_duration_seconds_bucket{endpoint="kanban",method="GET",le="+Inf"}'] == '2'
+    assert int(values[f'task_tracker_sql_statements_sum{labels}']) >= 2
+    assert float(values[f'task_tracker_sql_duration_seconds_sum{labels}']) > 0
+    assert int(values[f'task_tracker_sql_rows_fetched_sum{labels}']) >= 2
+    assert int(values[f'task_tracker_response_size_bytes_sum{labels}']) == 2 * len(kanban.get_data())
+
+
+def test_slow_query_log_records_plans_and_full_scans(tmp_path):
+    """Test that slow statements are logged with their route, parameters and query plan"""
+    import slow_queries
+    create_sample_task(completed=1, completion_date='2024-01-05')
+    log_path = tmp_path / 'slow.log'
+    slow_queries.enable(0, str(log_path))
+    try:
+        with app.test_client() as client:
+            assert client.get('/kanban').status_code == 200
+            assert client.get('/completed_tasks').status_code == 200
+    finally:
+        slow_queries.enable(None)
+
+    entries = log_path.read_text(encoding='utf-8').split('\n20')
+    kanban = [e for e in entries if 'GET /kanban (kanban)' in e and 'FROM task_list_v' in e]
+    assert kanban and all('FULL SCAN' not in e for e in kanban)
+    assert '  Parameters: [101]' in kanban[0] and '  Plan:\n    ' in kanban[0]
+    # Two ranges of idx_tasks_completed, however long the history
+    completed = [e for e in entries if 'GET /completed_tasks (completed_tasks)' in e and 'FROM task_list_v' in e]
+    assert completed and 'FULL SCAN' not in completed[0]
+    assert 'SEARCH t USING INDEX idx_tasks_completed (completion_date>?)' in completed[0]
+
+    conn = sqlite3.connect(backend_app.DATABASE)
+    plan, full_scan = slow_queries.explain(conn, 'SELECT * FROM task_list_v t WHERE t.title = ?', ('x',))
+    assert full_scan and plan[0].startswith('SCAN t')
+    conn.close()
+
+    with app.test_client() as client:
+        client.get('/kanban')
+    assert log_path.read_text(encoding='utf-8').count('SLOW') == len(entries)
+
+
 if __name__ == "__main__":
     print("Testing Task Tracker Application...")
     print()
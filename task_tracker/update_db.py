@@ -1,153 +1,97 @@
 #!/usr/bin/env python3
 """
 Script to update the database schema for new functionality.
-This script adds missing columns and tables if they don't exist yet.
+
+The schema is versioned: init_db.MIGRATIONS lists numbered migrations and
+PRAGMA user_version records how many of them a database has. The
+application applies pending migrations on startup; this script applies
+them explicitly and reports the version. It can also rebuild the derived
+tables (calendar events, search index, project task counts) from the tasks
+table.
 """
 
+import argparse
 import sqlite3
 import sys
-from typing import List, Tuple
-
 
-def get_existing_columns(conn: sqlite3.Connection, table_name: str) -> List[str]:
-    """Get list of existing columns in a table."""
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table_name})")
-    columns = [column[1] for column in cursor.fetchall()]
-    return columns
+from init_db import (DATABASE, MIGRATION_LOCK_TIMEOUT, SCHEMA_VERSION, create_calendar_events,
+                     rebuild_calendar_events, create_task_search, rebuild_task_search, create_project_stats,
+                     rebuild_project_stats, migrate, schema_version)
 
 
-def check_and_add_column(conn: sqlite3.Connection, table_name: str, column_name: str, column_def: str) -> bool:
-    """Check if column exists and add it if it doesn't exist."""
-    existing_columns = get_existing_columns(conn, table_name)
+def update_database_schema(database=DATABASE):
+    """Apply the pending schema migrations."""
+    conn = sqlite3.connect(database, timeout=MIGRATION_LOCK_TIMEOUT)
+    version = schema_version(conn)
+    print(f"Database schema version {version}, latest {SCHEMA_VERSION}")
+    applied = migrate(conn)
+    conn.close()
     
-    if column_name not in existing_columns:
-        cursor = conn.cursor()
-        try:
-            alter_query = f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_def}"
-            cursor.execute(alter_query)
-            print(f"Added column '{column_name}' to table '{table_name}'")
-            return True
-        except sqlite3.Error as e:
-            print(f"Error adding column '{column_name}' to table '{table_name}': {e}")
-            return False
+    if applied:
+        print(f"\nSuccessfully updated database schema to version {SCHEMA_VERSION} ({applied} migrations applied).")
+    elif version > SCHEMA_VERSION:
+        print("\nThe database was migrated by a newer version of the application.")
     else:
-        print(f"Column '{column_name}' already exists in table '{table_name}'")
-        return False
+        print("\nDatabase schema is already up-to-date. No changes needed.")
 
 
-def update_database_schema():
-    """Update the database schema to include all necessary fields for new functionality."""
-    print("Starting database update...")
-    
-    conn = sqlite3.connect('tasks.db')
-    
-    # Check and add columns to tasks table
-    tasks_updates_needed = 0
-    
-    # Check if planned_start_time column exists (was mentioned in requirements as "запланированное время начала выполнения задачи")
-    if check_and_add_column(conn, 'tasks', 'planned_start_time', 'TIME'):
-        tasks_updates_needed += 1
-        
-    # Check if color column exists
-    if check_and_add_column(conn, 'tasks', 'color', "TEXT DEFAULT '#1098ad'"):
-        tasks_updates_needed += 1
-        
-    # Check if kanban_enabled column exists
-    if check_and_add_column(conn, 'tasks', 'kanban_enabled', 'BOOLEAN DEFAULT 1'):
-        tasks_updates_needed += 1
-        
-    # Check if kanban_status column exists
-    if check_and_add_column(conn, 'tasks', 'kanban_status', "TEXT DEFAULT 'Новая'"):
-        tasks_updates_needed += 1
-    
-    # Check if completed column exists (for tracking completed tasks)
-    if check_and_add_column(conn, 'tasks', 'completed', 'BOOLEAN DEFAULT 0'):
-        tasks_updates_needed += 1
-        
-    # Check if completion_date column exists
-    if check_and_add_column(conn, 'tasks', 'completion_date', 'DATE'):
-        tasks_updates_needed += 1
-    
-    # Check if show_in_calendar column exists
-    if check_and_add_column(conn, 'tasks', 'show_in_calendar', 'BOOLEAN DEFAULT 1'):
-        tasks_updates_needed += 1
-        
-    # Check if responsible column exists in tasks table
-    if check_and_add_column(conn, 'tasks', 'responsible', 'TEXT'):
-        tasks_updates_needed += 1
-
-    # Check and create projects table if it doesn't exist
-    cursor = conn.cursor()
-    cursor.execute('''SELECT name FROM sqlite_master WHERE type='table' AND name='projects' ''')
-    if not cursor.fetchone():
-        print("Creating projects table...")
-        cursor.execute('''
-            CREATE TABLE projects (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                identifier TEXT UNIQUE NOT NULL,
-                responsible TEXT
-            )
-        ''')
-        print("Created projects table")
-    else:
-        print("Projects table already exists")
-        # Check if responsible column exists in projects table
-        if check_and_add_column(conn, 'projects', 'responsible', 'TEXT'):
-            tasks_updates_needed += 1
-
-    # Check and create tasks table if it doesn't exist (as fallback)
-    cursor.execute('''SELECT name FROM sqlite_master WHERE type='table' AND name='tasks' ''')
-    if not cursor.fetchone():
-        print("Creating tasks table...")
-        cursor.execute('''
-            CREATE TABLE tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                project_id INTEGER,
-                title TEXT NOT NULL,
-                description TEXT,
-                planned_date DATE,
-                planned_start_time TIME,
-                deadline DATE,
-                priority TEXT DEFAULT 'Базовый',
-                show_in_calendar BOOLEAN DEFAULT 0,
-                completed BOOLEAN DEFAULT 0,
-                completion_date DATE,
-                color TEXT DEFAULT '#1098ad',
-                kanban_enabled BOOLEAN DEFAULT 0,
-                kanban_status TEXT DEFAULT 'Новая',
-                FOREIGN KEY (project_id) REFERENCES projects (id)
-            )
-        ''')
-        print("Created tasks table")
-    else:
-        print("Tasks table already exists")
+def rebuild_table(create, rebuild):
+    """Recreate a derived table's triggers and rebuild it in one transaction. Returns the rebuild count.
 
-    # Update kanban_status column to include all possible values as constraints would
-    # (though SQLite doesn't enforce CHECK constraints properly, we document them)
-    
-    if tasks_updates_needed > 0:
-        print(f"\nSuccessfully updated database schema. {tasks_updates_needed} columns added.")
-    else:
-        print("\nDatabase schema is already up-to-date. No changes needed.")
+    The DDL in ``create`` would otherwise commit on its own, leaving the
+    table without its triggers or rows if the rebuild fails.
+    """
+    conn = sqlite3.connect(DATABASE, timeout=MIGRATION_LOCK_TIMEOUT)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        create(conn)
+        count = rebuild(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return count
 
-    # Verify the final structure
-    print("\nVerifying final table structure:")
-    cursor.execute("PRAGMA table_info(tasks)")
-    columns = cursor.fetchall()
-    print("Current 'tasks' table structure:")
-    for col in columns:
-        print(f"  {col[1]} ({col[2]}) - {'NOT NULL' if col[3] else 'NULL'} - Default: {col[4]}")
 
-    conn.commit()
-    conn.close()
-    print("\nDatabase update completed!")
+def rebuild_calendar():
+    """Recompute the calendar_events table from the tasks table."""
+    count = rebuild_table(lambda conn: create_calendar_events(conn, replace=True), rebuild_calendar_events)
+    print(f"Rebuilt calendar_events: {count} events.")
+
+
+def rebuild_search():
+    """Re-index every task in the tasks_fts search index."""
+    count = rebuild_table(create_task_search, rebuild_task_search)
+    print(f"Rebuilt tasks_fts: {count} tasks.")
+
+
+def rebuild_stats():
+    """Recount the tasks of every project in project_stats and project_due_dates."""
+    count = rebuild_table(create_project_stats, rebuild_project_stats)
+    print(f"Rebuilt project_stats: {count} projects.")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Update Task Tracker database schema')
+    parser.add_argument('--rebuild-calendar-events', action='store_true',
+                        help='Only recompute the calendar_events table from the tasks table')
+    parser.add_argument('--rebuild-search-index', action='store_true',
+                        help='Only re-index the tasks for full-text search')
+    parser.add_argument('--rebuild-project-stats', action='store_true',
+                        help='Only recount the open, completed and overdue tasks of every project')
+    args = parser.parse_args()
+    
     try:
-        update_database_schema()
+        if args.rebuild_calendar_events:
+            rebuild_calendar()
+        elif args.rebuild_search_index:
+            rebuild_search()
+        elif args.rebuild_project_stats:
+            rebuild_stats()
+        else:
+            update_database_schema()
     except Exception as e:
         print(f"Error during database update: {e}")
         sys.exit(1)
\ No newline at end of file